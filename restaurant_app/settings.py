@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'restaurants.profiling.ProfilingMiddleware',
+    'restaurants.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +90,37 @@ DATABASES = {
     }
 }
 
+# Read replicas of 'default', as comma-separated database names for the same
+# engine, e.g. DATABASE_REPLICAS=db-replica.sqlite3 for a local SQLite copy
+# refreshed with `manage.py sync_replicas`. Reads are routed to them by
+# restaurants.routers; tests read the primary.
+RESTAURANTS_READ_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'NAME': name.strip(), 'TEST': {'MIRROR': 'default'}}
+    RESTAURANTS_READ_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['restaurants.routers.PrimaryReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write, so they see
+# their own reviews, bookmarks and visits despite replication lag.
+RESTAURANTS_REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Change counters in restaurants.versioning live here, so deployments with
+# several worker processes need a shared backend (Redis, Memcached, database).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Card fragments, cached pages and membership sets share this cache
+        # with the version counters; the default of 300 entries would keep
+        # culling them.
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -137,6 +170,15 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are named by the hash of their content and deduplicated, so media
+# URLs never change meaning; serve MEDIA_URL + 'content/' with
+# 'Cache-Control: public, max-age=31536000, immutable'. Run
+# `manage.py dedupe_media --gc` to move older files over and delete orphans.
+STORAGES = {
+    'default': {'BACKEND': 'restaurants.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 LOGIN_REDIRECT_URL = 'home'
 
 LOGOUT_REDIRECT_URL = 'home'
@@ -150,3 +192,55 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Bayesian prior used for RestaurantRatingStats.weighted_score: every restaurant
+# is treated as if it already had RATING_PRIOR_WEIGHT reviews of RATING_PRIOR_MEAN.
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 10
+
+# Restaurant full-text search. Leave RESTAURANT_SEARCH_BACKEND unset to pick
+# SQLite FTS5 or Postgres tsvector from the database vendor.
+RESTAURANT_SEARCH_BACKEND = None
+
+# Use keyset (cursor) pagination on the restaurant, review, bookmark and visit
+# lists by default. Individual requests can opt in with ?cursor=.
+RESTAURANTS_CURSOR_PAGINATION = False
+
+# Answer restaurant list and home page filtering, sorting and paging from an
+# in-process snapshot of the catalogue instead of SQL. Each worker keeps its
+# own copy, rebuilt after restaurant, cuisine or review changes.
+RESTAURANTS_FILTER_ENGINE = False
+
+# Serve the home, restaurant list, detail and review list pages with async
+# views. restaurant_app/asgi.py turns this on; WSGI deployments keep the sync views.
+RESTAURANTS_ASYNC_VIEWS = os.environ.get('RESTAURANTS_ASYNC_VIEWS', '0') == '1'
+
+# Threads shared by the views that load their context concurrently (the
+# restaurant detail page); 0 runs the loaders one after another.
+RESTAURANTS_LOADER_WORKERS = 4
+# Seconds the loader threads keep their database connections open (None for
+# no limit). It overrides CONN_MAX_AGE for them, which would otherwise make
+# every loader connect anew; allow for workers x processes extra connections.
+RESTAURANTS_LOADER_CONN_MAX_AGE = 60
+
+# Widths, in pixels, of the JPEG and WebP renditions made of every restaurant
+# and menu item photo, and whether they are made right after an upload rather
+# than the first time the photo is shown. Renditions found missing while a
+# page renders are made on this many background threads; 0 leaves them to
+# the generate_renditions command.
+RESTAURANTS_RENDITION_WIDTHS = (240, 480, 960, 1600)
+RESTAURANTS_RENDITIONS_EAGER = True
+RESTAURANTS_RENDITION_WORKERS = 1
+
+# How long each user's cached bookmark and visit id sets live, in seconds.
+RESTAURANTS_MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+# How long the anonymous home page is served from the page cache, in seconds.
+RESTAURANTS_PAGE_CACHE_TIMEOUT = 5 * 60
+
+# Fraction of requests the profiling middleware samples; 0 disables it.
+RESTAURANTS_PROFILING_SAMPLE_RATE = float(os.environ.get('RESTAURANTS_PROFILING_SAMPLE_RATE', 0))
+# File the per-route profiles are appended to, or an http(s) URL they are POSTed to.
+RESTAURANTS_PROFILING_OUTPUT = os.environ.get('RESTAURANTS_PROFILING_OUTPUT', str(BASE_DIR / 'profiles.jsonl'))
+# Seconds between flushes of the aggregated profiles.
+RESTAURANTS_PROFILING_FLUSH_INTERVAL = 60
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Restaurant, MenuItem, MenuItemPhoto, RestaurantPhoto, Cuisine, Bookmark, Visit, Review
+from .models import Restaurant, MenuItem, MenuItemPhoto, RestaurantPhoto, Cuisine, Bookmark, Visit, Review, RestaurantRatingStats
 
 class MenuItemPhotoInline(admin.TabularInline):
     model = MenuItemPhoto
@@ -11,9 +11,10 @@ class RestaurantPhotoInline(admin.TabularInline):
 
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
-    list_display = ('name', 'address', 'city', 'open_status', 'spotlight')
+    list_display = ('name', 'address', 'city', 'open_status', 'spotlight', 'rating_avg', 'rating_count')
     search_fields = ('name', 'address', 'city')
     ordering = ('name',)
+    readonly_fields = ('rating_avg', 'rating_count')
     inlines = [RestaurantPhotoInline]
 
 @admin.register(MenuItem)
@@ -52,3 +53,9 @@ class VisitAdmin(admin.ModelAdmin):
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ('restaurant', 'rating', 'title', 'user')
     search_fields = ('restaurant__name', 'user__username')
+
+@admin.register(RestaurantRatingStats)
+class RestaurantRatingStatsAdmin(admin.ModelAdmin):
+    list_display = ('restaurant', 'weighted_score', 'last_reviewed_at')
+    search_fields = ('restaurant__name',)
+    readonly_fields = ('one_star', 'two_star', 'three_star', 'four_star', 'five_star', 'last_reviewed_at', 'weighted_score')
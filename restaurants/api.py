@@ -0,0 +1,339 @@
+"""
+Read-only JSON API for restaurants, menus, photos and reviews, mounted at
+/api/v1/.
+
+Each resource declares its fields with the columns they read, so a sparse
+fieldset (`fields=name,city`, or `fields[<type>]=` for included types)
+also narrows the SELECT, and its relations, which `include=` (comma
+separated, dotted for nested relations such as `menu_items.photos`) loads
+with one batched query per relation for the whole page. Lists use cursor
+pagination and never count rows, so the number of queries does not
+depend on the page size.
+"""
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.generic import View
+from .filters import RestaurantFilter
+from .models import Cuisine, MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto, RestaurantRatingStats, Review
+from .pagination import CursorPaginator, InvalidCursor, UnsupportedOrdering
+from .renditions import variant_url
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+class Field:
+    """
+    A serialized value read from `columns` of the row, by `get` or, by
+    default, from the attribute of the same name.
+    """
+    def __init__(self, *columns, get=None, select_related=None):
+        self.columns = columns
+        self.get = get
+        self.select_related = select_related
+
+    def value(self, obj, name):
+        return self.get(obj) if self.get else getattr(obj, name)
+
+class Relation:
+    """
+    Related rows serialized by `resource`, reached through the `accessor`
+    attribute. `columns` are the columns of the related rows that Django
+    matches them to their parent by, and `many` is False for one-to-one
+    relations.
+    """
+    def __init__(self, resource, accessor, columns=(), many=True):
+        self.resource = resource
+        self.accessor = accessor
+        self.columns = columns
+        self.many = many
+
+def parse_list(value):
+    return [item for item in (value or '').split(',') if item]
+
+def parse_includes(value):
+    """
+    Turns 'menu_items.photos,cuisines' into {'menu_items': {'photos': {}}, 'cuisines': {}}.
+    """
+    tree = {}
+    for path in parse_list(value):
+        node = tree
+        for name in path.split('.'):
+            node = node.setdefault(name, {})
+    return tree
+
+class Resource:
+    type = None
+    model = None
+    fields = {}
+    relations = {}
+    ordering = ('pk',)
+
+    def __init__(self, request, includes=None, primary=False):
+        self.request = request
+        requested = request.GET.get(f'fields[{self.type}]')
+        if requested is None and primary:
+            requested = request.GET.get('fields')
+        self.field_names = parse_list(requested) or list(self.fields)
+        unknown = set(self.field_names) - set(self.fields)
+        if unknown:
+            raise ApiError(f"Unknown {self.type} fields: {', '.join(sorted(unknown))}")
+        includes = parse_includes(request.GET.get('include')) if includes is None else includes
+        unknown = set(includes) - set(self.relations)
+        if unknown:
+            raise ApiError(f"Unknown {self.type} relations: {', '.join(sorted(unknown))}")
+        self.included = {
+            name: self.relations[name].resource(request, includes=subtree)
+            for name, subtree in includes.items()
+        }
+
+    def columns(self):
+        columns = {'pk'}
+        for name in self.field_names:
+            columns.update(self.fields[name].columns)
+        return columns
+
+    def get_queryset(self, queryset, extra_columns=()):
+        """
+        Restricts `queryset` to the columns of the requested fields and
+        adds a Prefetch for every included relation.
+        """
+        related = {self.fields[name].select_related for name in self.field_names} - {None}
+        if related:
+            queryset = queryset.select_related(*related)
+        queryset = queryset.only(*self.columns(), *extra_columns)
+        prefetches = []
+        for name, resource in self.included.items():
+            relation = self.relations[name]
+            related_queryset = resource.get_queryset(
+                resource.model.objects.order_by(*resource.ordering), relation.columns,
+            )
+            prefetches.append(Prefetch(relation.accessor, queryset=related_queryset))
+        return queryset.prefetch_related(*prefetches)
+
+    def serialize(self, obj):
+        data = {name: self.fields[name].value(obj, name) for name in self.field_names}
+        for name, resource in self.included.items():
+            relation = self.relations[name]
+            if relation.many:
+                data[name] = [resource.serialize(item) for item in getattr(obj, relation.accessor).all()]
+            else:
+                try:
+                    data[name] = resource.serialize(getattr(obj, relation.accessor))
+                except ObjectDoesNotExist:
+                    data[name] = None
+        return data
+
+def image_url(photo):
+    return photo.image.url if photo.image else None
+
+def rendition_urls(photo):
+    return [
+        {'width': variant['width'], 'format': variant['format'], 'url': variant_url(variant)}
+        for variant in (photo.renditions or {}).get('variants', [])
+    ]
+
+class CuisineResource(Resource):
+    type = 'cuisines'
+    model = Cuisine
+    fields = {
+        'id': Field('id'),
+        'name': Field('name'),
+        'description': Field('description'),
+    }
+
+class RestaurantPhotoResource(Resource):
+    type = 'photos'
+    model = RestaurantPhoto
+    fields = {
+        'id': Field('id'),
+        'image': Field('image', get=image_url),
+        'renditions': Field('renditions', get=rendition_urls),
+    }
+
+class MenuItemPhotoResource(RestaurantPhotoResource):
+    type = 'menu_item_photos'
+    model = MenuItemPhoto
+
+class MenuItemResource(Resource):
+    type = 'menu_items'
+    model = MenuItem
+    fields = {
+        'id': Field('id'),
+        'name': Field('name'),
+        'description': Field('description'),
+        'price': Field('price'),
+    }
+    relations = {
+        'photos': Relation(MenuItemPhotoResource, 'menu_item_photos', columns=('menu_item',)),
+    }
+
+class RatingStatsResource(Resource):
+    type = 'rating_stats'
+    model = RestaurantRatingStats
+    fields = {
+        'stars': Field(*RestaurantRatingStats.STAR_FIELDS.values(), get=lambda stats: {
+            str(star): getattr(stats, field) for star, field in RestaurantRatingStats.STAR_FIELDS.items()
+        }),
+        'weighted_score': Field('weighted_score'),
+        'last_reviewed_at': Field('last_reviewed_at'),
+    }
+    ordering = ('restaurant',)
+
+class RestaurantResource(Resource):
+    type = 'restaurants'
+    model = Restaurant
+    fields = {
+        'id': Field('id'),
+        'name': Field('name'),
+        'address': Field('address'),
+        'city': Field('city'),
+        'cost_for_two': Field('cost_for_two'),
+        'food_type': Field('food_type'),
+        'open_status': Field('open_status'),
+        'spotlight': Field('spotlight'),
+        'latitude': Field('latitude'),
+        'longitude': Field('longitude'),
+        'rating': Field('rating_avg', get=lambda restaurant: restaurant.rating_avg),
+        'review_count': Field('rating_count', get=lambda restaurant: restaurant.rating_count),
+        # Only set when the list is filtered with `near`.
+        'distance_km': Field(get=lambda restaurant: getattr(restaurant, 'distance_km', None)),
+        'updated_at': Field('updated_at'),
+        'url': Field(get=lambda restaurant: reverse('restaurant-detail', args=[restaurant.pk])),
+    }
+    relations = {
+        'cuisines': Relation(CuisineResource, 'cuisines'),
+        'photos': Relation(RestaurantPhotoResource, 'restaurant_photos', columns=('restaurant',)),
+        'menu_items': Relation(MenuItemResource, 'menu_items', columns=('restaurant',)),
+        'rating_stats': Relation(RatingStatsResource, 'rating_stats', many=False),
+    }
+
+class ReviewResource(Resource):
+    type = 'reviews'
+    model = Review
+    fields = {
+        'id': Field('id'),
+        'rating': Field('rating'),
+        'title': Field('title'),
+        'comment': Field('comment'),
+        'user': Field('user', 'user__username', select_related='user', get=lambda review: {
+            'id': review.user_id, 'username': review.user.username,
+        }),
+        'created_at': Field('created_at'),
+        'updated_at': Field('updated_at'),
+    }
+
+class ApiView(LoginRequiredMixin, View):
+    raise_exception = True
+    resource_class = None
+
+    def get_resource(self):
+        return self.resource_class(self.request, primary=True)
+
+    def get_restaurant_id(self):
+        restaurant_id = self.kwargs['pk']
+        if not Restaurant.objects.filter(pk=restaurant_id).exists():
+            raise ApiError("Restaurant not found", status=404)
+        return restaurant_id
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return JsonResponse(self.get_data(self.get_resource()))
+        except ApiError as error:
+            body = {'error': str(error)}
+            if error.details:
+                body['details'] = error.details
+            return JsonResponse(body, status=error.status)
+
+class ApiListView(ApiView):
+    """
+    A cursor-paginated list: `page_size` (up to max_page_size) rows after
+    or before `cursor`, with the URLs of the neighbouring pages.
+    """
+    page_size = 20
+    max_page_size = 100
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET.get('page_size', self.page_size))
+        except ValueError:
+            raise ApiError("page_size must be a number")
+        return max(1, min(page_size, self.max_page_size))
+
+    def page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return self.request.build_absolute_uri(f'{self.request.path}?{params.urlencode()}')
+
+    def get_data(self, resource):
+        queryset = self.get_queryset()
+        try:
+            paginator = CursorPaginator(queryset, self.get_page_size())
+        except UnsupportedOrdering as error:
+            raise ApiError(str(error))
+        # Columns the cursor is built from have to be loaded with the rows.
+        sort_columns = [key.name for key in paginator.keys if key.name not in queryset.query.annotations]
+        paginator.queryset = resource.get_queryset(queryset, sort_columns)
+        try:
+            page = paginator.page(self.request.GET.get('cursor') or None)
+        except InvalidCursor:
+            raise ApiError("Invalid cursor")
+        return {
+            'data': [resource.serialize(obj) for obj in page],
+            'next': self.page_url(page.next_cursor),
+            'previous': self.page_url(page.previous_cursor),
+        }
+
+class RestaurantListApiView(ApiListView):
+    """
+    Restaurants, narrowed and sorted by the RestaurantFilter parameters of
+    the restaurant list page.
+    """
+    resource_class = RestaurantResource
+
+    def get_queryset(self):
+        filterset = RestaurantFilter(self.request.GET, queryset=Restaurant.objects.order_by('id'), request=self.request)
+        if not filterset.is_valid():
+            raise ApiError("Invalid filters", details=filterset.errors.get_json_data())
+        return filterset.qs
+
+class RestaurantApiView(ApiView):
+    resource_class = RestaurantResource
+
+    def get_data(self, resource):
+        restaurant = resource.get_queryset(Restaurant.objects.filter(pk=self.kwargs['pk'])).first()
+        if restaurant is None:
+            raise ApiError("Restaurant not found", status=404)
+        return {'data': resource.serialize(restaurant)}
+
+class MenuApiView(ApiView):
+    """
+    The whole menu of a restaurant; menus are short enough not to page.
+    """
+    resource_class = MenuItemResource
+
+    def get_data(self, resource):
+        items = resource.get_queryset(MenuItem.objects.filter(restaurant_id=self.get_restaurant_id()).order_by('pk'))
+        return {'data': [resource.serialize(item) for item in items]}
+
+class PhotoListApiView(ApiListView):
+    resource_class = RestaurantPhotoResource
+
+    def get_queryset(self):
+        return RestaurantPhoto.objects.filter(restaurant_id=self.get_restaurant_id()).order_by('pk')
+
+class ReviewListApiView(ApiListView):
+    """
+    Reviews of a restaurant, most recently updated first.
+    """
+    resource_class = ReviewResource
+
+    def get_queryset(self):
+        return Review.objects.filter(restaurant_id=self.get_restaurant_id())
@@ -0,0 +1,122 @@
+"""
+Async variants of the read-only views, served when RESTAURANTS_ASYNC_VIEWS
+is on (the default under restaurant_app/asgi.py).
+
+They reuse the configuration and context code of their sync counterparts
+in restaurants.views and await the async ORM for their main queries, or
+restaurants.loaders for views assembled from loaders. Sync
+helpers that may query (filters, membership sets, facets, the page cache)
+run through sync_to_async, and the TemplateResponse is rendered by the ASGI
+handler in a worker thread, so lazy relations in templates stay safe.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.views.generic.list import MultipleObjectMixin
+from .filter_engine import FilterEngineMixin, filter_engine_enabled
+from .loaders import arun_loaders
+from .models import Review
+from .views import HomePageView, RestaurantDetailView, RestaurantListView, ReviewListView
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
+class AsyncViewMixin:
+    """
+    Resolves the lazy request.user off the event loop before the sync
+    dispatch checks (LoginRequiredMixin) read it, then awaits the handler.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        await sync_to_async(lambda: request.user.is_authenticated)()
+        response = super().dispatch(request, *args, **kwargs)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+class AsyncListMixin(AsyncViewMixin):
+    """
+    Page-number pagination with the async ORM: the COUNT and the page rows
+    are awaited, and the sync get_context_data() is handed the finished
+    page. Cursor and filter engine pagination keep their sync code, run in
+    a worker thread.
+    """
+    object_count = None
+    async_page = None
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        if self.object_count is not None:
+            paginator.count = self.object_count
+        return paginator
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.async_page is not None:
+            return self.async_page
+        return super().paginate_queryset(queryset, page_size)
+
+    def uses_sync_pagination(self):
+        if isinstance(self, FilterEngineMixin) and filter_engine_enabled():
+            return True
+        use_cursor_pagination = getattr(self, 'use_cursor_pagination', None)
+        return bool(use_cursor_pagination and use_cursor_pagination())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if self.uses_sync_pagination():
+            return await sync_to_async(self.paginate_queryset)(queryset, page_size)
+        self.object_count = await queryset.acount()
+        paginator, page, object_list, is_paginated = MultipleObjectMixin.paginate_queryset(self, queryset, page_size)
+        page.object_list = await alist(object_list)
+        return paginator, page, page.object_list, is_paginated
+
+    async def arender_list(self, **kwargs):
+        page_size = self.get_paginate_by(self.object_list)
+        if page_size:
+            self.async_page = await self.apaginate_queryset(self.object_list, page_size)
+        context = await sync_to_async(self.get_context_data)(**kwargs)
+        return self.render_to_response(context)
+
+class AsyncHomePageView(AsyncListMixin, HomePageView):
+    async def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            # Served from the page cache; misses render through the sync view.
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+        self.object_list = self.get_queryset()
+        response = await self.arender_list()
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+class AsyncRestaurantListView(AsyncListMixin, RestaurantListView):
+    async def get(self, request, *args, **kwargs):
+        self.filterset = self.get_filterset(self.get_filterset_class())
+        if not self.filterset.is_bound or self.filterset.is_valid() or not self.get_strict():
+            # Search and distance filters query while building the queryset.
+            self.object_list = await sync_to_async(lambda: self.filterset.qs)()
+        else:
+            self.object_list = self.filterset.queryset.none()
+        return await self.arender_list(filter=self.filterset, object_list=self.object_list)
+
+class AsyncReviewListView(AsyncListMixin, ReviewListView):
+    async def get(self, request, *args, **kwargs):
+        response = await sync_to_async(self.get_not_modified)()
+        if response is None:
+            self.restaurant = await aget_object_or_404(self.get_restaurant_queryset(), pk=self.kwargs['pk'])
+            self.object_list = Review.objects.filter(restaurant=self.restaurant)
+            response = await self.arender_list()
+        return self.add_validators(response)
+
+class AsyncRestaurantDetailView(AsyncViewMixin, RestaurantDetailView):
+    async def get(self, request, *args, **kwargs):
+        response = await sync_to_async(self.get_not_modified)()
+        if response is None:
+            response = self.render_loaded(*await arun_loaders(self.get_loaders()))
+        return self.add_validators(response)
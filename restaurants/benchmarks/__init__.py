@@ -0,0 +1,21 @@
+"""
+Benchmarks run with ``python manage.py benchmark <name>``.
+
+Each module listed in BENCHMARKS defines ``add_arguments(parser)`` and
+``run(options, stdout)``. ``run`` returns True when the benchmark met its
+target, so the command can fail CI jobs on a regression.
+"""
+
+BENCHMARKS = {
+    'asgi': 'restaurants.benchmarks.asgi',
+    'filter_engine': 'restaurants.benchmarks.filter_engine',
+    'images': 'restaurants.benchmarks.images',
+    'routes': 'restaurants.benchmarks.routes',
+    'suggest': 'restaurants.benchmarks.suggest',
+}
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,129 @@
+"""
+Throughput and latency of the read routes served by the sync views under
+WSGI against the async views under ASGI, at a fixed concurrency.
+
+The real WSGIHandler is driven from a pool of threads, as a threaded WSGI
+server would, and the real ASGIHandler from concurrent tasks on one event
+loop, as an ASGI server would. Both run with the same logged-in session
+against the same seeded data; the benchmark passes when every request
+succeeds in both modes.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from urllib.parse import urlencode
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.test import Client, RequestFactory, override_settings
+from django.urls import include, path, reverse
+from restaurants.benchmarks import percentile
+from restaurants.benchmarks.routes import benchmark_database
+from restaurants.urls import build_urlpatterns
+from restaurants import seeding
+
+def add_arguments(parser):
+    parser.add_argument('--restaurants', type=int, default=2_000)
+    parser.add_argument('--reviews', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=200, help="Timed requests per route and mode")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+
+def urlconf(async_views):
+    module = ModuleType(f'restaurants.benchmarks.asgi.urls_{"async" if async_views else "sync"}')
+    module.urlpatterns = [
+        path('', include(build_urlpatterns(async_views))),
+        path('accounts/', include('django.contrib.auth.urls')),
+    ]
+    return module
+
+def routes(restaurant_id):
+    return [
+        ('home', reverse('home'), {}),
+        ('restaurant-list', reverse('restaurant-list'), {'sort': 'rating_desc'}),
+        ('restaurant-detail', reverse('restaurant-detail', args=[restaurant_id]), {}),
+        ('restaurant_reviews', reverse('restaurant_reviews', args=[restaurant_id]), {}),
+    ]
+
+def run_wsgi(url, query, cookie, count, concurrency):
+    application = get_wsgi_application()
+    factory = RequestFactory()
+
+    def one():
+        statuses = []
+        environ = factory.get(url, query, HTTP_COOKIE=cookie).environ
+        started = time.perf_counter()
+        response = application(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+        b''.join(response)
+        response.close()
+        return statuses[0], (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(lambda _: one(), range(count)))
+
+def run_asgi(url, query, cookie, count, concurrency):
+    application = get_asgi_application()
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': url, 'raw_path': url.encode(), 'query_string': urlencode(query).encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+
+    async def one():
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        started = time.perf_counter()
+        await application(dict(scope), receive, send)
+        return messages[0]['status'], (time.perf_counter() - started) * 1000
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with semaphore:
+                return await one()
+
+        return await asyncio.gather(*(limited() for _ in range(count)))
+
+    return asyncio.run(main())
+
+def run(options, stdout):
+    count, concurrency = options['requests'], options['concurrency']
+    failed = False
+    with benchmark_database():
+        result = seeding.seed(options['restaurants'], options['reviews'], options['users'], seed=options['seed'])
+        user = User.objects.get(pk=result.user_ids[0])
+        restaurant_id = user.reviews.order_by('pk').first().restaurant_id
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+        stdout.write(f"{count} requests per route, concurrency {concurrency}")
+        stdout.write(f"{'route':20} {'mode':5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for name, url, query in routes(restaurant_id):
+            for mode, runner, async_views in (('wsgi', run_wsgi, False), ('asgi', run_asgi, True)):
+                with override_settings(ROOT_URLCONF=urlconf(async_views)):
+                    cache.clear()
+                    runner(url, query, cookie, concurrency, concurrency)
+                    started = time.perf_counter()
+                    samples = runner(url, query, cookie, count, concurrency)
+                    seconds = time.perf_counter() - started
+                errors = sum(status != 200 for status, _ in samples)
+                failed = failed or bool(errors)
+                latencies = [ms for _, ms in samples]
+                stdout.write(
+                    f"{name:20} {mode:5} {count / seconds:>8.1f} {percentile(latencies, 0.5):>8.2f} "
+                    f"{percentile(latencies, 0.99):>8.2f} {errors:>6}"
+                )
+    return not failed
@@ -0,0 +1,88 @@
+"""
+Latency of filtering, sorting and paging the restaurant list with the
+in-process FilterEngine against the ORM, on a seeded synthetic catalogue.
+
+Both paths answer the same randomly drawn filter combinations and must
+return the same page of ids and the same total; the engine passes when
+its median is below the ORM's.
+"""
+import random
+import time
+from restaurants.benchmarks import percentile
+from restaurants.benchmarks.routes import benchmark_database, rolled_back
+from restaurants.filter_engine import load_filter_engine
+from restaurants.filters import RestaurantFilter
+from restaurants.models import Restaurant
+from restaurants import seeding
+
+PAGE_SIZE = 9
+
+def add_arguments(parser):
+    parser.add_argument('--restaurants', type=int, default=20_000)
+    parser.add_argument('--reviews', type=int, default=50_000)
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--queries', type=int, default=300, help="Number of filter combinations to time")
+    parser.add_argument('--seed', type=int, default=0)
+
+def random_query(rng):
+    data = {}
+    if rng.random() < 0.5:
+        data['food_type'] = rng.choice(Restaurant.FoodType.values)
+    if rng.random() < 0.3:
+        data['open_status'] = rng.choice(['true', 'false'])
+    if rng.random() < 0.5:
+        data['city'] = rng.choice(list(seeding.CITIES))
+        data['match'] = 'exact'
+    if rng.random() < 0.4:
+        data['cuisines'] = rng.choice(seeding.CUISINES)[:rng.randint(3, 6)]
+    if rng.random() < 0.7:
+        data['sort'] = rng.choice(['cost_asc', 'cost_desc', 'rating_asc', 'rating_desc'])
+    data['page'] = rng.randint(1, 5)
+    return data
+
+def orm_page(data):
+    filterset = RestaurantFilter(data, queryset=Restaurant.objects.order_by('id'))
+    queryset = filterset.qs
+    start = (data['page'] - 1) * PAGE_SIZE
+    return queryset.count(), list(queryset.values_list('pk', flat=True)[start:start + PAGE_SIZE])
+
+def engine_page(engine, data):
+    form = RestaurantFilter(data).form
+    form.is_valid()
+    query = {
+        name: form.cleaned_data.get(name)
+        for name in ('food_type', 'open_status', 'city', 'cuisines', 'match')
+    }
+    bitset = engine.select(**query)
+    start = (data['page'] - 1) * PAGE_SIZE
+    return bitset.bit_count(), engine.ids(bitset, data.get('sort'), start, start + PAGE_SIZE)
+
+def time_queries(queries, page):
+    samples, results = [], []
+    for data in queries:
+        started = time.perf_counter()
+        results.append(page(data))
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, results
+
+def run(options, stdout):
+    rng = random.Random(options['seed'])
+    queries = [random_query(rng) for _ in range(options['queries'])]
+    with benchmark_database(), rolled_back():
+        seeding.seed(options['restaurants'], options['reviews'], options['users'], seed=options['seed'])
+        started = time.perf_counter()
+        engine = load_filter_engine()
+        build_seconds = time.perf_counter() - started
+        orm_samples, orm_results = time_queries(queries, orm_page)
+        engine_samples, engine_results = time_queries(queries, lambda data: engine_page(engine, data))
+
+    mismatches = sum(orm != mine for orm, mine in zip(orm_results, engine_results))
+    stdout.write(f"engine built in {build_seconds:.2f}s for {engine.size:,} restaurants")
+    for label, samples in (('orm', orm_samples), ('engine', engine_samples)):
+        stdout.write(
+            f"{label:7} p50 {percentile(samples, 0.5):.3f} ms, p99 {percentile(samples, 0.99):.3f} ms, "
+            f"max {max(samples):.3f} ms"
+        )
+    if mismatches:
+        stdout.write(f"MISMATCH {mismatches} of {len(queries)} queries returned different results")
+    return not mismatches and percentile(engine_samples, 0.5) < percentile(orm_samples, 0.5)
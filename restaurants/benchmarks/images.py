@@ -0,0 +1,126 @@
+"""
+Bytes a browser downloads for the HTML and images of the pages that show
+photos, serving the original uploads against serving renditions.
+
+Pages are rendered from a throwaway database and media directory holding
+restaurants with large synthetic photos. For each <picture> the candidate
+a browser would fetch is picked from its sizes and srcset for the given
+viewport width and pixel density, preferring WebP. The benchmark passes
+when renditions make every page lighter.
+"""
+import re
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, override_settings
+from django.urls import reverse
+from restaurants.benchmarks.routes import benchmark_database, rolled_back
+from restaurants.models import MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto
+from restaurants.renditions import get_renditions
+
+PICTURE = re.compile(r'<picture><source type="image/webp" srcset="([^"]*)" sizes="([^"]*)">')
+PLAIN_IMAGE = re.compile(r'<img src="([^"]*)"(?! srcset)')
+SIZE = re.compile(r'(?:\(min-width:\s*(\d+)px\)\s*)?(\d+(?:\.\d+)?)(px|vw)')
+
+def add_arguments(parser):
+    parser.add_argument('--restaurants', type=int, default=9)
+    parser.add_argument('--photos', type=int, default=3, help="Photos per restaurant")
+    parser.add_argument('--menu-items', type=int, default=6, help="Menu items with a photo, on the detail page")
+    parser.add_argument('--width', type=int, default=2400, help="Width of the uploaded photos")
+    parser.add_argument('--viewport', type=int, default=1280, help="Viewport width in CSS pixels")
+    parser.add_argument('--dpr', type=float, default=2.0, help="Device pixel ratio")
+
+def make_photo(width, seed):
+    height = width * 2 // 3
+    # Gradients, blotches and grain, so detail survives downscaling as in a photo.
+    gradient = Image.linear_gradient('L').resize((width, height)).rotate(seed * 37 % 360)
+    blotches = Image.effect_noise((width // 24, height // 24), 80).resize((width, height), Image.BICUBIC)
+    grain = Image.effect_noise((width, height), 24)
+    image = Image.merge('RGB', (gradient, blotches, Image.blend(blotches, grain, 0.5)))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+def layout_width(sizes, viewport):
+    for condition, length, unit in SIZE.findall(sizes):
+        if not condition or viewport >= int(condition):
+            return float(length) * (viewport / 100 if unit == 'vw' else 1)
+    return viewport
+
+def choose(srcset, sizes, viewport, dpr):
+    candidates = sorted((int(width[:-1]), url) for url, width in (item.split() for item in srcset.split(', ')))
+    needed = layout_width(sizes, viewport) * dpr
+    return next((url for width, url in candidates if width >= needed), candidates[-1][1])
+
+def media_size(url):
+    return default_storage.size(url[len(settings.MEDIA_URL):])
+
+def page_bytes(client, url, viewport, dpr):
+    cache.clear()
+    html = client.get(url).content.decode()
+    images = set(PLAIN_IMAGE.findall(html))
+    images.update(choose(srcset, sizes, viewport, dpr) for srcset, sizes in PICTURE.findall(html))
+    return len(html), sum(media_size(image) for image in images), len(images)
+
+def seed(options):
+    photo_data = [make_photo(options['width'], seed) for seed in range(4)]
+    restaurants = []
+    for index in range(options['restaurants']):
+        restaurant = Restaurant.objects.create(
+            name=f"Restaurant {index}", city="Chennai", cost_for_two=500, spotlight=True,
+        )
+        for photo in range(options['photos']):
+            RestaurantPhoto.objects.create(
+                restaurant=restaurant, image=ContentFile(photo_data[photo % 4], f'{index}_{photo}.jpg'),
+            )
+        restaurants.append(restaurant)
+    for index in range(options['menu_items']):
+        item = MenuItem.objects.create(restaurant=restaurants[0], name=f"Dish {index}", description="Tasty")
+        MenuItemPhoto.objects.create(menu_item=item, image=ContentFile(photo_data[index % 4], f'dish_{index}.jpg'))
+    return restaurants[0]
+
+def run(options, stdout):
+    media_root = tempfile.mkdtemp()
+    results = {}
+    try:
+        with benchmark_database(), override_settings(MEDIA_ROOT=media_root), rolled_back():
+            restaurant = seed(options)
+            client = Client()
+            client.force_login(User.objects.create_user('benchmark'))
+            pages = {
+                'home': reverse('home'),
+                'restaurant-list': reverse('restaurant-list'),
+                'restaurant-detail': reverse('restaurant-detail', args=[restaurant.pk]),
+                'restaurant_images': reverse('restaurant_images', args=[restaurant.pk]),
+            }
+            for mode, widths in (('original', ()), ('renditions', settings.RESTAURANTS_RENDITION_WIDTHS)):
+                with override_settings(RESTAURANTS_RENDITION_WIDTHS=widths):
+                    if widths:
+                        # Pages only schedule missing renditions, which
+                        # would wait for a commit that never comes here.
+                        for model in (RestaurantPhoto, MenuItemPhoto):
+                            for photo in model.objects.all():
+                                get_renditions(photo)
+                    for name, url in pages.items():
+                        results[name, mode] = page_bytes(client, url, options['viewport'], options['dpr'])
+    finally:
+        shutil.rmtree(media_root)
+
+    stdout.write(f"viewport {options['viewport']}px at {options['dpr']}x, photos {options['width']}px wide")
+    stdout.write(f"{'page':20} {'images':>6} {'original KB':>12} {'renditions KB':>14} {'saved':>7}")
+    passed = True
+    for name in pages:
+        html_before, images_before, count = results[name, 'original']
+        html_after, images_after, _ = results[name, 'renditions']
+        before, after = html_before + images_before, html_after + images_after
+        passed = passed and (after < before or not count)
+        stdout.write(
+            f"{name:20} {count:>6} {before / 1024:>12,.1f} {after / 1024:>14,.1f} {1 - after / before:>7.1%}"
+        )
+    return passed
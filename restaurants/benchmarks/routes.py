@@ -0,0 +1,330 @@
+"""
+Query count, DB time, render time and peak memory of every named route in
+restaurants/urls.py, checked against a stored baseline.
+
+The routes are requested against a seeded synthetic dataset in a throwaway
+test database, with a cold cache, so the numbers show what a cache miss
+costs. With --scale the dataset is re-seeded at several multiples of its
+size, which exposes views whose cost grows with the data.
+"""
+import json
+import math
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.template.backends.django import Template as BackendTemplate
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from restaurants import seeding
+
+BASELINE_PATH = Path(__file__).with_name('baselines') / 'routes.json'
+DEFAULT_DATASET = {'restaurants': 100, 'reviews': 1000, 'users': 30}
+# Exponent of time against data size above which a route is reported as
+# growing super-linearly in --scale mode.
+SUPERLINEAR_EXPONENT = 1.1
+
+@dataclass
+class Dataset:
+    sizes: dict
+    user: User
+    restaurant_id: int
+    review_id: int
+
+@dataclass
+class Route:
+    name: str
+    kwargs: object = None
+    query: dict = field(default_factory=dict)
+    method: str = 'get'
+    login: bool = True
+    label: str = None
+
+    def __post_init__(self):
+        self.label = self.label or self.name
+
+    def url(self, dataset):
+        return reverse(self.name, kwargs=self.kwargs(dataset) if self.kwargs else None)
+
+def restaurant(dataset):
+    return {'pk': dataset.restaurant_id}
+
+def review(dataset):
+    return {'pk': dataset.review_id}
+
+def toggled_restaurant(dataset):
+    return {'restaurant_id': dataset.restaurant_id}
+
+ROUTES = [
+    Route('home', login=False, label='home (anonymous)'),
+    Route('home'),
+    Route('register', login=False),
+    Route('restaurant-list'),
+    Route('restaurant-list', query={'q': 'spice', 'sort': 'rating_desc'}, label='restaurant-list (search)'),
+    Route('restaurant-list', query={'cursor': ''}, label='restaurant-list (cursor)'),
+    Route('restaurant-suggest', query={'q': 'sp'}),
+    Route('restaurant-detail', restaurant),
+    Route('add_review', restaurant),
+    Route('restaurant_reviews', restaurant),
+    Route('restaurant_images', restaurant),
+    Route('edit_review', review),
+    Route('delete_review', review),
+    Route('profile'),
+    Route('profile_edit'),
+    Route('bookmarks_list'),
+    Route('bookmark_toggle', toggled_restaurant, method='post'),
+    Route('visited_restaurants_list'),
+    Route('visited_toggle', toggled_restaurant, method='post'),
+    Route('api-restaurant-list'),
+    Route(
+        'api-restaurant-list', query={'include': 'cuisines,photos,menu_items.photos,rating_stats', 'page_size': 100},
+        label='api-restaurant-list (include)',
+    ),
+    Route('api-restaurant-detail', restaurant, query={'include': 'cuisines,rating_stats'}),
+    Route('api-restaurant-menu', restaurant, query={'include': 'photos'}),
+    Route('api-restaurant-photos', restaurant),
+    Route('api-restaurant-reviews', restaurant),
+]
+
+def add_arguments(parser):
+    parser.add_argument('--restaurants', type=int, default=DEFAULT_DATASET['restaurants'])
+    parser.add_argument('--reviews', type=int, default=DEFAULT_DATASET['reviews'])
+    parser.add_argument('--users', type=int, default=DEFAULT_DATASET['users'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=4, help="Timed requests per route (even, so toggles end unchanged)")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="Baseline file to compare against")
+    parser.add_argument('--update-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument(
+        '--time-tolerance', type=float, default=None,
+        help="Also fail when a route's median time exceeds the baseline by this factor",
+    )
+    parser.add_argument(
+        '--scale', type=int, nargs='+', default=None,
+        help="Re-run at these multiples of the dataset size and report how each route grows",
+    )
+
+def missing_routes():
+    """
+    Returns the named routes of restaurants/urls.py without a benchmark.
+    """
+    from restaurants.urls import urlpatterns
+    return {pattern.name for pattern in urlpatterns if pattern.name} - {route.name for route in ROUTES}
+
+def seed_dataset(restaurants, reviews, users, seed=0):
+    """
+    Seeds a synthetic dataset with restaurants.seeding and returns a Dataset
+    pointing at its most active user and one of that user's reviews.
+    """
+    result = seeding.seed(restaurants, reviews, users, seed=seed)
+    user = User.objects.get(pk=result.user_ids[0])
+    target = user.reviews.order_by('pk').first()
+    return Dataset(
+        sizes={'restaurants': restaurants, 'reviews': reviews, 'users': users},
+        user=user,
+        restaurant_id=target.restaurant_id,
+        review_id=target.pk,
+    )
+
+class QueryTimer:
+    """
+    Execute wrapper counting the queries run and the seconds spent in them.
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+@contextmanager
+def timed_rendering(samples):
+    """
+    Records the seconds spent rendering each top-level template, including
+    any queries the template triggers.
+    """
+    render = BackendTemplate.render
+
+    def timed_render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+
+    BackendTemplate.render = timed_render
+    try:
+        yield
+    finally:
+        BackendTemplate.render = render
+
+def request(client, route, dataset):
+    cache.clear()
+    response = getattr(client, route.method)(route.url(dataset), route.query)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{route.label} responded with {response.status_code}")
+    return response
+
+def measure_route(route, dataset, repeat=4, memory=True):
+    client = Client()
+    if route.login:
+        client.force_login(dataset.user)
+    request(client, route, dataset)
+
+    queries, totals, db_times, render_times = [], [], [], []
+    for _ in range(repeat):
+        renders, timer = [], QueryTimer()
+        with connection.execute_wrapper(timer), timed_rendering(renders):
+            started = time.perf_counter()
+            request(client, route, dataset)
+            totals.append(time.perf_counter() - started)
+        queries.append(timer.count)
+        db_times.append(timer.seconds)
+        render_times.append(sum(renders))
+
+    result = {
+        'queries': max(queries),
+        'total_ms': round(statistics.median(totals) * 1000, 2),
+        'db_ms': round(statistics.median(db_times) * 1000, 2),
+        'render_ms': round(statistics.median(render_times) * 1000, 2),
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            request(client, route, dataset)
+            result['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+def measure_routes(dataset, repeat=4, memory=True):
+    return {route.label: measure_route(route, dataset, repeat, memory) for route in ROUTES}
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(results, sizes, path=BASELINE_PATH):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as baseline_file:
+        json.dump({'dataset': sizes, 'routes': results}, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+def compare(results, baseline, time_tolerance=None):
+    """
+    Returns a description of every route that needs more queries than the
+    baseline, or more time when `time_tolerance` is given.
+    """
+    regressions = []
+    for label, result in results.items():
+        expected = baseline['routes'].get(label)
+        if expected is None:
+            regressions.append(f"{label}: not in the baseline")
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f"{label}: {result['queries']} queries, baseline {expected['queries']}")
+        if time_tolerance and result['total_ms'] > expected['total_ms'] * time_tolerance:
+            regressions.append(f"{label}: {result['total_ms']} ms, baseline {expected['total_ms']} ms")
+    return regressions
+
+def growth_exponent(sizes, values):
+    """
+    Slope of log(value) against log(size) between the smallest and largest
+    run: about 0 for constant cost, 1 for linear and above 1 for worse.
+    """
+    if values[0] <= 0 or values[-1] <= 0 or sizes[0] == sizes[-1]:
+        return 0.0
+    return math.log(values[-1] / values[0]) / math.log(sizes[-1] / sizes[0])
+
+@contextmanager
+def benchmark_database():
+    """
+    Runs the block against a freshly migrated test database that is
+    destroyed afterwards, leaving the configured database untouched.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+def write_table(stdout, results):
+    stdout.write(f"{'route':32} {'queries':>7} {'total ms':>9} {'db ms':>8} {'render ms':>9} {'peak KB':>9}")
+    for label, result in results.items():
+        stdout.write(
+            f"{label:32} {result['queries']:>7} {result['total_ms']:>9} {result['db_ms']:>8} "
+            f"{result['render_ms']:>9} {result.get('peak_kb', '-'):>9}"
+        )
+
+def run_baseline(options, stdout):
+    sizes = {name: options[name] for name in DEFAULT_DATASET}
+    with rolled_back():
+        dataset = seed_dataset(seed=options['seed'], **sizes)
+        results = measure_routes(dataset, options['repeat'])
+    write_table(stdout, results)
+
+    if options['update_baseline']:
+        save_baseline(results, sizes, options['baseline'])
+        stdout.write(f"Baseline written to {options['baseline']}")
+        return True
+    baseline = load_baseline(options['baseline'])
+    if baseline['dataset'] != sizes:
+        stdout.write(f"Baseline was recorded for {baseline['dataset']}; not comparing")
+        return True
+    regressions = compare(results, baseline, options['time_tolerance'])
+    for regression in regressions:
+        stdout.write(f"REGRESSION {regression}")
+    return not regressions
+
+def run_scaling(options, stdout):
+    scales = sorted(options['scale'])
+    runs = []
+    for scale in scales:
+        with rolled_back():
+            dataset = seed_dataset(
+                options['restaurants'] * scale, options['reviews'] * scale, options['users'] * scale, options['seed']
+            )
+            runs.append(measure_routes(dataset, options['repeat'], memory=False))
+
+    stdout.write(f"{'route':32} {'queries at x' + ' x'.join(map(str, scales)):>24} {'time exponent':>14}")
+    ok = True
+    for route in ROUTES:
+        queries = [run[route.label]['queries'] for run in runs]
+        exponent = growth_exponent(scales, [run[route.label]['total_ms'] for run in runs])
+        notes = []
+        if queries[-1] > queries[0]:
+            notes.append("query count grows with data")
+            ok = False
+        if exponent > SUPERLINEAR_EXPONENT:
+            notes.append("super-linear")
+        stdout.write(f"{route.label:32} {' / '.join(map(str, queries)):>24} {exponent:>14.2f}  {', '.join(notes)}")
+    return ok
+
+def run(options, stdout):
+    missing = missing_routes()
+    if missing:
+        stdout.write(f"Routes without a benchmark: {', '.join(sorted(missing))}")
+        return False
+    with benchmark_database():
+        if options['scale']:
+            return run_scaling(options, stdout)
+        return run_baseline(options, stdout)
@@ -0,0 +1,56 @@
+"""
+Latency of RestaurantSuggestView's in-memory index over a synthetic
+catalogue. Runs without a database.
+"""
+import random
+import time
+from restaurants.benchmarks import percentile
+from restaurants.suggest import Suggestion, SuggestionIndex
+
+WORDS = [
+    'spice', 'garden', 'palace', 'corner', 'house', 'kitchen', 'grill', 'bistro', 'cafe', 'express',
+    'royal', 'golden', 'dragon', 'lotus', 'tandoor', 'biryani', 'dosa', 'pizza', 'burger', 'curry',
+    'masala', 'coastal', 'urban', 'green', 'leaf', 'ocean', 'tiffin', 'mess', 'dhaba', 'bowl',
+]
+
+def add_arguments(parser):
+    parser.add_argument('--size', type=int, default=100_000, help="Number of synthetic restaurants")
+    parser.add_argument('--queries', type=int, default=20_000, help="Number of suggest lookups to time")
+    parser.add_argument('--target-ms', type=float, default=5.0, help="Maximum acceptable p99 latency")
+    parser.add_argument('--seed', type=int, default=0)
+
+def build_suggestions(size, rng):
+    suggestions = [
+        Suggestion(f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {index}", 'restaurant', index)
+        for index in range(size)
+    ]
+    suggestions.extend(Suggestion(f"City {index}", 'city') for index in range(max(1, size // 500)))
+    suggestions.extend(Suggestion(word.title(), 'cuisine', index) for index, word in enumerate(WORDS))
+    return suggestions
+
+def run(options, stdout):
+    rng = random.Random(options['seed'])
+    suggestions = build_suggestions(options['size'], rng)
+
+    started = time.perf_counter()
+    index = SuggestionIndex(suggestions)
+    build_seconds = time.perf_counter() - started
+
+    prefixes = []
+    for _ in range(options['queries']):
+        word = rng.choice(WORDS + ['zzz', 'qx'])
+        prefixes.append(word[:rng.randint(1, len(word))])
+
+    samples = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.suggest(prefix, 10)
+        samples.append((time.perf_counter() - started) * 1000)
+
+    p99 = percentile(samples, 0.99)
+    stdout.write(
+        f"suggest: {len(index)} keys built in {build_seconds:.2f}s; "
+        f"p50 {percentile(samples, 0.5):.3f} ms, p99 {p99:.3f} ms, max {max(samples):.3f} ms "
+        f"(target p99 < {options['target_ms']} ms)"
+    )
+    return p99 < options['target_ms']
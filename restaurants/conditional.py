@@ -0,0 +1,81 @@
+"""
+Conditional GET for the pages of a single restaurant.
+
+The validators are derived from stamps read in one query, without loading
+the page: the restaurant's updated_at (moved by changes to the restaurant,
+its cuisines, menu and photos) and cache_version, and its review count
+and latest review time. The ETag also covers what differs per user: the
+user, their CSRF secret, which forms on a 304'd page must still match, and
+whatever the view adds in get_user_parts(), such as bookmark state.
+"""
+import hashlib
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from .models import Restaurant
+
+def restaurant_stamps(restaurant_id):
+    """
+    Returns (updated_at, cache_version, rating_count, last_reviewed_at) of
+    the restaurant, raising Http404 when it does not exist.
+    """
+    stamps = Restaurant.objects.filter(pk=restaurant_id).values_list(
+        'updated_at', 'cache_version', 'rating_count', 'rating_stats__last_reviewed_at',
+    ).first()
+    if stamps is None:
+        raise Http404("No restaurant matches the given query.")
+    return stamps
+
+def make_etag(parts):
+    return 'W/"%s"' % hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+class ConditionalRestaurantPageMixin:
+    """
+    Answers GET requests for restaurant self.kwargs['pk'] with 304 Not
+    Modified when the client's copy is current, and sends ETag and
+    Last-Modified with every full response.
+    """
+    def get_user_parts(self):
+        """
+        Returns (parts, changed_at): values folded into the ETag for the
+        current user, and the Unix time they last changed, or None.
+        """
+        return [], None
+
+    def get_validators(self):
+        updated_at, cache_version, rating_count, last_reviewed_at = restaurant_stamps(self.kwargs['pk'])
+        user_parts, user_changed_at = self.get_user_parts()
+        etag = make_etag([
+            self.request.user.pk, self.request.META.get('CSRF_COOKIE'),
+            updated_at, cache_version, rating_count, last_reviewed_at, *user_parts,
+        ])
+        last_modified = max(
+            stamp.timestamp() if hasattr(stamp, 'timestamp') else stamp
+            for stamp in (updated_at, last_reviewed_at, user_changed_at) if stamp is not None
+        )
+        return etag, int(last_modified)
+
+    def get_not_modified(self):
+        """
+        Returns the 304 (or 412) response for the request, or None when
+        the page has to be rendered.
+        """
+        self.validators = self.get_validators()
+        etag, last_modified = self.validators
+        return get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+
+    def add_validators(self, response):
+        if response.status_code in (200, 304):
+            etag, last_modified = self.validators
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Revalidate every time, and keep per-user pages out of shared caches.
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+    def get(self, request, *args, **kwargs):
+        response = self.get_not_modified()
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.add_validators(response)
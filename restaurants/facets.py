@@ -0,0 +1,225 @@
+import threading
+from array import array
+from dataclasses import dataclass
+from functools import partial
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from .models import Cuisine, FacetCount, Restaurant
+from .routers import primary_reads
+from .versioning import bump_version, get_version
+
+VERSION_NAME = 'facets'
+Facet = FacetCount.Facet
+FOOD_TYPE_LABELS = dict(Restaurant.FoodType.choices)
+# Most frequent values listed per facet.
+MAX_VALUES = 10
+# Ids fetched per round trip when streaming a filtered queryset.
+ID_CHUNK_SIZE = 5000
+
+@dataclass(frozen=True)
+class FacetValue:
+    facet: str
+    value: str
+    label: str
+    count: int
+
+    @property
+    def params(self):
+        """
+        Query parameters of the RestaurantFilter narrowing the list to this
+        value. City and cuisine values match exactly through their own mode
+        parameter, so the shared `match` of the other filter is kept.
+        """
+        if self.facet in (Facet.CITY, Facet.CUISINE):
+            return {self.facet: self.label, f'{self.facet}_match': 'exact'}
+        return {self.facet: self.value}
+
+@dataclass(frozen=True)
+class FacetGroup:
+    facet: str
+    label: str
+    values: list
+
+def scalar_facet_values(food_type=None, open_status=None, city_key=None):
+    """
+    Returns the (facet, value) keys of a restaurant's single-valued facets,
+    mapped to their labels.
+    """
+    values = {}
+    if food_type:
+        values[(Facet.FOOD_TYPE, food_type)] = FOOD_TYPE_LABELS.get(food_type, food_type)
+    if open_status is not None:
+        values[(Facet.OPEN_STATUS, 'true' if open_status else 'false')] = 'Open' if open_status else 'Closed'
+    if city_key:
+        values[(Facet.CITY, city_key)] = city_key.title()
+    return values
+
+def cuisine_key(cuisine_id):
+    return (Facet.CUISINE, str(cuisine_id))
+
+def facet_deltas(removed=(), added=()):
+    deltas = {}
+    for key in removed:
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in added:
+        deltas[key] = deltas.get(key, 0) + 1
+    return deltas
+
+def invalidate_facet_index(using='default'):
+    # After commit, so no worker can rebuild from the old rows under the new version.
+    transaction.on_commit(partial(bump_version, VERSION_NAME), using=using)
+
+def apply_facet_changes(deltas, labels=None, using='default'):
+    """
+    Moves the stored counts by `deltas`, a mapping of (facet, value) keys
+    to count changes, with one UPDATE per changed key. Keys without a row
+    yet get one, labelled from `labels`.
+    """
+    labels = labels or {}
+    changed = False
+    for (facet, value), delta in deltas.items():
+        if not delta:
+            continue
+        changed = True
+        rows = FacetCount.objects.using(using).filter(facet=facet, value=value)
+        if rows.update(count=F('count') + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic(using=using):
+                FacetCount.objects.using(using).create(
+                    facet=facet, value=value, label=labels.get((facet, value), value), count=delta
+                )
+        except IntegrityError:
+            # Created by a concurrent write since the UPDATE.
+            rows.update(count=F('count') + delta)
+    if changed:
+        invalidate_facet_index(using)
+
+def rebuild_facet_counts(using='default'):
+    """
+    Recomputes every facet count from the restaurant and cuisine tables.
+    Returns the number of rows written.
+    """
+    restaurants = Restaurant.objects.using(using).order_by()
+    counts = {}
+    labels = {}
+    for food_type, open_status, city_key, count in restaurants.values_list(*Restaurant.FACET_FIELDS).annotate(
+        count=Count('pk')
+    ):
+        for key, label in scalar_facet_values(food_type, open_status, city_key).items():
+            counts[key] = counts.get(key, 0) + count
+            labels[key] = label
+    for pk, name, count in Cuisine.objects.using(using).annotate(count=Count('restaurants')).values_list(
+        'pk', 'name', 'count'
+    ):
+        counts[cuisine_key(pk)] = count
+        labels[cuisine_key(pk)] = name
+    rows = [
+        FacetCount(facet=facet, value=value, label=labels[facet, value], count=count)
+        for (facet, value), count in counts.items()
+    ]
+    with transaction.atomic(using=using):
+        FacetCount.objects.using(using).all().delete()
+        FacetCount.objects.using(using).bulk_create(rows)
+    invalidate_facet_index(using)
+    return len(rows)
+
+class FacetIndex:
+    """
+    Bitmaps of the restaurants having each facet value, held as Python
+    ints: bit i is set when the restaurant at position i of the sorted id
+    array has the value. Counting a value within any set of restaurants is
+    then one AND and a popcount.
+    """
+    def __init__(self, restaurant_ids, memberships, labels):
+        self.restaurant_ids = array('q', restaurant_ids)
+        self.positions = {pk: position for position, pk in enumerate(self.restaurant_ids)}
+        self.labels = labels
+        bits = {}
+        for key, restaurant_id in memberships:
+            position = self.positions.get(restaurant_id)
+            if position is not None:
+                if key not in bits:
+                    bits[key] = self.empty()
+                bits[key][position >> 3] |= 1 << (position & 7)
+        self.bitmaps = {key: int.from_bytes(data, 'little') for key, data in bits.items()}
+
+    def empty(self):
+        return bytearray((len(self.restaurant_ids) + 7) // 8)
+
+    def bitmap(self, restaurant_ids):
+        """
+        Returns the bitmap of the given restaurants, ignoring unknown ids.
+        """
+        data = self.empty()
+        for restaurant_id in restaurant_ids:
+            position = self.positions.get(restaurant_id)
+            if position is not None:
+                data[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(data, 'little')
+
+    def counts(self, bitmap):
+        return {key: (values & bitmap).bit_count() for key, values in self.bitmaps.items()}
+
+def load_facet_index():
+    rows = list(Restaurant.objects.order_by('pk').values_list('pk', *Restaurant.FACET_FIELDS))
+    labels = {cuisine_key(pk): name for pk, name in Cuisine.objects.values_list('pk', 'name')}
+
+    def memberships():
+        for pk, *values in rows:
+            for key, label in scalar_facet_values(*values).items():
+                labels[key] = label
+                yield key, pk
+        links = Restaurant.cuisines.through.objects.values_list('cuisine_id', 'restaurant_id')
+        for cuisine_id, restaurant_id in links.iterator():
+            yield cuisine_key(cuisine_id), restaurant_id
+
+    return FacetIndex([row[0] for row in rows], memberships(), labels)
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+def get_facet_index():
+    """
+    Returns this worker's index, rebuilding it from the database the first
+    time it is needed after a restaurant or cuisine change.
+    """
+    global _index, _index_version
+    version = get_version(VERSION_NAME)
+    if _index is None or _index_version != version:
+        with _lock:
+            if _index is None or _index_version != version:
+                with primary_reads():
+                    _index = load_facet_index()
+                _index_version = version
+    return _index
+
+def get_facets(restaurant_ids=None, limit=MAX_VALUES, restaurants=None):
+    """
+    Returns a FacetGroup with the most frequent values of every facet.
+    Counts over all restaurants are read from FacetCount. Counts within
+    `restaurant_ids`, or within a `restaurants` queryset, are computed from
+    the per-worker FacetIndex: the ids are streamed into a bitmap, from one
+    query for a queryset, and ANDed with each facet value's bitmap.
+    """
+    if restaurants is not None:
+        restaurant_ids = restaurants.order_by().values_list('pk', flat=True).iterator(chunk_size=ID_CHUNK_SIZE)
+    if restaurant_ids is None:
+        counts = {
+            (row.facet, row.value): (row.label, row.count)
+            for row in FacetCount.objects.filter(count__gt=0)
+        }
+    else:
+        index = get_facet_index()
+        counts = {
+            key: (index.labels[key], count)
+            for key, count in index.counts(index.bitmap(restaurant_ids)).items() if count
+        }
+    values = {facet: [] for facet in Facet}
+    for (facet, value), (label, count) in counts.items():
+        values[facet].append(FacetValue(facet, value, label, count))
+    return [
+        FacetGroup(facet, facet.label, sorted(values[facet], key=lambda value: (-value.count, value.label))[:limit])
+        for facet in Facet if values[facet]
+    ]
@@ -0,0 +1,208 @@
+import threading
+from array import array
+from bisect import bisect_left
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from .models import Cuisine, Restaurant, normalize_key
+from .routers import primary_reads
+from .versioning import bump_version, get_version
+
+VERSION_NAME = 'filter_engine'
+# RestaurantFilter parameters the engine evaluates. Requests using any other
+# filter (search, name, distance) go to the ORM.
+FILTERS = {'food_type', 'open_status', 'city', 'cuisines', 'match', 'city_match', 'cuisines_match', 'sort', 'radius'}
+# Sort -> (order array name, reversed). Descending sorts are the exact
+# reverse of the ascending ones, id tie-breaker included.
+SORTS = {
+    'cost_asc': ('cost', False),
+    'cost_desc': ('cost', True),
+    'rating_asc': ('rating', False),
+    'rating_desc': ('rating', True),
+}
+
+def filter_engine_enabled():
+    return getattr(settings, 'RESTAURANTS_FILTER_ENGINE', False)
+
+def invalidate_filter_engine(using='default'):
+    transaction.on_commit(partial(bump_version, VERSION_NAME), using=using)
+
+def matches(key, value, mode):
+    # Same semantics as restaurants.filters.key_lookup on the key columns.
+    if mode == 'exact':
+        return key == value
+    if mode == 'prefix':
+        return key.startswith(value)
+    return value in key
+
+class FilterEngine:
+    """
+    Snapshot of the filterable restaurant columns held in this worker.
+
+    Restaurants are numbered by their position in the sorted id array.
+    Every filter value has a bitset, a Python int with bit i set when the
+    restaurant at position i has the value, so a filter combination is a
+    few ANDs. Cost and rating orders are arrays of positions, scanned until
+    a page worth of set bits is found.
+    """
+    def __init__(self, rows, cuisine_links, cuisine_keys):
+        rows = sorted(rows)
+        self.restaurant_ids = array('q', (row[0] for row in rows))
+        self.size = len(self.restaurant_ids)
+        self.all = (1 << self.size) - 1
+        bits = {}
+        for position, (pk, food_type, open_status, spotlight, city_key, cost, rating) in enumerate(rows):
+            for key in (('food_type', food_type), ('open_status', open_status), ('spotlight', spotlight), ('city', city_key)):
+                self.set_bit(bits, key, position)
+        for restaurant_id, cuisine_id in cuisine_links:
+            position = self.position(restaurant_id)
+            if position is not None and cuisine_id in cuisine_keys:
+                self.set_bit(bits, ('cuisines', cuisine_keys[cuisine_id]), position)
+        self.bitsets = {key: int.from_bytes(data, 'little') for key, data in bits.items()}
+        self.orders = {
+            'cost': array('l', sorted(range(self.size), key=lambda position: rows[position][5])),
+            # Unrated restaurants first, as rating_asc sorts them.
+            'rating': array('l', sorted(
+                range(self.size), key=lambda position: (rows[position][6] is not None, rows[position][6] or 0)
+            )),
+        }
+
+    def set_bit(self, bits, key, position):
+        if key not in bits:
+            bits[key] = bytearray((self.size + 7) // 8)
+        bits[key][position >> 3] |= 1 << (position & 7)
+
+    def position(self, restaurant_id):
+        position = bisect_left(self.restaurant_ids, restaurant_id)
+        if position < self.size and self.restaurant_ids[position] == restaurant_id:
+            return position
+        return None
+
+    def bitset(self, facet, value):
+        return self.bitsets.get((facet, value), 0)
+
+    def matching(self, facet, value, mode):
+        """
+        Union of the bitsets of every key of `facet` matching `value`.
+        """
+        key = normalize_key(value)
+        if not key:
+            return self.all
+        bitset = 0
+        for (name, candidate), bits in self.bitsets.items():
+            if name == facet and matches(candidate, key, mode):
+                bitset |= bits
+        return bitset
+
+    def select(
+        self, food_type=None, open_status=None, spotlight=None, city=None, cuisines=None, match=None,
+        city_match=None, cuisines_match=None,
+    ):
+        bitset = self.all
+        if food_type:
+            bitset &= self.bitset('food_type', food_type)
+        if open_status is not None:
+            bitset &= self.bitset('open_status', open_status)
+        if spotlight is not None:
+            bitset &= self.bitset('spotlight', spotlight)
+        mode = match or 'contains'
+        if city:
+            bitset &= self.matching('city', city, city_match or mode)
+        if cuisines:
+            bitset &= self.matching('cuisines', cuisines, cuisines_match or mode)
+        return bitset
+
+    def positions(self, sort):
+        order, descending = SORTS.get(sort, (None, False))
+        if order is None:
+            return range(self.size)
+        return reversed(self.orders[order]) if descending else self.orders[order]
+
+    def ids(self, bitset, sort=None, start=0, stop=None):
+        """
+        Returns the ids of the restaurants in `bitset`, in `sort` order,
+        from the `start`th match up to but excluding the `stop`th.
+        """
+        data = bitset.to_bytes((self.size + 7) // 8, 'little')
+        ids = []
+        seen = 0
+        for position in self.positions(sort):
+            if stop is not None and seen >= stop:
+                break
+            if data[position >> 3] >> (position & 7) & 1:
+                if seen >= start:
+                    ids.append(self.restaurant_ids[position])
+                seen += 1
+        return ids
+
+class EngineResult:
+    """
+    The restaurants matched by the engine as a sequence Paginator can page
+    through. Its length is a popcount; slicing loads only the restaurants
+    of the slice from `queryset`.
+    """
+    def __init__(self, engine, bitset, sort, queryset):
+        self.engine = engine
+        self.bitset = bitset
+        self.sort = sort
+        self.queryset = queryset
+
+    def __len__(self):
+        return self.bitset.bit_count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.engine.ids(self.bitset, self.sort, index.start or 0, index.stop)
+        restaurants = self.queryset.in_bulk(ids)
+        # Restaurants deleted since the snapshot are skipped.
+        return [restaurants[pk] for pk in ids if pk in restaurants]
+
+    def restaurant_ids(self):
+        return self.engine.ids(self.bitset)
+
+def load_filter_engine():
+    rows = Restaurant.objects.values_list(
+        'pk', 'food_type', 'open_status', 'spotlight', 'city_key', 'cost_for_two', 'rating_avg'
+    )
+    links = Restaurant.cuisines.through.objects.values_list('restaurant_id', 'cuisine_id')
+    cuisine_keys = dict(Cuisine.objects.values_list('pk', 'name_key'))
+    return FilterEngine(list(rows.iterator()), links.iterator(), cuisine_keys)
+
+_engine = None
+_engine_version = None
+_lock = threading.Lock()
+
+def get_filter_engine():
+    """
+    Returns this worker's engine, rebuilding it from the database the first
+    time it is needed after a restaurant, cuisine or review change.
+    """
+    global _engine, _engine_version
+    version = get_version(VERSION_NAME)
+    if _engine is None or _engine_version != version:
+        with _lock:
+            if _engine is None or _engine_version != version:
+                with primary_reads():
+                    _engine = load_filter_engine()
+                _engine_version = version
+    return _engine
+
+class FilterEngineMixin:
+    """
+    Pages list views from the in-process FilterEngine instead of SQL when
+    the RESTAURANTS_FILTER_ENGINE setting is on and get_engine_result()
+    can express the request. The database is then only asked for the
+    restaurants on the page.
+    """
+    engine_result = None
+
+    def get_engine_result(self, queryset):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        if filter_engine_enabled():
+            self.engine_result = self.get_engine_result(queryset)
+        if self.engine_result is not None:
+            queryset = self.engine_result
+        return super().paginate_queryset(queryset, page_size)
@@ -1,12 +1,73 @@
+import math
 import django_filters
-from .models import Restaurant
+from .models import Cuisine, Restaurant, normalize_key
 from django import forms
-from django.db.models import Avg
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from .geo import EARTH_RADIUS_KM, bounding_box, covering_prefixes
+from .search import get_search_backend
+
+class LatLngField(forms.CharField):
+    def to_python(self, value):
+        value = super().to_python(value)
+        if not value:
+            return None
+        try:
+            latitude, longitude = (float(part) for part in value.split(','))
+        except ValueError:
+            raise forms.ValidationError("Enter a location as latitude,longitude.")
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise forms.ValidationError("Latitude or longitude is out of range.")
+        return latitude, longitude
+
+class LatLngFilter(django_filters.CharFilter):
+    field_class = LatLngField
+
+def key_lookup(field_name, value, mode):
+    """
+    Returns the condition matching the normalized key column `field_name`
+    against `value`. Exact and prefix matches are equality and range
+    conditions the key's index can serve; contains is a substring scan.
+    """
+    key = normalize_key(value)
+    if not key:
+        return Q()
+    if mode == 'exact':
+        return Q(**{field_name: key})
+    if mode == 'prefix':
+        # Every string starting with `key` sorts below `key` with its last
+        # character bumped by one code point.
+        return Q(**{f'{field_name}__gte': key, f'{field_name}__lt': key[:-1] + chr(ord(key[-1]) + 1)})
+    return Q(**{f'{field_name}__contains': key})
+
+MATCH_CHOICES = [('contains', 'Contains'), ('prefix', 'Starts with'), ('exact', 'Exact')]
+
+def distance_km(latitude, longitude):
+    """
+    Returns the haversine distance in km from (latitude, longitude) to each
+    restaurant as a database expression.
+    """
+    point_latitude = math.radians(latitude)
+    half_dlat = (Radians('latitude') - point_latitude) / 2
+    half_dlng = (Radians('longitude') - math.radians(longitude)) / 2
+    a = Power(Sin(half_dlat), 2) + math.cos(point_latitude) * Cos(Radians('latitude')) * Power(Sin(half_dlng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
 
 class RestaurantFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method='search', label='Search')
     name = django_filters.CharFilter(field_name='name', lookup_expr='icontains', label='Name')
-    city = django_filters.CharFilter(field_name='city', lookup_expr='icontains', label='City')
-    cuisines = django_filters.CharFilter(field_name='cuisines__name', lookup_expr='icontains', label='Cuisine')
+    city = django_filters.CharFilter(method='filter_city', label='City')
+    cuisines = django_filters.CharFilter(method='filter_cuisines', label='Cuisine')
+    match = django_filters.ChoiceFilter(
+        choices=MATCH_CHOICES,
+        method='filter_match',
+        label='City/cuisine match',
+        empty_label='City/Cuisine Match',
+    )
+    # Per-filter modes overriding `match`, set by the facet links so that
+    # picking a city or cuisine leaves the mode of the other one alone.
+    city_match = django_filters.ChoiceFilter(choices=MATCH_CHOICES, method='filter_match', widget=forms.HiddenInput)
+    cuisines_match = django_filters.ChoiceFilter(choices=MATCH_CHOICES, method='filter_match', widget=forms.HiddenInput)
     food_type = django_filters.ChoiceFilter(
         choices=[('', 'Select Food Type')] + Restaurant.FoodType.choices, 
         field_name='food_type',
@@ -24,6 +85,9 @@ class RestaurantFilter(django_filters.FilterSet):
         )
     )
 
+    near = LatLngFilter(method='filter_near', label='Near (lat,lng)')
+    radius = django_filters.NumberFilter(method='filter_radius', label='Radius (km)', min_value=0.1, max_value=100)
+
     sort = django_filters.ChoiceFilter(
         choices=[
                 ('', 'Sort By'),
@@ -31,29 +95,83 @@ class RestaurantFilter(django_filters.FilterSet):
                 ('cost_desc', 'Cost ↓'),
                 ('rating_asc', 'Rating ↑'),
                 ('rating_desc', 'Rating ↓'),
+                ('distance', 'Distance'),
             ],
             label='Sort By',
             method = 'sort_by',
             empty_label = None
     )
 
-    def sort_by(self, queryset, name, value):
-        queryset = queryset.annotate(avg_rating=Avg('reviewed_by_user__rating'))
+    # Ratings are served from the stored Restaurant.rating_avg column (see
+    # restaurant_rating_idx). Unrated restaurants keep the placement the old
+    # Avg() annotation had on SQLite: first when ascending, last when
+    # descending, on every backend. The id tie-breaker makes pages stable.
+    sort_options = {
+        'cost_asc': ('cost_for_two', 'id'),
+        'cost_desc': ('-cost_for_two', '-id'),
+        'rating_asc': (F('rating_avg').asc(nulls_first=True), 'id'),
+        'rating_desc': (F('rating_avg').desc(nulls_last=True), '-id'),
+        'distance': ('distance_km', 'id'),
+    }
+    default_radius_km = 5
 
-        sort_options = {
-            'cost_asc': 'cost_for_two',
-            'cost_desc': '-cost_for_two',
-            'rating_asc': 'avg_rating',
-            'rating_desc': '-avg_rating',
-        }
+    def filter_match(self, queryset, name, value):
+        # Only read by filter_city and filter_cuisines.
+        return queryset
 
-        order_by_field = sort_options.get(value)
-        if order_by_field:
-            queryset = queryset.order_by(order_by_field)
+    def match_mode(self, name):
+        cleaned_data = self.form.cleaned_data
+        return cleaned_data.get(f'{name}_match') or cleaned_data.get('match') or 'contains'
+
+    def filter_city(self, queryset, name, value):
+        return queryset.filter(key_lookup('city_key', value, self.match_mode(name)))
+
+    def filter_cuisines(self, queryset, name, value):
+        """
+        Keeps restaurants serving a matching cuisine. EXISTS keeps each
+        restaurant once however many of its cuisines match.
+        """
+        cuisines = Cuisine.objects.filter(key_lookup('name_key', value, self.match_mode(name)))
+        links = Restaurant.cuisines.through.objects.filter(restaurant_id=OuterRef('pk'), cuisine__in=cuisines)
+        return queryset.filter(Exists(links))
+
+    def filter_radius(self, queryset, name, value):
+        # Only read by filter_near.
+        return queryset
+
+    def filter_near(self, queryset, name, value):
+        """
+        Keeps restaurants within `radius` km of `value`, nearest first. The
+        geohash index and a latitude band narrow the candidates before the
+        database computes their haversine distances, so the statement has
+        the same few parameters however many restaurants are nearby.
+        """
+        latitude, longitude = value
+        radius = float(self.form.cleaned_data.get('radius') or self.default_radius_km)
+        cells = Q()
+        for prefix in covering_prefixes(latitude, longitude, radius):
+            cells |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+        min_lat, max_lat, _, _ = bounding_box(latitude, longitude, radius)
+        return queryset.filter(cells, latitude__gte=min_lat, latitude__lte=max_lat).annotate(
+            distance_km=distance_km(latitude, longitude),
+        ).filter(distance_km__lte=radius).order_by('distance_km', 'id')
+
+    def search(self, queryset, name, value):
+        return get_search_backend(queryset.db).filter_queryset(queryset, value)
+
+    def sort_by(self, queryset, name, value):
+        ordering = self.sort_options.get(value)
+        if value == 'distance' and 'distance_km' not in queryset.query.annotations:
+            ordering = None
+        if ordering:
+            queryset = queryset.order_by(*ordering)
 
         return queryset
 
     class Meta:
         model = Restaurant
-        fields = ['name', 'city', 'cuisines', 'food_type', 'open_status', 'sort']
+        fields = [
+            'q', 'name', 'city', 'cuisines', 'match', 'city_match', 'cuisines_match', 'food_type', 'open_status',
+            'near', 'radius', 'sort',
+        ]
 
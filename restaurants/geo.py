@@ -0,0 +1,86 @@
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_PRECISION = 12
+
+def encode_geohash(latitude, longitude, precision=MAX_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+def cell_size(precision):
+    """
+    Returns the (height, width) in degrees of a geohash cell.
+    """
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lng_bits
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(latitude, longitude, radius_km):
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    lng_delta = 180.0 if cos_lat < 1e-9 else min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+    return (
+        max(-90.0, latitude - lat_delta),
+        min(90.0, latitude + lat_delta),
+        longitude - lng_delta,
+        longitude + lng_delta,
+    )
+
+def covering_prefixes(latitude, longitude, radius_km):
+    """
+    Returns the geohash prefixes of the cells covering the circle's bounding
+    box. The precision is the finest one whose cells are still at least as
+    large as the radius, so the box spans at most three cells per axis.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    precision = 1
+    for candidate in range(MAX_PRECISION, 0, -1):
+        height, width = cell_size(candidate)
+        narrowest = width * KM_PER_DEGREE * math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+        if height * KM_PER_DEGREE >= radius_km and narrowest >= radius_km:
+            precision = candidate
+            break
+    height, width = cell_size(precision)
+
+    prefixes = set()
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            wrapped_lng = (lng + 180.0) % 360.0 - 180.0
+            prefixes.add(encode_geohash(min(lat, 90.0 - 1e-9), wrapped_lng, precision))
+            if lng >= max_lng:
+                break
+            lng = min(lng + width, max_lng)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return sorted(prefixes)
@@ -0,0 +1,116 @@
+"""
+Concurrent assembly of view context from independent loaders.
+
+A view declares its context as a dict of name -> zero-argument callable,
+each loading one value completely (a list, not a lazy queryset) and none
+depending on another. run_loaders() runs them on a shared thread pool and
+arun_loaders() gathers them on the same pool from async views, so the
+wall time is close to that of the slowest loader. Every pool thread uses
+its own database connection and a copy of the caller's context, so the
+database routing of the request (restaurants.routers) applies to it.
+Those connections are kept open between requests for
+RESTAURANTS_LOADER_CONN_MAX_AGE seconds whatever CONN_MAX_AGE says, so
+the database has to accept that many more connections per process.
+
+Other connections cannot see writes not yet committed on the caller's, so
+loaders run one after another in the calling thread while it is inside a
+transaction (ATOMIC_REQUESTS, TestCase) or when RESTAURANTS_LOADER_WORKERS
+is 0.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+_executor = None
+_lock = threading.Lock()
+
+def loader_workers():
+    return getattr(settings, 'RESTAURANTS_LOADER_WORKERS', 4)
+
+def loader_conn_max_age():
+    return getattr(settings, 'RESTAURANTS_LOADER_CONN_MAX_AGE', 60)
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(loader_workers(), thread_name_prefix='restaurants-loader')
+    return _executor
+
+def can_fan_out():
+    if loader_workers() <= 0:
+        return False
+    return not any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+def timed(loader):
+    started = time.perf_counter()
+    value = loader()
+    return value, (time.perf_counter() - started) * 1000
+
+def open_aliases():
+    return {connection.alias for connection in connections.all(initialized_only=True) if connection.connection is not None}
+
+def pooled(loader):
+    """
+    Runs `loader` on a pool thread. Connections it opens live for
+    RESTAURANTS_LOADER_CONN_MAX_AGE seconds (None for no limit) instead of
+    CONN_MAX_AGE, whose default of 0 would reconnect for every loader;
+    afterwards, as at the end of a request, unusable or expired ones are
+    closed.
+    """
+    already_open = open_aliases()
+    try:
+        return timed(loader)
+    finally:
+        max_age = loader_conn_max_age()
+        for connection in connections.all(initialized_only=True):
+            if connection.connection is not None and connection.alias not in already_open:
+                connection.close_at = None if max_age is None else time.monotonic() + max_age
+            connection.close_if_unusable_or_obsolete()
+
+def collect(loaders, results):
+    values, timings = {}, {}
+    for name, (value, ms) in zip(loaders, results):
+        values[name] = value
+        timings[name] = ms
+    return values, timings
+
+def run_serially(loaders):
+    return collect(loaders, [timed(loader) for loader in loaders.values()])
+
+def run_loaders(loaders):
+    """
+    Runs the callables in `loaders` and returns two dicts keyed by loader
+    name: their values and their durations in milliseconds. The first
+    exception raised by a loader is re-raised.
+    """
+    if not can_fan_out():
+        return run_serially(loaders)
+    futures = [get_executor().submit(contextvars.copy_context().run, pooled, loader) for loader in loaders.values()]
+    return collect(loaders, [future.result() for future in futures])
+
+async def arun_loaders(loaders):
+    """
+    Async run_loaders(): gathers the loaders on the loader pool.
+    """
+    # The request's connection lives on its sync thread, not the event loop.
+    if not await sync_to_async(can_fan_out)():
+        return await sync_to_async(run_serially)(loaders)
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(executor, contextvars.copy_context().run, pooled, loader) for loader in loaders.values()
+    ))
+    return collect(loaders, results)
+
+def server_timing(timings):
+    """
+    Formats loader durations as a Server-Timing header value.
+    """
+    return ', '.join(f'{name};dur={ms:.2f}' for name, ms in timings.items())
@@ -0,0 +1,18 @@
+from importlib import import_module
+from django.core.management.base import BaseCommand, CommandError
+from restaurants.benchmarks import BENCHMARKS
+
+class Command(BaseCommand):
+    help = "Run one of the performance benchmarks in restaurants.benchmarks"
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', required=True)
+        for name, module_path in BENCHMARKS.items():
+            module = import_module(module_path)
+            subparser = subparsers.add_parser(name, help=(module.__doc__ or '').strip().splitlines()[0])
+            module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        module = import_module(BENCHMARKS[options['benchmark']])
+        if not module.run(options, self.stdout):
+            raise CommandError(f"Benchmark '{options['benchmark']}' missed its target")
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from restaurants.models import MenuItemPhoto, RestaurantPhoto
+from restaurants.renditions import generate_renditions, rendition_names
+from restaurants.storage import (
+    ContentAddressedStorage, file_fields, is_content_addressed, is_referenced, referenced_names, walk,
+)
+
+PHOTO_MODELS = (RestaurantPhoto, MenuItemPhoto)
+
+class Command(BaseCommand):
+    help = (
+        "Move stored files to content-addressed names, remaking photo renditions, "
+        "and optionally delete files no row references"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gc', action='store_true', help="Delete unreferenced files after migrating")
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help="Keep unreferenced files modified less than this many seconds ago, as uploads may still be committing",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without changing it")
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError("The default storage is not restaurants.storage.ContentAddressedStorage")
+        self.dry_run = options['dry_run']
+        for model, field in file_fields():
+            self.migrate(model, field)
+        if options['gc']:
+            self.collect_garbage(options['grace'])
+
+    def migrate(self, model, field):
+        names = (
+            model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .values_list(field, flat=True).distinct()
+        )
+        moved = 0
+        for name in [name for name in names if not is_content_addressed(name)]:
+            if not default_storage.exists(name):
+                self.stderr.write(f"Skipping {name}: file is missing")
+                continue
+            moved += 1
+            if self.dry_run:
+                continue
+            with default_storage.open(name) as file:
+                new_name = default_storage.save(name, file)
+            rows = model._default_manager.filter(**{field: name})
+            photos = list(rows) if model in PHOTO_MODELS else []
+            rows.update(**{field: new_name})
+            for photo in photos:
+                setattr(photo, field, new_name)
+                generate_renditions(photo)
+            if not is_referenced(name):
+                default_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} {model._meta.verbose_name} files ({field})"))
+
+    def collect_garbage(self, grace):
+        keep = referenced_names().union(*(rendition_names(model) for model in PHOTO_MODELS))
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        deleted = 0
+        for name in list(walk(default_storage)):
+            if name in keep or default_storage.get_modified_time(name) > cutoff:
+                continue
+            deleted += 1
+            if not self.dry_run:
+                default_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unreferenced files"))
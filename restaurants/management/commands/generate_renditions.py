@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from restaurants.models import MenuItemPhoto, RestaurantPhoto
+from restaurants.renditions import generate_renditions
+
+class Command(BaseCommand):
+    help = "Make the JPEG and WebP renditions of restaurant and menu item photos that lack them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Remake renditions that already exist")
+
+    def handle(self, *args, **options):
+        for model in (RestaurantPhoto, MenuItemPhoto):
+            made = 0
+            for photo in model.objects.exclude(image='').iterator():
+                if options['force'] or (photo.renditions or {}).get('source') != photo.image.name:
+                    generate_renditions(photo)
+                    made += 1
+            self.stdout.write(self.style.SUCCESS(f"Made renditions of {made} {model._meta.verbose_name_plural}"))
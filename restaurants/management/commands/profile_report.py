@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from restaurants.profiling import load_profiles
+
+class Command(BaseCommand):
+    help = "Summarise the per-route request profiles written by ProfilingMiddleware"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=getattr(settings, 'RESTAURANTS_PROFILING_OUTPUT', None))
+        parser.add_argument('--sort', choices=['total', 'p99', 'queries', 'requests'], default='total')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path']) as profile_file:
+                routes = load_profiles(profile_file)
+        except (OSError, TypeError) as error:
+            raise CommandError(f"Cannot read profiles: {error}")
+
+        def sort_key(item):
+            histograms = item[1].histograms
+            return {
+                'total': histograms['total_ms'].total,
+                'p99': histograms['total_ms'].percentile(0.99),
+                'queries': histograms['queries'].total / max(1, histograms['queries'].count),
+                'requests': histograms['total_ms'].count,
+            }[options['sort']]
+
+        self.stdout.write(
+            f"{'route':36} {'requests':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+            f"{'avg queries':>11} {'avg db ms':>9} {'avg render ms':>13}"
+        )
+        for route, profile in sorted(routes.items(), key=sort_key, reverse=True):
+            total, queries = profile.histograms['total_ms'], profile.histograms['queries']
+            db, render = profile.histograms['db_ms'], profile.histograms['render_ms']
+            count = max(1, total.count)
+            self.stdout.write(
+                f"{route:36} {total.count:>8} {total.percentile(0.5):>7} {total.percentile(0.95):>7} "
+                f"{total.percentile(0.99):>7} {queries.total / count:>11.1f} {db.total / count:>9.1f} "
+                f"{render.total / count:>13.1f}"
+            )
+            for sql, requests in profile.duplicates.most_common(3):
+                self.stdout.write(f"    repeated in {requests} requests: {sql[:120]}")
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from restaurants.facets import rebuild_facet_counts
+
+class Command(BaseCommand):
+    help = "Recompute the stored facet counts from the restaurant and cuisine tables"
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet counts"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from restaurants.filter_engine import invalidate_filter_engine
+from restaurants.page_cache import invalidate_home_page
+from restaurants.ratings import rebuild_rating_aggregates
+
+class Command(BaseCommand):
+    help = "Recompute the stored rating aggregates of every restaurant from its reviews"
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates()
+        invalidate_home_page()
+        invalidate_filter_engine()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates for {updated} restaurants"))
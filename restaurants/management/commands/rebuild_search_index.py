@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from restaurants.search import get_search_backend
+
+class Command(BaseCommand):
+    help = "Drop and rebuild the restaurant full-text search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias holding the index")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {type(backend).__name__}"))
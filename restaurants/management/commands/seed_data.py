@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from restaurants.seeding import seed
+
+class Command(BaseCommand):
+    help = "Bulk-insert a reproducible synthetic dataset with Zipf-skewed popularity"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=5_000)
+        parser.add_argument('--reviews', type=int, default=100_000)
+        parser.add_argument('--bookmarks', type=int, default=None, help="Defaults to half the number of reviews")
+        parser.add_argument('--visits', type=int, default=None, help="Defaults to the number of reviews")
+        parser.add_argument('--cuisines', type=int, default=24)
+        parser.add_argument('--menu-items', type=int, default=5, help="Average menu items per restaurant")
+        parser.add_argument('--photos', type=int, default=2, help="Photos per restaurant")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of restaurant and user popularity")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--password', default=None, help="Password of the seeded users; unusable when omitted")
+        parser.add_argument('--no-rebuild', action='store_true', help="Skip rebuilding rating aggregates and the search index")
+
+    def handle(self, *args, **options):
+        try:
+            result = seed(
+                options['restaurants'],
+                options['reviews'],
+                options['users'],
+                cuisines=options['cuisines'],
+                menu_items=options['menu_items'],
+                photos=options['photos'],
+                bookmarks=options['bookmarks'],
+                visits=options['visits'],
+                exponent=options['zipf'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                password=options['password'],
+                rebuild=not options['no_rebuild'],
+                log=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        summary = ', '.join(f"{count:,} {name}" for name, count in result.counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary}"))
@@ -0,0 +1,24 @@
+import sqlite3
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from restaurants.routers import PRIMARY, read_replicas
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database over its local replicas, standing in for replication"
+
+    def handle(self, *args, **options):
+        replicas = read_replicas()
+        if not replicas:
+            raise CommandError("No replicas configured; set DATABASE_REPLICAS")
+        primary = connections[PRIMARY]
+        if primary.vendor != 'sqlite':
+            raise CommandError("Only SQLite replicas can be synced locally; other databases replicate themselves")
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f"Copied {PRIMARY} to {alias}"))
@@ -0,0 +1,182 @@
+import time
+from array import array
+from bisect import bisect_left, insort
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+from .models import Bookmark, Restaurant, Visit
+from .routers import primary_reads
+from .versioning import bump_version, get_version
+
+KINDS = ('bookmarks', 'visits')
+MODELS = {'bookmarks': Bookmark, 'visits': Visit}
+
+def get_related_manager(user, kind):
+    return getattr(user, kind)
+
+def cache_timeout():
+    return getattr(settings, 'RESTAURANTS_MEMBERSHIP_CACHE_TIMEOUT', 60 * 60)
+
+def version_name(kind, user_id):
+    return f'{kind}:{user_id}'
+
+def data_key(kind, user_id, version):
+    return f'restaurants:{kind}:{user_id}:{version}'
+
+def changed_key(kind, user_id):
+    return f'restaurants:{kind}:{user_id}:changed_at'
+
+def get_changed_at(user_id, kind):
+    """
+    Returns the Unix time the user's set of the given kind last changed.
+    When that was not recorded, or has been evicted, the current time is
+    stored and returned instead, which is never earlier than the change.
+    """
+    key = changed_key(kind, user_id)
+    changed_at = cache.get(key)
+    if changed_at is None:
+        cache.add(key, time.time(), timeout=None)
+        changed_at = cache.get(key, time.time())
+    return changed_at
+
+def pack(restaurant_ids):
+    return array('q', sorted(restaurant_ids)).tobytes()
+
+def unpack(data):
+    restaurant_ids = array('q')
+    restaurant_ids.frombytes(data)
+    return restaurant_ids
+
+def contains(restaurant_ids, restaurant_id):
+    position = bisect_left(restaurant_ids, restaurant_id)
+    return position < len(restaurant_ids) and restaurant_ids[position] == restaurant_id
+
+def get_cached_ids(user_id, kind):
+    """
+    Returns the user's restaurant ids of the given kind as a sorted
+    array('q'), or None when they are not cached.
+    """
+    data = cache.get(data_key(kind, user_id, get_version(version_name(kind, user_id))))
+    return None if data is None else unpack(data)
+
+def get_restaurant_ids(user, kind):
+    """
+    Returns every restaurant id the user has bookmarked or visited as a
+    sorted array('q'), loading and caching it on a miss.
+    """
+    version = get_version(version_name(kind, user.pk))
+    data = cache.get(data_key(kind, user.pk, version))
+    if data is None:
+        with primary_reads():
+            data = pack(get_related_manager(user, kind).order_by().values_list('restaurant_id', flat=True))
+        cache.set(data_key(kind, user.pk, version), data, cache_timeout())
+    return unpack(data)
+
+def get_membership(user, kind, restaurant_ids=None, scope='all'):
+    """
+    Returns the set of `restaurant_ids` (all ids when None) the user has
+    bookmarked or visited. With scope='page', a cache miss only queries the
+    given ids instead of loading and caching the user's whole history.
+    """
+    if not user.is_authenticated:
+        return set()
+    cached = get_cached_ids(user.pk, kind)
+    if cached is None and scope == 'page' and restaurant_ids is not None:
+        return set(
+            get_related_manager(user, kind).filter(restaurant_id__in=restaurant_ids)
+            .order_by().values_list('restaurant_id', flat=True)
+        )
+    all_ids = cached if cached is not None else get_restaurant_ids(user, kind)
+    if restaurant_ids is None:
+        return set(all_ids)
+    return {restaurant_id for restaurant_id in restaurant_ids if contains(all_ids, restaurant_id)}
+
+def record_change(user_id, kind, restaurant_id, added):
+    """
+    Called after a bookmark or visit is committed. Moves the user's set to a
+    new version and, when no other change raced with this one, stores the
+    patched set under it so the next page render needs no query.
+    """
+    cache.set(changed_key(kind, user_id), time.time(), timeout=None)
+    name = version_name(kind, user_id)
+    version = get_version(name)
+    data = cache.get(data_key(kind, user_id, version))
+    new_version = bump_version(name)
+    if data is None or new_version != version + 1:
+        return
+    restaurant_ids = unpack(data)
+    position = bisect_left(restaurant_ids, restaurant_id)
+    present = position < len(restaurant_ids) and restaurant_ids[position] == restaurant_id
+    if added and not present:
+        insort(restaurant_ids, restaurant_id)
+    elif not added and present:
+        del restaurant_ids[position]
+    cache.set(data_key(kind, user_id, new_version), restaurant_ids.tobytes(), cache_timeout())
+
+def write_connection(kind):
+    return connections[router.db_for_write(MODELS[kind])]
+
+def add_restaurant(user_id, kind, restaurant_id):
+    """
+    Adds the restaurant to the user's bookmarks or visits with a single
+    INSERT ... SELECT that skips an existing row, so concurrent adds never
+    fail on the unique (user, restaurant) constraint. Returns True when a
+    row was inserted, and False when it already existed or the restaurant
+    does not exist.
+    """
+    connection = write_connection(kind)
+    quote = connection.ops.quote_name
+    opts, restaurant_opts = MODELS[kind]._meta, Restaurant._meta
+    stamp = next(field for field in opts.concrete_fields if getattr(field, 'auto_now_add', False))
+    columns = ', '.join(quote(column) for column in (
+        opts.get_field('user').column, opts.get_field('restaurant').column, stamp.column,
+    ))
+    restaurant_pk = quote(restaurant_opts.pk.column)
+    sql = ' '.join(part for part in (
+        connection.ops.insert_statement(on_conflict=OnConflict.IGNORE), quote(opts.db_table), f'({columns})',
+        f'SELECT %s, {restaurant_pk}, %s FROM {quote(restaurant_opts.db_table)} WHERE {restaurant_pk} = %s',
+        connection.ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None),
+    ) if part)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, stamp.get_db_prep_save(timezone.now(), connection), restaurant_id])
+        added = cursor.rowcount == 1
+    if added:
+        # The row bypassed save(), so the post_save receiver's cache update
+        # is scheduled here.
+        transaction.on_commit(partial(record_change, user_id, kind, restaurant_id, True), using=connection.alias)
+    return added
+
+def remove_restaurant(user_id, kind, restaurant_id):
+    """
+    Removes the restaurant from the user's bookmarks or visits with a
+    single DELETE. Returns True when a row was deleted.
+    """
+    connection = write_connection(kind)
+    quote = connection.ops.quote_name
+    opts = MODELS[kind]._meta
+    sql = 'DELETE FROM {} WHERE {} = %s AND {} = %s'.format(
+        quote(opts.db_table), quote(opts.get_field('user').column), quote(opts.get_field('restaurant').column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, restaurant_id])
+        removed = cursor.rowcount > 0
+    if removed:
+        transaction.on_commit(partial(record_change, user_id, kind, restaurant_id, False), using=connection.alias)
+    return removed
+
+def toggle_restaurant(user_id, kind, restaurant_id):
+    """
+    Removes the restaurant from the user's bookmarks or visits, or adds it
+    when there was nothing to remove. Returns whether it is now included,
+    or None when the restaurant does not exist.
+    """
+    if remove_restaurant(user_id, kind, restaurant_id):
+        return False
+    if add_restaurant(user_id, kind, restaurant_id):
+        return True
+    # Nothing was deleted or inserted: either a concurrent request added
+    # the row between the two statements, or there is no such restaurant.
+    return True if Restaurant.objects.filter(pk=restaurant_id).exists() else None
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+import django.db.models.deletion
+
+STAR_FIELDS = {1: 'one_star', 2: 'two_star', 3: 'three_star', 4: 'four_star', 5: 'five_star'}
+
+
+def backfill_rating_stats(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    Review = apps.get_model('restaurants', 'Review')
+    RestaurantRatingStats = apps.get_model('restaurants', 'RestaurantRatingStats')
+    RestaurantRatingStats.objects.bulk_create(
+        [RestaurantRatingStats(restaurant_id=pk) for pk in Restaurant.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000,
+    )
+    reviews = Review.objects.filter(restaurant=OuterRef('restaurant_id')).order_by().values('restaurant')
+    RestaurantRatingStats.objects.update(
+        last_reviewed_at=Subquery(
+            Review.objects.filter(restaurant=OuterRef('restaurant_id')).order_by('-updated_at').values('updated_at')[:1]
+        ),
+        **{
+            field: Coalesce(Subquery(reviews.filter(rating=star).annotate(total=Count('pk')).values('total')), 0)
+            for star, field in STAR_FIELDS.items()
+        },
+    )
+    prior_mean = getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+    prior_weight = getattr(settings, 'RATING_PRIOR_WEIGHT', 10)
+    rating_sum = Value(prior_mean * prior_weight)
+    count = Value(prior_weight)
+    for star, field in STAR_FIELDS.items():
+        rating_sum = rating_sum + F(field) * star
+        count = count + F(field)
+    RestaurantRatingStats.objects.update(weighted_score=Cast(rating_sum, FloatField()) / count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0006_restaurant_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantRatingStats',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='restaurants.restaurant')),
+                ('one_star', models.PositiveIntegerField(default=0)),
+                ('two_star', models.PositiveIntegerField(default=0)),
+                ('three_star', models.PositiveIntegerField(default=0)),
+                ('four_star', models.PositiveIntegerField(default=0)),
+                ('five_star', models.PositiveIntegerField(default=0)),
+                ('last_reviewed_at', models.DateTimeField(blank=True, help_text='When the most recently written review was last updated', null=True)),
+                ('weighted_score', models.FloatField(blank=True, help_text='Average rating pulled towards the site-wide prior for restaurants with few reviews', null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'restaurant rating stats',
+            },
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
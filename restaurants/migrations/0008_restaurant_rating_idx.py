@@ -0,0 +1,17 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0007_restaurantratingstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['rating_avg', 'id'], name='restaurant_rating_idx'),
+        ),
+    ]
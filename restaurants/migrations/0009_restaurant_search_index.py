@@ -0,0 +1,25 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:20
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from restaurants.search import get_search_backend
+    backend = get_search_backend(schema_editor.connection.alias)
+    backend.rebuild(apps.get_model('restaurants', 'Restaurant'))
+
+
+def drop_search_index(apps, schema_editor):
+    from restaurants.search import get_search_backend
+    get_search_backend(schema_editor.connection.alias).drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0008_restaurant_rating_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
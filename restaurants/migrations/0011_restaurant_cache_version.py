@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0010_restaurant_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Bumped whenever the restaurant, its photos or its reviews change'),
+        ),
+    ]
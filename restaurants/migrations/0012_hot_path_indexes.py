@@ -0,0 +1,37 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0011_restaurant_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='bookmark_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['cost_for_two', 'id'], name='restaurant_cost_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['food_type', 'id', 'open_status'], name='restaurant_type_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('spotlight', True)), fields=['id'], name='restaurant_spotlight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['restaurant', '-updated_at', '-created_at', '-id'], name='review_restaurant_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['user', '-visited_at', '-id'], name='visit_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.15 on 2026-10-18 04:03
+
+from django.db import migrations, models
+
+
+def normalize_key(value):
+    return ' '.join((value or '').split()).casefold()
+
+
+def backfill_keys(apps, schema_editor):
+    # One UPDATE per distinct value; there are far fewer cities and cuisine
+    # names than rows.
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    Cuisine = apps.get_model('restaurants', 'Cuisine')
+    for city in Restaurant.objects.order_by().values_list('city', flat=True).distinct():
+        Restaurant.objects.filter(city=city).update(city_key=normalize_key(city))
+    for name in Cuisine.objects.order_by().values_list('name', flat=True).distinct():
+        Cuisine.objects.filter(name=name).update(name_key=normalize_key(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuisine',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Normalized name used for case-insensitive lookups', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='city_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Normalized city used for case-insensitive lookups', max_length=60),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.15 on 2026-10-18 04:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_facet_counts(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    Cuisine = apps.get_model('restaurants', 'Cuisine')
+    FacetCount = apps.get_model('restaurants', 'FacetCount')
+    food_types = dict(Restaurant._meta.get_field('food_type').choices)
+    restaurants = Restaurant.objects.order_by()
+    rows = [
+        FacetCount(facet='food_type', value=food_type, label=food_types.get(food_type, food_type), count=count)
+        for food_type, count in restaurants.values_list('food_type').annotate(count=Count('pk'))
+    ]
+    rows += [
+        FacetCount(
+            facet='open_status', value='true' if open_status else 'false',
+            label='Open' if open_status else 'Closed', count=count,
+        )
+        for open_status, count in restaurants.values_list('open_status').annotate(count=Count('pk'))
+    ]
+    rows += [
+        FacetCount(facet='city', value=city_key, label=city_key.title(), count=count)
+        for city_key, count in restaurants.values_list('city_key').annotate(count=Count('pk')) if city_key
+    ]
+    rows += [
+        FacetCount(facet='cuisines', value=str(pk), label=name, count=count)
+        for pk, name, count in Cuisine.objects.annotate(count=Count('restaurants')).values_list('pk', 'name', 'count')
+    ]
+    FacetCount.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0013_normalized_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('cuisines', 'Cuisine'), ('food_type', 'Food type'), ('city', 'City'), ('open_status', 'Open status')], max_length=20)),
+                ('value', models.CharField(help_text="Food type, city key, cuisine id or 'true'/'false' for the open status", max_length=60)),
+                ('label', models.CharField(help_text='Value as shown in the sidebar', max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='facet_count_unique'),
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.15 on 2026-10-18 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0014_facet_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitemphoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized variants of the image, see restaurants.renditions'),
+        ),
+        migrations.AddField(
+            model_name='restaurantphoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized variants of the image, see restaurants.renditions'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-18 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0015_photo_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='When the restaurant, its cuisines, menu or photos last changed, or a review was deleted'),
+        ),
+    ]
@@ -1,8 +1,21 @@
-from django.db import models
-from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.core.validators import MaxValueValidator, MinValueValidator
 from decimal import Decimal
 from django.contrib.auth.models import User
-from django.db.models import Avg, Count
+from .geo import encode_geohash
+
+def normalize_key(value):
+    """
+    Returns the lookup key of a city or cuisine name: casefolded, trimmed
+    and with inner whitespace collapsed.
+    """
+    return ' '.join((value or '').split()).casefold()
+
+def with_key_field(kwargs, source, key):
+    # Writes the key column along with its source on partial saves.
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and source in update_fields:
+        kwargs['update_fields'] = set(update_fields) | {key}
 
 class Cuisine(models.Model):
     """
@@ -21,9 +34,22 @@ class Cuisine(models.Model):
         help_text="Optional description of the cuisine"
     )
 
+    name_key = models.CharField(
+        max_length=100,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Normalized name used for case-insensitive lookups"
+    )
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_key(self.name)
+        with_key_field(kwargs, 'name', 'name_key')
+        super().save(*args, **kwargs)
+
 class Restaurant(models.Model):
     """
     Represents a restaurant with details, cuisine,
@@ -49,6 +75,15 @@ class Restaurant(models.Model):
         help_text="City where the restaurant is located",
     )
 
+    # Casefolding can lengthen a string (ß -> ss), hence the wider key columns.
+    city_key = models.CharField(
+        max_length=60,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Normalized city used for case-insensitive lookups"
+    )
+
     cost_for_two = models.IntegerField(
         help_text="Average cost for two people"
     )
@@ -76,16 +111,120 @@ class Restaurant(models.Model):
         help_text="Set True to display the restaurant on homepage"
     )
 
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)],
+        help_text="Latitude of the restaurant in decimal degrees"
+    )
+
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)],
+        help_text="Longitude of the restaurant in decimal degrees"
+    )
+
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of the location, used to find nearby restaurants"
+    )
+
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Sum of all review ratings, maintained on review writes"
+    )
+
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of reviews, maintained on review writes"
+    )
+
+    rating_avg = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Average review rating, empty when there are no reviews"
+    )
+
+    cache_version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Bumped whenever the restaurant, its photos or its reviews change"
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="When the restaurant, its cuisines, menu or photos last changed, or a review was deleted"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating_avg', 'id'], name='restaurant_rating_idx'),
+            models.Index(fields=['cost_for_two', 'id'], name='restaurant_cost_idx'),
+            models.Index(fields=['food_type', 'id', 'open_status'], name='restaurant_type_open_idx'),
+            # Only the handful of spotlighted rows, in home page order.
+            models.Index(fields=['id'], condition=models.Q(spotlight=True), name='restaurant_spotlight_idx'),
+        ]
+
     def __str__(self):
         return self.name
-    
+
+    # Fields counted in FacetCount, see restaurants.facets.
+    FACET_FIELDS = ('food_type', 'open_status', 'city_key')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_facets()
+        return instance
+
+    def _remember_facets(self):
+        # Keeps the stored facet values around so the facet counts can be
+        # moved from the old values to the new ones on the next save.
+        self._loaded_facets = {name: self.__dict__.get(name) for name in self.FACET_FIELDS}
+
+    # Maintained by UPDATE ... F() statements on review and photo writes. A
+    # plain save() must not write back the possibly stale copies it holds.
+    DERIVED_FIELDS = {'rating_sum', 'rating_count', 'rating_avg', 'cache_version'}
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        self.city_key = normalize_key(self.city)
+        with_key_field(kwargs, 'city', 'city_key')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        elif update_fields is None and not args and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def cover_photo(self):
+        """
+        The first photo of the restaurant, read from prefetched photos when
+        the queryset used prefetch_related('restaurant_photos').
+        """
+        return min(self.restaurant_photos.all(), key=lambda photo: photo.pk, default=None)
+
     @property
     def average_rating(self):
-        return self.reviewed_by_user.aggregate(Avg('rating'))['rating__avg'] or 0
+        return self.rating_avg or 0
 
     @property
     def total_reviews(self):
-        return self.reviewed_by_user.count()
+        return self.rating_count
     
 class MenuItem(models.Model):
     """
@@ -118,6 +257,14 @@ class MenuItem(models.Model):
             models.CheckConstraint(check=models.Q(price__gte=0), name="price_non_negative")
         ]
 
+    @property
+    def cover_photo(self):
+        """
+        The first photo of the menu item, read from prefetched photos when
+        the queryset used prefetch_related('menu_item_photos').
+        """
+        return min(self.menu_item_photos.all(), key=lambda photo: photo.pk, default=None)
+
     def __str__(self):
         return f"{self.name} - {self.restaurant.name}"
 
@@ -138,6 +285,13 @@ class RestaurantPhoto(models.Model):
         help_text="Images of the restaurant"
     )
 
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized variants of the image, see restaurants.renditions"
+    )
+
     def __str__(self):
         return f"Photo of {self.restaurant.name}"
 
@@ -156,6 +310,13 @@ class MenuItemPhoto(models.Model):
         help_text="Image of the menu item"
     )
 
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized variants of the image, see restaurants.renditions"
+    )
+
     def __str__(self):
         return f"Photo of {self.menu_item.name}"
     
@@ -170,6 +331,9 @@ class Bookmark(models.Model):
     class Meta:
         unique_together = ('user', 'restaurant')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='bookmark_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} bookmarked {self.restaurant.name}"
@@ -185,6 +349,9 @@ class Visit(models.Model):
     class Meta:
         unique_together = ('user', 'restaurant')
         ordering = ['-visited_at']
+        indexes = [
+            models.Index(fields=['user', '-visited_at', '-id'], name='visit_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} visited {self.restaurant.name}'
@@ -211,8 +378,115 @@ class Review(models.Model):
     class Meta:
         unique_together = ('user', 'restaurant')
         ordering = ['-updated_at', '-created_at']
+        indexes = [
+            models.Index(fields=['restaurant', '-updated_at', '-created_at', '-id'], name='review_restaurant_recent_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_rating()
+        return instance
+
+    def _remember_rating(self):
+        # Keeps the stored restaurant/rating pair around so the rating
+        # aggregates can be adjusted by the difference on the next save.
+        self._loaded_restaurant_id = self.__dict__.get('restaurant_id')
+        self._loaded_rating = self.__dict__.get('rating')
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         if self.title:
             return f"{self.title} - {self.rating} by {self.user.username} for {self.restaurant.name}"
         return f"{self.rating} by {self.user.username} for {self.restaurant.name}"
+
+class RestaurantRatingStats(models.Model):
+    """
+    Stores the per-star review counts, last review time and
+    Bayesian-weighted score of a restaurant, maintained on review writes.
+    """
+    STAR_FIELDS = {
+        Review.Rating.ONE: 'one_star',
+        Review.Rating.TWO: 'two_star',
+        Review.Rating.THREE: 'three_star',
+        Review.Rating.FOUR: 'four_star',
+        Review.Rating.FIVE: 'five_star',
+    }
+
+    restaurant = models.OneToOneField(
+        Restaurant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating_stats',
+    )
+    one_star = models.PositiveIntegerField(default=0)
+    two_star = models.PositiveIntegerField(default=0)
+    three_star = models.PositiveIntegerField(default=0)
+    four_star = models.PositiveIntegerField(default=0)
+    five_star = models.PositiveIntegerField(default=0)
+    last_reviewed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the most recently written review was last updated"
+    )
+    weighted_score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Average rating pulled towards the site-wide prior for restaurants with few reviews"
+    )
+
+    class Meta:
+        verbose_name_plural = 'restaurant rating stats'
+
+    def __str__(self):
+        return f"Rating stats of {self.restaurant.name}"
+
+    @property
+    def total(self):
+        return sum(getattr(self, field) for field in self.STAR_FIELDS.values())
+
+    def histogram(self):
+        """
+        Returns one row per star from five down to one with its count and
+        share of all reviews in percent.
+        """
+        total = self.total
+        rows = []
+        for star, field in sorted(self.STAR_FIELDS.items(), reverse=True):
+            count = getattr(self, field)
+            rows.append({
+                'star': star,
+                'count': count,
+                'percent': round(count * 100 / total) if total else 0,
+            })
+        return rows
+
+class FacetCount(models.Model):
+    """
+    Stores the number of restaurants per value of a list page facet,
+    maintained on restaurant and cuisine writes.
+    """
+    class Facet(models.TextChoices):
+        CUISINE = 'cuisines', 'Cuisine'
+        FOOD_TYPE = 'food_type', 'Food type'
+        CITY = 'city', 'City'
+        OPEN_STATUS = 'open_status', 'Open status'
+
+    facet = models.CharField(max_length=20, choices=Facet.choices)
+    value = models.CharField(
+        max_length=60,
+        help_text="Food type, city key, cuisine id or 'true'/'false' for the open status"
+    )
+    label = models.CharField(max_length=50, help_text="Value as shown in the sidebar")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='facet_count_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_facet_display()} {self.label}: {self.count}"
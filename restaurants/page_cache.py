@@ -0,0 +1,84 @@
+import math
+import random
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from .routers import primary_reads
+from .versioning import bump_version, get_version
+
+HOME_PAGE_VERSION = 'home'
+
+def cache_timeout():
+    return getattr(settings, 'RESTAURANTS_PAGE_CACHE_TIMEOUT', 5 * 60)
+
+def invalidate_home_page():
+    bump_version(HOME_PAGE_VERSION)
+
+def should_refresh_early(build_time, expires_at, beta=1.0):
+    """
+    Probabilistic early expiry: the closer an entry is to expiring, and the
+    longer it took to build, the likelier a reader is to rebuild it first.
+    """
+    return time.time() - build_time * beta * math.log(1.0 - random.random()) >= expires_at
+
+def get_or_build(key, build, timeout, lock_timeout=10, poll_interval=0.05):
+    """
+    Returns the cached value of `key`, calling `build` to fill it at most
+    once at a time across workers. Readers that lose the race for the lock
+    serve the existing entry, or wait for the winner on a cold miss.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, build_time, expires_at = entry
+        if not should_refresh_early(build_time, expires_at):
+            return value
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, lock_timeout):
+        if entry is not None:
+            return entry[0]
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # The lock holder died or is far too slow; build without it.
+    try:
+        started = time.time()
+        value = build()
+        build_time = time.time() - started
+        cache.set(key, (value, build_time, time.time() + timeout), timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+class AnonymousPageCacheMixin:
+    """
+    Serves anonymous GET requests from a whole-page cache keyed by the page
+    number and the `page_cache_version` counter, which the signals bump when
+    anything shown on the page changes.
+    """
+    page_cache_version = None
+
+    def get_page_cache_key(self):
+        page = self.request.GET.get(self.page_kwarg) or '1'
+        if set(self.request.GET) - {self.page_kwarg} or not page.isdigit():
+            return None
+        version = get_version(self.page_cache_version)
+        return f'restaurants:page:{self.page_cache_version}:{version}:{int(page)}'
+
+    def get(self, request, *args, **kwargs):
+        key = None if request.user.is_authenticated else self.get_page_cache_key()
+        if key is None:
+            response = super().get(request, *args, **kwargs)
+        else:
+            def build():
+                with primary_reads():
+                    rendered = super(AnonymousPageCacheMixin, self).get(request, *args, **kwargs).render()
+                return rendered.content, rendered['Content-Type']
+            content, content_type = get_or_build(key, build, cache_timeout())
+            response = HttpResponse(content, content_type=content_type)
+        patch_vary_headers(response, ['Cookie'])
+        return response
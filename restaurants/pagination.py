@@ -0,0 +1,261 @@
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import OrderBy
+from django.http import Http404
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates to milliseconds, which would make the
+        # seek condition skip or repeat rows with sub-millisecond differences.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+class UnsupportedOrdering(ValueError):
+    pass
+
+class InvalidCursor(ValueError):
+    pass
+
+@dataclass
+class SortKey:
+    name: str
+    descending: bool
+    nulls_first: bool
+    nullable: bool
+    field: object
+
+    def reversed(self):
+        return SortKey(self.name, not self.descending, not self.nulls_first, self.nullable, self.field)
+
+    def order_by(self):
+        expression = F(self.name)
+        if not self.nullable:
+            return expression.desc() if self.descending else expression.asc()
+        if self.descending:
+            return expression.desc(nulls_first=self.nulls_first, nulls_last=not self.nulls_first)
+        return expression.asc(nulls_first=self.nulls_first, nulls_last=not self.nulls_first)
+
+    def after(self, value):
+        """
+        Returns the condition for rows strictly after `value` on this key,
+        or None if nothing can follow it.
+        """
+        if value is None:
+            return Q(**{f'{self.name}__isnull': False}) if self.nulls_first else None
+        condition = Q(**{f'{self.name}__{"lt" if self.descending else "gt"}': value})
+        if self.nullable and not self.nulls_first:
+            condition |= Q(**{f'{self.name}__isnull': True})
+        return condition
+
+    def equal(self, value):
+        if value is None:
+            return Q(**{f'{self.name}__isnull': True})
+        return Q(**{self.name: value})
+
+    def value_of(self, obj):
+        for part in self.name.split('__'):
+            obj = getattr(obj, part)
+        return obj
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous, approximate_count=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.approximate_count = approximate_count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if self.has_next_page and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], 'n')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous_page and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0], 'p')
+        return None
+
+    @property
+    def count_display(self):
+        if self.approximate_count is None:
+            return None
+        count, exact = self.approximate_count
+        return f"{count:,}" if exact else f"{count:,}+"
+
+class CursorPaginator:
+    """
+    Keyset paginator. Pages are fetched with a WHERE on the (sort key, id)
+    of the last row seen instead of an OFFSET, so deep pages cost the same
+    as the first one and no COUNT(*) is needed.
+    """
+    def __init__(self, queryset, per_page, count_limit=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_limit = count_limit
+        self.keys = self.sort_keys(queryset)
+
+    def sort_keys(self, queryset):
+        query = queryset.query
+        ordering = list(query.order_by or (queryset.model._meta.ordering if query.default_ordering else []))
+        nulls_largest = connections[queryset.db].features.nulls_order_largest
+        keys = []
+        for item in ordering:
+            if isinstance(item, str):
+                descending = item.startswith('-')
+                name = item.lstrip('-')
+                nulls_first = None
+            elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+                descending = item.descending
+                name = item.expression.name
+                nulls_first = True if item.nulls_first else False if item.nulls_last else None
+            else:
+                raise UnsupportedOrdering(f"Cannot paginate by {item!r} with a cursor")
+            if name == '?':
+                raise UnsupportedOrdering("Cannot paginate a random ordering with a cursor")
+            if name == 'pk':
+                name = queryset.model._meta.pk.name
+            field, nullable = self.resolve_field(queryset, name)
+            if nulls_first is None:
+                # Match the database's default placement of NULLs.
+                nulls_first = nulls_largest == descending
+            keys.append(SortKey(name, descending, nulls_first, nullable, field))
+        pk_name = queryset.model._meta.pk.name
+        if not any(key.name == pk_name for key in keys):
+            descending = keys[-1].descending if keys else False
+            keys.append(SortKey(pk_name, descending, False, False, queryset.model._meta.pk))
+        return keys
+
+    def resolve_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field, True
+        model = queryset.model
+        field = None
+        for part in name.split('__'):
+            field = model._meta.get_field(part)
+            if field.is_relation:
+                if field.many_to_many or field.one_to_many:
+                    raise UnsupportedOrdering(f"Cannot paginate by multi-valued {name!r} with a cursor")
+                model = field.related_model
+        if field.is_relation:
+            raise UnsupportedOrdering(f"Cannot paginate by relation {name!r} with a cursor")
+        return field, field.null
+
+    def encode_cursor(self, obj, direction):
+        payload = {'d': direction, 'k': [key.value_of(obj) for key in self.keys]}
+        data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(data)
+            direction, values = payload['d'], payload['k']
+            if direction not in ('n', 'p') or len(values) != len(self.keys):
+                raise InvalidCursor("Malformed cursor")
+            return direction, [
+                None if value is None else key.field.to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValueError, TypeError, KeyError, ValidationError) as error:
+            raise InvalidCursor("Malformed cursor") from error
+
+    def seek(self, keys, values):
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for key, value in zip(keys, values):
+            after = key.after(value)
+            if after is not None:
+                condition |= prefix & after
+            prefix &= key.equal(value)
+        return condition
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else ('n', None)
+        keys = self.keys if direction == 'n' else [key.reversed() for key in self.keys]
+        queryset = self.queryset.order_by(*[key.order_by() for key in keys])
+        if values is not None:
+            queryset = queryset.filter(self.seek(keys, values))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'n':
+            has_next, has_previous = has_more, values is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        return CursorPage(rows, self, has_next, has_previous, self.approximate_count())
+
+    def approximate_count(self):
+        """
+        Returns (count, exact). Postgres uses the planner's row estimate;
+        other databases count at most `count_limit` rows.
+        """
+        if self.count_limit is None:
+            return None
+        queryset = self.queryset.order_by()
+        if connections[queryset.db].vendor == 'postgresql':
+            plan = json.loads(queryset.explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows']), False
+        count = queryset[:self.count_limit + 1].count()
+        return min(count, self.count_limit), count <= self.count_limit
+
+class CursorPaginationMixin:
+    """
+    Opt-in keyset pagination for list views. It is used when the request
+    carries a `cursor` parameter (empty for the first page) or when the
+    RESTAURANTS_CURSOR_PAGINATION setting is on, and falls back to the
+    page-number paginator for orderings a cursor cannot express.
+    """
+    cursor_param = 'cursor'
+    cursor_count_limit = 1000
+
+    def use_cursor_pagination(self):
+        return self.cursor_param in self.request.GET or getattr(settings, 'RESTAURANTS_CURSOR_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            paginator = CursorPaginator(queryset, page_size, count_limit=self.cursor_count_limit)
+        except UnsupportedOrdering:
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_param) or None)
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query_params = self.request.GET.copy()
+        for param in (self.cursor_param, 'page'):
+            query_params.pop(param, None)
+        context['cursor_query_params'] = query_params.urlencode()
+        return context
@@ -0,0 +1,251 @@
+import atexit
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.request
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded.
+MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# A statement repeated this many times in one request is reported as a
+# likely N+1 query.
+DUPLICATE_THRESHOLD = 3
+MAX_FINGERPRINTS = 20
+
+SELECT_LIST = re.compile(r'^SELECT (DISTINCT )?.+? FROM ', re.S)
+IN_LIST = re.compile(r'IN \((?:\?, )*\?\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def fingerprint(sql):
+    """
+    Returns `sql` with its column list, literals and IN lists collapsed, so
+    executions of the same statement with different parameters share one
+    fingerprint.
+    """
+    sql = SELECT_LIST.sub(r'SELECT \1... FROM ', sql, count=1)
+    sql = LITERAL.sub('?', sql.replace('%s', '?'))
+    sql = IN_LIST.sub('IN (...)', sql)
+    return ' '.join(sql.split())[:300]
+
+class Histogram:
+    def __init__(self, bounds, counts=None, total=0.0, maximum=0.0):
+        self.bounds = tuple(bounds)
+        self.counts = list(counts) if counts else [0] * (len(self.bounds) + 1)
+        self.total = total
+        self.maximum = maximum
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound of the bucket holding the given percentile,
+        or the largest value seen for the unbounded bucket.
+        """
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return self.maximum
+
+    def to_dict(self):
+        return {'bounds': self.bounds, 'counts': self.counts, 'total': self.total, 'max': self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['bounds'], data['counts'], data['total'], data['max'])
+
+class RouteProfile:
+    """
+    Aggregated measurements of the sampled requests to one URL name.
+    """
+    metrics = {'total_ms': MS_BUCKETS, 'db_ms': MS_BUCKETS, 'render_ms': MS_BUCKETS, 'queries': QUERY_BUCKETS}
+
+    def __init__(self):
+        self.histograms = {name: Histogram(bounds) for name, bounds in self.metrics.items()}
+        # Fingerprint -> number of requests in which it repeated.
+        self.duplicates = Counter()
+
+    def add(self, measurements, duplicates):
+        for name, value in measurements.items():
+            self.histograms[name].add(value)
+        self.duplicates.update(duplicates)
+
+    def merge(self, other):
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+        self.duplicates.update(other.duplicates)
+
+    def to_dict(self):
+        return {
+            'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            'duplicates': dict(self.duplicates.most_common(MAX_FINGERPRINTS)),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls()
+        profile.histograms = {name: Histogram.from_dict(histogram) for name, histogram in data['histograms'].items()}
+        profile.duplicates = Counter(data['duplicates'])
+        return profile
+
+class QueryRecorder:
+    """
+    Execute wrapper counting the queries of one request, the time spent in
+    them and how often each statement fingerprint ran.
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [sql for sql, count in self.fingerprints.items() if count >= DUPLICATE_THRESHOLD]
+
+class Profiler:
+    """
+    Per-process store of route profiles, flushed as one JSON line per
+    interval to a file, or POSTed to an http(s) endpoint.
+    """
+    def __init__(self, output, flush_interval):
+        self.output = output
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.started = time.time()
+
+    def record(self, route, measurements, duplicates):
+        with self.lock:
+            self.routes.setdefault(route, RouteProfile()).add(measurements, duplicates)
+            snapshot = self.take_snapshot() if time.time() - self.started >= self.flush_interval else None
+        if snapshot:
+            threading.Thread(target=self.write, args=(snapshot,), daemon=True).start()
+
+    def take_snapshot(self):
+        routes, self.routes = self.routes, {}
+        started, self.started = self.started, time.time()
+        return {
+            'start': started,
+            'end': self.started,
+            'routes': {route: profile.to_dict() for route, profile in routes.items()},
+        }
+
+    def flush(self):
+        with self.lock:
+            snapshot = self.take_snapshot()
+        self.write(snapshot)
+
+    def write(self, snapshot):
+        if not snapshot['routes'] or not self.output:
+            return
+        data = json.dumps(snapshot, separators=(',', ':'))
+        try:
+            if self.output.startswith(('http://', 'https://')):
+                request = urllib.request.Request(
+                    self.output, data.encode(), headers={'Content-Type': 'application/json'}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                with open(self.output, 'a') as output_file:
+                    output_file.write(data + '\n')
+        except OSError:
+            logger.exception("Could not flush request profiles to %s", self.output)
+
+def load_profiles(lines):
+    """
+    Merges flushed JSON lines into one RouteProfile per URL name.
+    """
+    routes = {}
+    for line in lines:
+        if line.strip():
+            for route, data in json.loads(line)['routes'].items():
+                routes.setdefault(route, RouteProfile()).merge(RouteProfile.from_dict(data))
+    return routes
+
+class ProfilingMiddleware:
+    """
+    Samples RESTAURANTS_PROFILING_SAMPLE_RATE of the requests and records,
+    per resolved URL name, query count, repeated statements, DB time,
+    template render time and total latency. Render time includes queries
+    run by lazy querysets in the template. With a sample rate of 0 the
+    middleware removes itself at startup.
+    """
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'RESTAURANTS_PROFILING_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profiler = Profiler(
+            getattr(settings, 'RESTAURANTS_PROFILING_OUTPUT', None),
+            getattr(settings, 'RESTAURANTS_PROFILING_FLUSH_INTERVAL', 60),
+        )
+        atexit.register(self.profiler.flush)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request._profile_render = [0.0, 0.0]
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        started_render, finished_render = request._profile_render
+        self.profiler.record(
+            match.view_name if match else '<unresolved>',
+            {
+                'total_ms': total * 1000,
+                'db_ms': recorder.seconds * 1000,
+                'render_ms': max(0.0, finished_render - started_render) * 1000,
+                'queries': recorder.count,
+            },
+            recorder.duplicates(),
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, '_profile_render', None)
+        if timings is not None:
+            timings[0] = time.perf_counter()
+
+            def finished(response):
+                timings[1] = time.perf_counter()
+
+            response.add_post_render_callback(finished)
+        return response
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.db.models import Avg, Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from .models import Restaurant, RestaurantRatingStats, Review
+
+def prior_mean():
+    return getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+
+def prior_weight():
+    return getattr(settings, 'RATING_PRIOR_WEIGHT', 10)
+
+def weighted_score_expression(star_deltas=None):
+    """
+    Bayesian average over the per-star count columns, optionally shifted by
+    pending per-star deltas so it can be set in the same UPDATE as them.
+    """
+    star_deltas = star_deltas or {}
+    rating_sum = Value(prior_mean() * prior_weight())
+    count = Value(prior_weight())
+    for star, field in RestaurantRatingStats.STAR_FIELDS.items():
+        column = F(field) + star_deltas.get(star, 0)
+        rating_sum = rating_sum + column * int(star)
+        count = count + column
+    return Cast(rating_sum, FloatField()) / count
+
+def apply_rating_change(restaurant_id, added=None, removed=None, reviewed_at=None):
+    """
+    Moves a restaurant's stored rating aggregates and per-star counts by one
+    review rated `added` and/or one review rated `removed`. Every table is
+    changed with a single UPDATE, so concurrent review writes never
+    overwrite each other.
+    """
+    star_deltas = {}
+    if added:
+        star_deltas[added] = star_deltas.get(added, 0) + 1
+    if removed:
+        star_deltas[removed] = star_deltas.get(removed, 0) - 1
+    rating_delta = (added or 0) - (removed or 0)
+    count_delta = sum(star_deltas.values())
+
+    new_count = F('rating_count') + count_delta
+    Restaurant.objects.filter(pk=restaurant_id).update(
+        cache_version=F('cache_version') + 1,
+        rating_sum=F('rating_sum') + rating_delta,
+        rating_count=new_count,
+        rating_avg=Case(
+            When(Q(rating_count__lte=-count_delta), then=Value(None)),
+            default=Cast(F('rating_sum') + rating_delta, FloatField()) / new_count,
+            output_field=FloatField(),
+        ),
+    )
+
+    stats_changes = {
+        RestaurantRatingStats.STAR_FIELDS[star]: F(RestaurantRatingStats.STAR_FIELDS[star]) + delta
+        for star, delta in star_deltas.items()
+    }
+    stats_changes['weighted_score'] = weighted_score_expression(star_deltas)
+    if reviewed_at is not None:
+        stats_changes['last_reviewed_at'] = reviewed_at
+    else:
+        stats_changes['last_reviewed_at'] = Subquery(latest_review_times().values('updated_at')[:1])
+    stats = RestaurantRatingStats.objects.filter(restaurant_id=restaurant_id)
+    if not stats.update(**stats_changes):
+        rebuild_rating_stats(Restaurant.objects.filter(pk=restaurant_id))
+
+def latest_review_times():
+    return Review.objects.filter(restaurant=OuterRef('restaurant_id')).order_by('-updated_at')
+
+def rebuild_rating_aggregates(restaurants=None):
+    """
+    Recomputes the rating aggregates of the given restaurants (all of them
+    by default) from the Review table. Returns the number of rows updated.
+    """
+    if restaurants is None:
+        restaurants = Restaurant.objects.all()
+    reviews = Review.objects.filter(restaurant=OuterRef('pk')).order_by().values('restaurant')
+    updated = restaurants.update(
+        cache_version=F('cache_version') + 1,
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        rating_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+        rating_avg=Subquery(reviews.annotate(avg=Avg('rating')).values('avg'), output_field=FloatField()),
+    )
+    rebuild_rating_stats(restaurants)
+    return updated
+
+def rebuild_rating_stats(restaurants=None):
+    """
+    Creates any missing RestaurantRatingStats rows for the given restaurants
+    and recomputes their per-star counts, last review time and weighted score.
+    """
+    if restaurants is None:
+        restaurants = Restaurant.objects.all()
+    missing = restaurants.filter(rating_stats__isnull=True).values_list('pk', flat=True)
+    RestaurantRatingStats.objects.bulk_create(
+        [RestaurantRatingStats(restaurant_id=pk) for pk in missing.iterator()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    stats = RestaurantRatingStats.objects.filter(restaurant__in=restaurants.values('pk'))
+    reviews = Review.objects.filter(restaurant=OuterRef('restaurant_id')).order_by().values('restaurant')
+    stats.update(
+        last_reviewed_at=Subquery(latest_review_times().values('updated_at')[:1]),
+        **{
+            field: Coalesce(Subquery(reviews.filter(rating=star).annotate(total=Count('pk')).values('total')), 0)
+            for star, field in RestaurantRatingStats.STAR_FIELDS.items()
+        },
+    )
+    stats.update(weighted_score=weighted_score_expression())
@@ -0,0 +1,228 @@
+"""
+Fixed-width JPEG and WebP renditions of restaurant and menu item photos.
+
+Each photo keeps a description of its renditions in its `renditions`
+field: the image name they were made from and a list of variants (width,
+format, storage name, bytes). The files are saved to the default storage,
+which names them by content like the uploads (content/<xx>/<sha256>.<ext>),
+so their URLs are cached as immutable. They are made from the photo's
+image eagerly after an upload commits (RESTAURANTS_RENDITIONS_EAGER) or,
+when a photo is rendered without them, on a background thread
+(RESTAURANTS_RENDITION_WORKERS; 0 leaves them to the generate_renditions
+command) while the page shows the original image. Photos showing the same
+stored image, as identical uploads do, share renditions, so they are only
+deleted once no photo shows that image.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from .models import Restaurant
+from .storage import is_referenced
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name, file extension and save options per variant format.
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+def rendition_widths():
+    return tuple(getattr(settings, 'RESTAURANTS_RENDITION_WIDTHS', (240, 480, 960, 1600)))
+
+def eager_renditions():
+    return getattr(settings, 'RESTAURANTS_RENDITIONS_EAGER', True)
+
+def rendition_workers():
+    return getattr(settings, 'RESTAURANTS_RENDITION_WORKERS', 1)
+
+def target_widths(width):
+    """
+    Configured widths below the image's own width, plus the image width
+    itself when it is smaller than the largest one. Images are never
+    upscaled.
+    """
+    widths = [candidate for candidate in rendition_widths() if candidate < width]
+    if rendition_widths() and width <= max(rendition_widths()):
+        widths.append(width)
+    return widths
+
+def encode(image, format):
+    pil_format, _, options = FORMATS[format]
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+def render_variants(field_file):
+    """
+    Returns (width, format, bytes) for every rendition of `field_file`.
+    """
+    with field_file.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    variants = []
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for format in FORMATS:
+            variants.append((width, format, encode(resized, format)))
+    return variants
+
+def delete_renditions(renditions, storage=default_storage):
+    for variant in (renditions or {}).get('variants', []):
+        storage.delete(variant['name'])
+
+def release_renditions(renditions, storage=default_storage, exclude=None):
+    """
+    Deletes `renditions` unless a photo other than `exclude` still shows
+    the image they were made from.
+    """
+    if renditions and renditions.get('variants') and not is_referenced(renditions.get('source'), exclude=exclude):
+        delete_renditions(renditions, storage)
+
+def refresh_restaurant(photo):
+    """
+    Bumps the cache_version and updated_at of the restaurant showing
+    `photo`, so its cached card and its page validators move on to the
+    markup offering the new renditions.
+    """
+    if hasattr(photo, 'restaurant_id'):
+        restaurants = Restaurant.objects.filter(pk=photo.restaurant_id)
+    else:
+        restaurants = Restaurant.objects.filter(menu_items__pk=photo.menu_item_id)
+    restaurants.update(cache_version=F('cache_version') + 1, updated_at=timezone.now())
+
+def generate_renditions(photo, storage=default_storage):
+    """
+    (Re)writes the renditions of `photo` and stores their description on
+    the row without calling save(), so the photo signals do not fire; the
+    restaurant's cached markup is invalidated here instead. A
+    missing or unreadable image is recorded with no variants and is not
+    retried until the image changes.
+    """
+    source_name = photo.image.name
+    variants = []
+    try:
+        for width, format, data in render_variants(photo.image):
+            # The content-addressed storage keeps only the extension.
+            name = storage.save(f'{width}w.{FORMATS[format][1]}', ContentFile(data))
+            variants.append({'width': width, 'format': format, 'name': name, 'size': len(data)})
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.warning("Cannot make renditions of %s: %s", source_name, exc)
+        delete_renditions({'variants': variants}, storage)
+        variants = []
+    previous = photo.renditions or {}
+    photo.renditions = {'source': source_name, 'variants': variants}
+    type(photo).objects.filter(pk=photo.pk).update(renditions=photo.renditions)
+    if variants or previous.get('variants'):
+        refresh_restaurant(photo)
+    kept = {variant['name'] for variant in variants}
+    release_renditions({'source': previous.get('source'), 'variants': [
+        variant for variant in previous.get('variants', []) if variant['name'] not in kept
+    ]}, storage, exclude=photo)
+    return photo.renditions
+
+def is_current(photo):
+    return (photo.renditions or {}).get('source') == photo.image.name
+
+def get_renditions(photo):
+    """
+    Returns the rendition description of `photo`, making the renditions
+    first when they are missing or were made from another image.
+    """
+    if not photo.image:
+        return None
+    if not is_current(photo):
+        generate_renditions(photo)
+    return photo.renditions
+
+def ensure_renditions(model, pk):
+    photo = model.objects.filter(pk=pk).first()
+    if photo is not None:
+        get_renditions(photo)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(rendition_workers(), thread_name_prefix='restaurants-renditions')
+    return _executor
+
+def run_scheduled(model, pk):
+    try:
+        ensure_renditions(model, pk)
+    finally:
+        with _lock:
+            _pending.discard((model, pk))
+        close_old_connections()
+
+def submit_renditions(model, pk):
+    with _lock:
+        if (model, pk) in _pending:
+            return
+        _pending.add((model, pk))
+    try:
+        get_executor().submit(run_scheduled, model, pk)
+    except RuntimeError:
+        # The pool is shut down at interpreter exit.
+        with _lock:
+            _pending.discard((model, pk))
+
+def schedule_renditions(photo):
+    """
+    Queues the renditions of `photo` to be made on the rendition pool once
+    the current transaction commits; a photo already queued is not queued
+    twice. With RESTAURANTS_RENDITION_WORKERS = 0 nothing is queued and the
+    photos wait for the generate_renditions command.
+    """
+    if rendition_workers() > 0:
+        transaction.on_commit(partial(submit_renditions, type(photo), photo.pk))
+
+def current_renditions(photo):
+    """
+    Returns the rendition description of `photo` when it was made from the
+    photo's current image, and otherwise schedules the renditions and
+    returns None, without decoding or encoding anything itself.
+    """
+    if not photo.image:
+        return None
+    if is_current(photo):
+        return photo.renditions
+    schedule_renditions(photo)
+    return None
+
+def rendition_names(model):
+    """
+    Storage names of all the renditions described on `model` rows.
+    """
+    return {
+        variant['name']
+        for renditions in model.objects.values_list('renditions', flat=True).iterator()
+        for variant in (renditions or {}).get('variants', [])
+    }
+
+def variant_url(variant):
+    return default_storage.url(variant['name'])
+
+def srcset(renditions, format):
+    return ', '.join(
+        f"{variant_url(variant)} {variant['width']}w"
+        for variant in renditions['variants'] if variant['format'] == format
+    )
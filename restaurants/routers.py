@@ -0,0 +1,127 @@
+"""
+Primary/replica database routing with read-your-writes stickiness.
+
+Writes always go to the primary ('default'). Reads go to a random alias
+from RESTAURANTS_READ_REPLICAS unless the current request is pinned to
+the primary: requests with an unsafe method, requests that have written,
+requests carrying the pin cookie set after a write (for
+RESTAURANTS_REPLICA_PIN_SECONDS) and anything inside a transaction on the
+primary. Sessions are always read from the primary, and so is anything
+read inside primary_reads(). Outside a request, such as management
+commands, only the transaction and primary_reads() rules apply.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+# Apps always read from the primary. A session missing from a lagging
+# replica would be treated as expired and its cookie deleted.
+PRIMARY_APPS = {'sessions'}
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+_state = ContextVar('restaurants_routing_state', default=None)
+_primary_reads = ContextVar('restaurants_primary_reads', default=False)
+
+@contextmanager
+def primary_reads():
+    """
+    Reads inside the block go to the primary. Used by whatever rebuilds
+    data cached under a version bumped after a commit: rebuilt from a
+    lagging replica, the new version would keep the rows from before the
+    commit until the next unrelated change.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+def read_replicas():
+    return getattr(settings, 'RESTAURANTS_READ_REPLICAS', [])
+
+def pin_seconds():
+    return getattr(settings, 'RESTAURANTS_REPLICA_PIN_SECONDS', 10)
+
+def is_pinned():
+    state = _state.get()
+    if _primary_reads.get() or (state is not None and state.pinned):
+        return True
+    return connections[PRIMARY].in_atomic_block
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = read_replicas()
+        if not replicas or model._meta.app_label in PRIMARY_APPS or is_pinned():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema from the primary.
+        if db in read_replicas():
+            return False
+        return None
+
+class ReplicaPinningMiddleware:
+    """
+    Tracks whether the request may read from a replica and, after a
+    request that wrote, sets the pin cookie so the user's next requests
+    read their own writes from the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RequestState(self.pins(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        state = RequestState(self.pins(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(request, response, state)
+
+    def pins(self, request):
+        return request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    def process_response(self, request, response, state):
+        if state.wrote and read_replicas():
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds(), httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,271 @@
+import re
+from dataclasses import dataclass, field
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import Exact
+from django.utils.module_loading import import_string
+
+SEARCH_TABLE = 'restaurants_search'
+BATCH_SIZE = 500
+
+@dataclass
+class SearchDocument:
+    """
+    The searchable text of one restaurant.
+    """
+    restaurant_id: int
+    name: str
+    address: str
+    city: str
+    cuisines: list = field(default_factory=list)
+    menu: list = field(default_factory=list)
+
+def build_documents(restaurant_model, restaurant_ids, using='default'):
+    """
+    Collects the search documents of the given restaurants. Works with both
+    the live and the historical (migration) Restaurant model.
+    """
+    restaurants = restaurant_model.objects.using(using).filter(pk__in=restaurant_ids).order_by()
+    documents = {
+        pk: SearchDocument(pk, name, address, city)
+        for pk, name, address, city in restaurants.values_list('pk', 'name', 'address', 'city')
+    }
+    through = restaurant_model.cuisines.through
+    for restaurant_id, cuisine in through.objects.using(using).filter(restaurant_id__in=documents).values_list(
+        'restaurant_id', 'cuisine__name'
+    ):
+        documents[restaurant_id].cuisines.append(cuisine)
+    menu_item_model = restaurant_model.menu_items.rel.related_model
+    for restaurant_id, name, description in menu_item_model.objects.using(using).filter(restaurant_id__in=documents).values_list(
+        'restaurant_id', 'name', 'description'
+    ):
+        documents[restaurant_id].menu.extend([name, description or ''])
+    return list(documents.values())
+
+def tokenize(query):
+    return re.findall(r'\w+', query.casefold())
+
+class BaseSearchBackend:
+    """
+    Keeps a full-text index of restaurants in sync and answers ranked,
+    prefix-matching queries against it.
+    """
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def create_index(self):
+        pass
+
+    def drop_index(self):
+        pass
+
+    def upsert(self, documents):
+        raise NotImplementedError
+
+    def remove(self, restaurant_ids):
+        raise NotImplementedError
+
+    def filter_matches(self, queryset, tokens):
+        """
+        Restricts `queryset` to the restaurants matching every token as a
+        prefix and annotates each with its `search_rank`, best match lowest.
+        """
+        raise NotImplementedError
+
+    def join_index(self, queryset, key, condition, params):
+        """
+        Joins the index table to `queryset` on its `key` column and keeps
+        the rows for which the raw SQL `condition` holds. The restaurant
+        side is an F() so the join survives relabelling in subqueries.
+        """
+        key = RawSQL(f"{SEARCH_TABLE}.{key}", [], output_field=IntegerField())
+        return queryset.extra(tables=[SEARCH_TABLE]).filter(
+            Exact(key, F('pk')), RawSQL(condition, params, output_field=BooleanField()),
+        )
+
+    def search(self, query, limit):
+        """
+        Returns the ids of the restaurants matching every word of `query`
+        as a prefix, best match first.
+        """
+        from .models import Restaurant
+        matches = self.filter_queryset(Restaurant.objects.using(self.using), query)
+        return list(matches.values_list('pk', flat=True)[:limit])
+
+    def index_restaurants(self, restaurant_ids, restaurant_model=None):
+        if restaurant_model is None:
+            from .models import Restaurant as restaurant_model
+        restaurant_ids = list(restaurant_ids)
+        for start in range(0, len(restaurant_ids), BATCH_SIZE):
+            batch = restaurant_ids[start:start + BATCH_SIZE]
+            self.remove(batch)
+            self.upsert(build_documents(restaurant_model, batch, self.using))
+
+    def rebuild(self, restaurant_model=None):
+        if restaurant_model is None:
+            from .models import Restaurant as restaurant_model
+        self.drop_index()
+        self.create_index()
+        restaurant_ids = restaurant_model.objects.using(self.using).order_by('pk').values_list('pk', flat=True)
+        self.index_restaurants(restaurant_ids.iterator(), restaurant_model)
+
+    def filter_queryset(self, queryset, query):
+        """
+        Restricts `queryset` to the matches of `query`, ordered by relevance.
+        The index is joined to the restaurants, so the query is matched and
+        ranked once, in the same statement, however many rows match.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.none()
+        return self.filter_matches(queryset, tokens).order_by('search_rank', 'id')
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 virtual table keyed by restaurant id, ranked with bm25.
+    """
+    # bm25 column weights: name, address, city, cuisines, menu
+    weights = (10.0, 1.0, 3.0, 5.0, 2.0)
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                "name, address, city, cuisines, menu, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def upsert(self, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, name, address, city, cuisines, menu) VALUES (%s, %s, %s, %s, %s, %s)",
+                [
+                    (doc.restaurant_id, doc.name, doc.address, doc.city, ' '.join(doc.cuisines), ' '.join(doc.menu))
+                    for doc in documents
+                ],
+            )
+
+    def remove(self, restaurant_ids):
+        restaurant_ids = list(restaurant_ids)
+        if not restaurant_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(restaurant_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", restaurant_ids)
+
+    def match_query(self, tokens):
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def filter_matches(self, queryset, tokens):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return self.join_index(
+            queryset, 'rowid', f"{SEARCH_TABLE} MATCH %s", [self.match_query(tokens)],
+        ).annotate(search_rank=RawSQL(f"bm25({SEARCH_TABLE}, {weights})", [], output_field=FloatField()))
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Weighted tsvector column with a GIN index, ranked with ts_rank.
+    """
+    config = 'simple'
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                "restaurant_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING GIN (document)"
+            )
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def upsert(self, documents):
+        config = self.config
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (restaurant_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{config}', %s), 'A') || "
+                f"setweight(to_tsvector('{config}', %s), 'B') || "
+                f"setweight(to_tsvector('{config}', %s), 'C') || "
+                f"setweight(to_tsvector('{config}', %s), 'D')) "
+                "ON CONFLICT (restaurant_id) DO UPDATE SET document = EXCLUDED.document",
+                [
+                    (doc.restaurant_id, doc.name, ' '.join(doc.cuisines), doc.city, f"{doc.address} {' '.join(doc.menu)}")
+                    for doc in documents
+                ],
+            )
+
+    def remove(self, restaurant_ids):
+        restaurant_ids = list(restaurant_ids)
+        if not restaurant_ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE restaurant_id = ANY(%s)", [restaurant_ids])
+
+    def ts_query(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def filter_matches(self, queryset, tokens):
+        ts_query = f"to_tsquery('{self.config}', %s)"
+        return self.join_index(
+            queryset, 'restaurant_id', f"{SEARCH_TABLE}.document @@ {ts_query}", [self.ts_query(tokens)],
+        ).annotate(search_rank=RawSQL(
+            f"-ts_rank({SEARCH_TABLE}.document, {ts_query})", [self.ts_query(tokens)], output_field=FloatField()
+        ))
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Unindexed icontains fallback for databases without a full-text engine.
+    """
+    def upsert(self, documents):
+        pass
+
+    def remove(self, restaurant_ids):
+        pass
+
+    def index_restaurants(self, restaurant_ids, restaurant_model=None):
+        pass
+
+    def filter_matches(self, queryset, tokens):
+        from .models import MenuItem, Restaurant
+        restaurants = Restaurant.objects.using(self.using)
+        for token in tokens:
+            menu_matches = MenuItem.objects.using(self.using).filter(
+                Q(name__icontains=token) | Q(description__icontains=token)
+            )
+            restaurants = restaurants.filter(
+                Q(name__icontains=token) | Q(address__icontains=token) | Q(city__icontains=token)
+                | Q(cuisines__name__icontains=token) | Q(pk__in=menu_matches.values('restaurant_id'))
+            )
+        # Unranked: matches are listed in id order.
+        return queryset.filter(pk__in=restaurants.values('pk')).annotate(search_rank=Value(0))
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+def get_search_backend(using='default'):
+    """
+    Returns the backend named by the RESTAURANT_SEARCH_BACKEND setting, or
+    the best one available for the database vendor.
+    """
+    backend_path = getattr(settings, 'RESTAURANT_SEARCH_BACKEND', None)
+    if backend_path:
+        backend_class = import_string(backend_path)
+    else:
+        backend_class = VENDOR_BACKENDS.get(connections[using].vendor, SimpleSearchBackend)
+    return backend_class(using)
@@ -0,0 +1,232 @@
+import random
+import time
+from array import array
+from dataclasses import dataclass, field
+from itertools import accumulate, islice
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from .facets import rebuild_facet_counts
+from .filter_engine import VERSION_NAME as FILTER_ENGINE_VERSION
+from .geo import encode_geohash
+from .models import Bookmark, Cuisine, MenuItem, Restaurant, RestaurantPhoto, Review, Visit, normalize_key
+from .page_cache import invalidate_home_page
+from .ratings import rebuild_rating_aggregates
+from .search import get_search_backend
+from .suggest import VERSION_NAME as SUGGEST_VERSION
+from .versioning import bump_version
+
+CITIES = {
+    'chennai': (13.0827, 80.2707),
+    'bengaluru': (12.9716, 77.5946),
+    'mumbai': (19.0760, 72.8777),
+    'delhi': (28.6139, 77.2090),
+    'hyderabad': (17.3850, 78.4867),
+    'kolkata': (22.5726, 88.3639),
+    'pune': (18.5204, 73.8567),
+    'kochi': (9.9312, 76.2673),
+}
+CUISINES = [
+    'South Indian', 'North Indian', 'Chettinad', 'Mughlai', 'Chinese', 'Italian', 'Mexican', 'Thai',
+    'Japanese', 'Korean', 'Continental', 'Mediterranean', 'Lebanese', 'Street Food', 'Desserts', 'Bakery',
+    'Cafe', 'Seafood', 'Biryani', 'Kerala', 'Bengali', 'Gujarati', 'Rajasthani', 'Punjabi',
+]
+WORDS = [
+    'spice', 'garden', 'palace', 'corner', 'house', 'kitchen', 'grill', 'bistro', 'cafe', 'express',
+    'royal', 'golden', 'dragon', 'lotus', 'tandoor', 'biryani', 'dosa', 'pizza', 'burger', 'curry',
+    'masala', 'coastal', 'urban', 'green', 'leaf', 'ocean', 'tiffin', 'mess', 'dhaba', 'bowl',
+]
+DISHES = [
+    'masala dosa', 'idli', 'vada', 'pongal', 'paneer tikka', 'butter chicken', 'dal makhani', 'naan',
+    'fried rice', 'hakka noodles', 'margherita pizza', 'pasta arrabbiata', 'tacos', 'pad thai', 'ramen',
+    'falafel', 'shawarma', 'fish curry', 'prawn fry', 'gulab jamun', 'rasmalai', 'filter coffee',
+]
+
+class ZipfSampler:
+    """
+    Draws indexes from range(n), index k with weight 1 / (k + 1) ** exponent,
+    so a few low indexes get most of the draws.
+    """
+    def __init__(self, n, exponent, rng):
+        self.rng = rng
+        self.population = range(n)
+        self.cum_weights = list(accumulate((rank + 1) ** -exponent for rank in range(n)))
+
+    def sample(self, k):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=k)
+
+@dataclass
+class SeedResult:
+    """
+    Ids of the seeded users and restaurants, most popular first, and the
+    number of rows inserted per model.
+    """
+    user_ids: array
+    restaurant_ids: array
+    counts: dict = field(default_factory=dict)
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def insert(model, objects, batch_size, log):
+    """
+    Bulk-inserts `objects` in batches, one transaction for the whole table,
+    and returns the new primary keys.
+    """
+    started = time.perf_counter()
+    pks = array('q')
+    with transaction.atomic():
+        for batch in batched(objects, batch_size):
+            pks.extend(obj.pk for obj in model.objects.bulk_create(batch))
+    log(f"{model.__name__}: {len(pks):,} rows in {time.perf_counter() - started:.1f}s")
+    return pks
+
+def sample_pairs(count, user_sampler, restaurant_sampler, restaurant_total):
+    """
+    Returns up to `count` distinct (user rank, restaurant rank) pairs with
+    both sides drawn from their popularity distributions. Stops early when
+    the popular pairs are used up and new draws keep colliding.
+    """
+    pairs = set()
+    misses = 0
+    while len(pairs) < count and misses < 20:
+        wanted = count - len(pairs)
+        before = len(pairs)
+        pairs.update(
+            user * restaurant_total + restaurant
+            for user, restaurant in zip(user_sampler.sample(wanted), restaurant_sampler.sample(wanted))
+        )
+        misses = misses + 1 if len(pairs) - before < wanted // 100 + 1 else 0
+    return [divmod(pair, restaurant_total) for pair in sorted(pairs)]
+
+def seed(
+    restaurants, reviews, users, *, cuisines=len(CUISINES), menu_items=5, photos=2, bookmarks=None, visits=None,
+    exponent=1.1, seed=0, batch_size=2000, password=None, username_prefix=None, rebuild=True, log=None,
+):
+    """
+    Bulk-inserts a synthetic catalogue. Restaurant and user popularity both
+    follow a Zipf distribution with the given exponent, so reviews,
+    bookmarks and visits pile up on a few restaurants and users the way
+    real traffic does. The same `seed` always produces the same data.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    username_prefix = username_prefix or f'seed{seed}_'
+    if User.objects.filter(username__startswith=username_prefix).exists():
+        raise ValueError(f"Users prefixed {username_prefix!r} already exist; pick another seed or prefix")
+    bookmarks = reviews // 2 if bookmarks is None else bookmarks
+    visits = reviews if visits is None else visits
+
+    cuisine_names = [
+        CUISINES[index] if index < len(CUISINES) else f"{CUISINES[index % len(CUISINES)]} {index // len(CUISINES)}"
+        for index in range(max(1, cuisines))
+    ]
+    cuisine_ids = insert(Cuisine, (Cuisine(name=name, name_key=normalize_key(name)) for name in cuisine_names), batch_size, log)
+
+    password_hash = make_password(password)
+    user_ids = insert(User, (
+        User(username=f'{username_prefix}{index}', email=f'{username_prefix}{index}@example.com', password=password_hash)
+        for index in range(users)
+    ), batch_size, log)
+
+    city_names = list(CITIES)
+    city_sampler = ZipfSampler(len(city_names), 1.0, rng)
+
+    def restaurant_objects():
+        for index, city_rank in enumerate(city_sampler.sample(restaurants)):
+            city = city_names[city_rank]
+            latitude = CITIES[city][0] + rng.gauss(0, 0.08)
+            longitude = CITIES[city][1] + rng.gauss(0, 0.08)
+            yield Restaurant(
+                name=f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {index}",
+                address=f"{rng.randint(1, 400)} {rng.choice(WORDS).title()} Road, {city.title()}",
+                city=city,
+                city_key=normalize_key(city),
+                cost_for_two=rng.randrange(150, 4000, 50),
+                food_type=rng.choice(Restaurant.FoodType.values),
+                open_status=rng.random() < 0.85,
+                latitude=latitude,
+                longitude=longitude,
+                geohash=encode_geohash(latitude, longitude),
+            )
+
+    restaurant_ids = insert(Restaurant, restaurant_objects(), batch_size, log)
+
+    # Popularity rank -> id, shuffled so popularity is unrelated to insertion order.
+    restaurant_ids = array('q', rng.sample(restaurant_ids, len(restaurant_ids)))
+    user_ids = array('q', rng.sample(user_ids, len(user_ids)))
+    Restaurant.objects.filter(pk__in=restaurant_ids[:12]).update(spotlight=True)
+    quality = array('f', (min(5.0, max(1.0, rng.gauss(3.6, 0.6))) for _ in restaurant_ids))
+
+    through = Restaurant.cuisines.through
+    cuisine_sampler = ZipfSampler(len(cuisine_ids), 0.8, rng)
+    insert(through, (
+        through(restaurant_id=restaurant_id, cuisine_id=cuisine_ids[rank])
+        for restaurant_id in restaurant_ids
+        for rank in set(cuisine_sampler.sample(rng.randint(1, 3)))
+    ), batch_size, log)
+    insert(MenuItem, (
+        MenuItem(
+            restaurant_id=restaurant_id,
+            name=rng.choice(DISHES).title(),
+            description=f"{rng.choice(WORDS)} {rng.choice(DISHES)}",
+            price=rng.randrange(40, 900, 10),
+        )
+        for restaurant_id in restaurant_ids
+        for _ in range(rng.randint(max(0, menu_items - 2), menu_items + 2))
+    ), batch_size, log)
+    # No image: there are no files to point at, and rendering a missing
+    # file would queue rendition jobs that can only fail.
+    insert(RestaurantPhoto, (
+        RestaurantPhoto(restaurant_id=restaurant_id, image='')
+        for restaurant_id in restaurant_ids
+        for _ in range(photos)
+    ), batch_size, log)
+
+    restaurant_sampler = ZipfSampler(len(restaurant_ids), exponent, rng)
+    user_sampler = ZipfSampler(len(user_ids), exponent, rng)
+    total = len(restaurant_ids)
+
+    def ratings(restaurant_rank):
+        return min(5, max(1, round(rng.gauss(quality[restaurant_rank], 1.0))))
+
+    review_ids = insert(Review, (
+        Review(
+            user_id=user_ids[user_rank],
+            restaurant_id=restaurant_ids[restaurant_rank],
+            rating=ratings(restaurant_rank),
+            title=f"{rng.choice(WORDS).title()} {rng.choice(DISHES)}",
+            comment=f"Tried the {rng.choice(DISHES)} and the {rng.choice(DISHES)}.",
+        )
+        for user_rank, restaurant_rank in sample_pairs(reviews, user_sampler, restaurant_sampler, total)
+    ), batch_size, log)
+    bookmark_ids = insert(Bookmark, (
+        Bookmark(user_id=user_ids[user_rank], restaurant_id=restaurant_ids[restaurant_rank])
+        for user_rank, restaurant_rank in sample_pairs(bookmarks, user_sampler, restaurant_sampler, total)
+    ), batch_size, log)
+    visit_ids = insert(Visit, (
+        Visit(user_id=user_ids[user_rank], restaurant_id=restaurant_ids[restaurant_rank])
+        for user_rank, restaurant_rank in sample_pairs(visits, user_sampler, restaurant_sampler, total)
+    ), batch_size, log)
+
+    if rebuild:
+        started = time.perf_counter()
+        rebuild_rating_aggregates()
+        get_search_backend().index_restaurants(sorted(restaurant_ids))
+        log(f"Rebuilt ratings and search index in {time.perf_counter() - started:.1f}s")
+    # bulk_create sends no signals, so redo what the signals would have.
+    rebuild_facet_counts()
+    bump_version(SUGGEST_VERSION)
+    bump_version(FILTER_ENGINE_VERSION)
+    invalidate_home_page()
+
+    return SeedResult(user_ids, restaurant_ids, {
+        'cuisines': len(cuisine_ids),
+        'users': len(user_ids),
+        'restaurants': len(restaurant_ids),
+        'reviews': len(review_ids),
+        'bookmarks': len(bookmark_ids),
+        'visits': len(visit_ids),
+    })
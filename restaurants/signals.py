@@ -0,0 +1,323 @@
+from functools import partial
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .facets import (
+    apply_facet_changes, cuisine_key, facet_deltas, invalidate_facet_index, scalar_facet_values,
+)
+from .filter_engine import invalidate_filter_engine
+from .membership import record_change
+from .models import (
+    Bookmark, Cuisine, FacetCount, MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto, RestaurantRatingStats, Review, Visit,
+)
+from .page_cache import invalidate_home_page
+from .ratings import apply_rating_change, prior_mean, rebuild_rating_aggregates
+from .renditions import eager_renditions, ensure_renditions, release_renditions
+from .search import get_search_backend
+from .suggest import VERSION_NAME as SUGGEST_VERSION
+from .versioning import bump_version
+
+def is_restaurant_cascade(origin):
+    return isinstance(origin, Restaurant) or getattr(origin, 'model', None) is Restaurant
+
+@receiver(post_save, sender=Restaurant)
+def create_rating_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        RestaurantRatingStats.objects.get_or_create(
+            restaurant=instance,
+            defaults={'weighted_score': prior_mean()},
+        )
+
+@receiver(post_save, sender=Review)
+def update_ratings_on_review_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_restaurant_id = getattr(instance, '_loaded_restaurant_id', None)
+    if created:
+        apply_rating_change(instance.restaurant_id, added=instance.rating, reviewed_at=instance.updated_at)
+    elif old_restaurant_id is None:
+        # Saved without being loaded first, so the previous rating is unknown.
+        rebuild_rating_aggregates(Restaurant.objects.filter(pk=instance.restaurant_id))
+    elif old_restaurant_id != instance.restaurant_id:
+        apply_rating_change(old_restaurant_id, removed=instance._loaded_rating)
+        apply_rating_change(instance.restaurant_id, added=instance.rating, reviewed_at=instance.updated_at)
+    else:
+        apply_rating_change(
+            instance.restaurant_id,
+            added=instance.rating,
+            removed=instance._loaded_rating,
+            reviewed_at=instance.updated_at,
+        )
+    instance._remember_rating()
+
+@receiver(post_delete, sender=Review)
+def update_ratings_on_review_delete(sender, instance, origin=None, **kwargs):
+    if is_restaurant_cascade(origin):
+        # The restaurant itself is going away along with its aggregates.
+        return
+    restaurant_id = getattr(instance, '_loaded_restaurant_id', None) or instance.restaurant_id
+    rating = getattr(instance, '_loaded_rating', None) or instance.rating
+    apply_rating_change(restaurant_id, removed=rating)
+
+@receiver(post_save, sender=Restaurant)
+def index_restaurant(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        get_search_backend(using).index_restaurants([instance.pk])
+
+@receiver(post_delete, sender=Restaurant)
+def unindex_restaurant(sender, instance, using='default', **kwargs):
+    get_search_backend(using).remove([instance.pk])
+
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+def index_restaurant_cuisines(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        restaurant_ids = [instance.pk]
+    elif action == 'post_clear':
+        restaurant_ids = instance._restaurant_ids_before_clear
+    else:
+        restaurant_ids = pk_set
+    get_search_backend(using).index_restaurants(restaurant_ids)
+
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+def remember_cuisine_restaurants_before_clear(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._restaurant_ids_before_clear = list(instance.restaurants.values_list('pk', flat=True))
+
+@receiver(post_save, sender=Cuisine)
+def index_cuisine_restaurants(sender, instance, created, raw=False, using='default', **kwargs):
+    if not created and not raw:
+        get_search_backend(using).index_restaurants(instance.restaurants.values_list('pk', flat=True))
+
+@receiver(pre_delete, sender=Cuisine)
+def remember_cuisine_restaurants(sender, instance, **kwargs):
+    instance._restaurant_ids_before_delete = list(instance.restaurants.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Cuisine)
+def index_deleted_cuisine_restaurants(sender, instance, using='default', **kwargs):
+    get_search_backend(using).index_restaurants(instance._restaurant_ids_before_delete)
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item_restaurant(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        get_search_backend(using).index_restaurants([instance.restaurant_id])
+
+@receiver(post_delete, sender=MenuItem)
+def index_deleted_menu_item_restaurant(sender, instance, origin=None, using='default', **kwargs):
+    if not is_restaurant_cascade(origin):
+        get_search_backend(using).index_restaurants([instance.restaurant_id])
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Cuisine)
+@receiver(post_delete, sender=Cuisine)
+def invalidate_suggestions(sender, raw=False, using='default', **kwargs):
+    # After commit, so no worker rebuilds from the old rows under the new
+    # version.
+    if not raw:
+        transaction.on_commit(partial(bump_version, SUGGEST_VERSION), using=using)
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Cuisine)
+@receiver(post_delete, sender=Cuisine)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+def invalidate_filter_engine_on_change(sender, raw=False, action=None, using='default', **kwargs):
+    # Reviews move the stored ratings the engine sorts by.
+    if not raw and action in (None, 'post_add', 'post_remove', 'post_clear'):
+        invalidate_filter_engine(using)
+
+MEMBERSHIP_KINDS = {Bookmark: 'bookmarks', Visit: 'visits'}
+
+@receiver(post_save, sender=Bookmark)
+@receiver(post_save, sender=Visit)
+def update_membership_on_save(sender, instance, created, raw=False, using='default', **kwargs):
+    if created and not raw:
+        transaction.on_commit(
+            partial(record_change, instance.user_id, MEMBERSHIP_KINDS[sender], instance.restaurant_id, True),
+            using=using,
+        )
+
+@receiver(post_delete, sender=Bookmark)
+@receiver(post_delete, sender=Visit)
+def update_membership_on_delete(sender, instance, using='default', **kwargs):
+    transaction.on_commit(
+        partial(record_change, instance.user_id, MEMBERSHIP_KINDS[sender], instance.restaurant_id, False),
+        using=using,
+    )
+
+def bump_cache_version(restaurant_id):
+    Restaurant.objects.filter(pk=restaurant_id).update(cache_version=F('cache_version') + 1, updated_at=timezone.now())
+
+def touch_restaurants(restaurants):
+    """
+    Moves the updated_at stamp of `restaurants` the page validators in
+    restaurants.conditional are built from.
+    """
+    restaurants.update(updated_at=timezone.now())
+
+@receiver(post_save, sender=Restaurant)
+def bump_restaurant_cache_version(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_cache_version(instance.pk)
+
+@receiver(post_save, sender=RestaurantPhoto)
+@receiver(post_delete, sender=RestaurantPhoto)
+def bump_photo_cache_version(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not is_restaurant_cascade(origin):
+        bump_cache_version(instance.restaurant_id)
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def touch_menu_restaurant(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not is_restaurant_cascade(origin):
+        touch_restaurants(Restaurant.objects.filter(pk=instance.restaurant_id))
+
+@receiver(post_save, sender=MenuItemPhoto)
+@receiver(post_delete, sender=MenuItemPhoto)
+def touch_menu_photo_restaurant(sender, instance, raw=False, origin=None, **kwargs):
+    # Deleting the menu item or restaurant touches the restaurant itself.
+    if not raw and not is_restaurant_cascade(origin) and not isinstance(origin, MenuItem):
+        touch_restaurants(Restaurant.objects.filter(menu_items__pk=instance.menu_item_id))
+
+@receiver(post_save, sender=Cuisine)
+@receiver(pre_delete, sender=Cuisine)
+def touch_cuisine_restaurants(sender, instance, raw=False, created=False, **kwargs):
+    if not raw and not created:
+        touch_restaurants(Restaurant.objects.filter(cuisines=instance))
+
+@receiver(post_delete, sender=Review)
+def touch_reviewed_restaurant(sender, instance, origin=None, **kwargs):
+    # A deletion leaves no newer review time behind for Last-Modified.
+    if not is_restaurant_cascade(origin):
+        touch_restaurants(Restaurant.objects.filter(pk=instance.restaurant_id))
+
+def invalidate_home_page_on_commit(restaurant_ids=None, using='default'):
+    """
+    Drops the cached home page once the transaction commits, so a concurrent
+    rebuild cannot cache the old rows under the new version. With
+    `restaurant_ids`, only changes to spotlighted restaurants invalidate it.
+    """
+    if restaurant_ids is not None and not Restaurant.objects.using(using).filter(
+        pk__in=restaurant_ids, spotlight=True
+    ).exists():
+        return
+    transaction.on_commit(invalidate_home_page, using=using)
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_home_page_on_restaurant_change(sender, instance, raw=False, using='default', **kwargs):
+    if not raw:
+        invalidate_home_page_on_commit(using=using)
+
+@receiver(post_save, sender=RestaurantPhoto)
+@receiver(post_delete, sender=RestaurantPhoto)
+def invalidate_home_page_on_photo_change(sender, instance, raw=False, origin=None, using='default', **kwargs):
+    if not raw and not is_restaurant_cascade(origin):
+        invalidate_home_page_on_commit([instance.restaurant_id], using)
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_home_page_on_review_change(sender, instance, raw=False, origin=None, using='default', **kwargs):
+    if not raw and not is_restaurant_cascade(origin):
+        invalidate_home_page_on_commit([instance.restaurant_id], using)
+
+@receiver(pre_save, sender=Restaurant)
+def read_unknown_facet_values(sender, instance, raw=False, using='default', **kwargs):
+    loaded = getattr(instance, '_loaded_facets', None)
+    if raw or instance.pk is None or (loaded is not None and None not in loaded.values()):
+        return
+    # Saved without being fully loaded first: read the stored values so the
+    # counts can still be moved from them.
+    instance._loaded_facets = (
+        Restaurant.objects.using(using).filter(pk=instance.pk).values(*Restaurant.FACET_FIELDS).first()
+    )
+
+@receiver(post_save, sender=Restaurant)
+def update_facet_counts_on_restaurant_save(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    current = scalar_facet_values(instance.food_type, instance.open_status, instance.city_key)
+    loaded = getattr(instance, '_loaded_facets', None)
+    removed = scalar_facet_values(**loaded) if loaded and not created else {}
+    apply_facet_changes(facet_deltas(removed=removed, added=current), current, using)
+    instance._remember_facets()
+
+@receiver(pre_delete, sender=Restaurant)
+def remember_restaurant_cuisines(sender, instance, **kwargs):
+    instance._cuisine_ids_before_delete = list(instance.cuisines.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Restaurant)
+def update_facet_counts_on_restaurant_delete(sender, instance, using='default', **kwargs):
+    loaded = getattr(instance, '_loaded_facets', None) or {
+        name: getattr(instance, name) for name in Restaurant.FACET_FIELDS
+    }
+    removed = list(scalar_facet_values(**loaded))
+    removed.extend(cuisine_key(pk) for pk in instance._cuisine_ids_before_delete)
+    apply_facet_changes(facet_deltas(removed=removed), using=using)
+
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+def update_cuisine_facet_counts(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    related = instance.restaurants if reverse else instance.cuisines
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() reports every requested id, linked or not.
+        linked = related.all() if action == 'pre_clear' else related.filter(pk__in=pk_set)
+        instance._facet_ids_before_unlink = list(linked.values_list('pk', flat=True))
+        return
+    if action == 'post_add':
+        ids, sign = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        ids, sign = instance._facet_ids_before_unlink, -1
+    else:
+        return
+    if reverse:
+        deltas = {cuisine_key(instance.pk): sign * len(ids)}
+    else:
+        deltas = {cuisine_key(pk): sign for pk in ids}
+    apply_facet_changes(deltas, using=using)
+
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+def touch_restaurants_on_cuisine_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch_restaurants(Restaurant.objects.filter(pk=instance.pk))
+    else:
+        # Unlinked ids are remembered by update_cuisine_facet_counts.
+        ids = pk_set if action == 'post_add' else instance._facet_ids_before_unlink
+        touch_restaurants(Restaurant.objects.filter(pk__in=ids))
+
+@receiver(post_save, sender=Cuisine)
+def update_cuisine_facet_label(sender, instance, created, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    facet, value = cuisine_key(instance.pk)
+    if created:
+        FacetCount.objects.using(using).get_or_create(facet=facet, value=value, defaults={'label': instance.name})
+    else:
+        FacetCount.objects.using(using).filter(facet=facet, value=value).update(label=instance.name)
+    invalidate_facet_index(using)
+
+@receiver(post_delete, sender=Cuisine)
+def delete_cuisine_facet_count(sender, instance, using='default', **kwargs):
+    facet, value = cuisine_key(instance.pk)
+    FacetCount.objects.using(using).filter(facet=facet, value=value).delete()
+    invalidate_facet_index(using)
+
+@receiver(post_save, sender=RestaurantPhoto)
+@receiver(post_save, sender=MenuItemPhoto)
+def make_renditions_on_upload(sender, instance, raw=False, using='default', **kwargs):
+    if raw or not eager_renditions() or not instance.image:
+        return
+    if instance.renditions.get('source') != instance.image.name:
+        transaction.on_commit(partial(ensure_renditions, sender, instance.pk), using=using)
+
+@receiver(post_delete, sender=RestaurantPhoto)
+@receiver(post_delete, sender=MenuItemPhoto)
+def delete_renditions_with_photo(sender, instance, using='default', **kwargs):
+    transaction.on_commit(partial(release_renditions, instance.renditions), using=using)
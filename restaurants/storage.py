@@ -0,0 +1,112 @@
+"""
+Content-addressed media storage.
+
+Every file saved through ContentAddressedStorage is named after the
+SHA-256 of its bytes, content/<first two hex digits>/<digest><ext>, so
+identical uploads to any model share one file and a name never changes
+meaning. That makes the URLs safe to cache forever: serve_media sends
+them with an immutable, year-long Cache-Control. Files are not deleted
+when a row stops using them, since another row may share them; the
+dedupe_media command garbage-collects the ones nothing references.
+"""
+import hashlib
+import posixpath
+import re
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+CONTENT_DIR = 'content'
+CONTENT_NAME = re.compile(rf'^{CONTENT_DIR}/([0-9a-f]{{2}})/\1[0-9a-f]{{62}}(\.\w+)?$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+def is_content_addressed(name):
+    return bool(name and CONTENT_NAME.match(name))
+
+def content_name(name, content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    digest = digest.hexdigest()
+    extension = posixpath.splitext(name)[1].lower()
+    return posixpath.join(CONTENT_DIR, digest[:2], digest + extension)
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that ignores the requested directory and file name
+    apart from the extension, naming files by their content instead.
+    Saving bytes that are already stored writes nothing and returns the
+    existing name.
+    """
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content)
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length=max_length)
+        if saved != name:
+            # A concurrent save of the same bytes wrote the file first.
+            self.delete(saved)
+        return name
+
+def file_fields():
+    """
+    (model, field name) of every FileField kept in the default storage.
+    """
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and field.storage is default_storage
+    ]
+
+def is_referenced(name, exclude=None):
+    """
+    Whether a row other than the model instance `exclude` uses the stored
+    file `name`.
+    """
+    if not name:
+        return False
+    for model, field in file_fields():
+        rows = model._default_manager.filter(**{field: name})
+        if exclude is not None and isinstance(exclude, model):
+            rows = rows.exclude(pk=exclude.pk)
+        if rows.exists():
+            return True
+    return False
+
+def referenced_names():
+    names = set()
+    for model, field in file_fields():
+        names.update(
+            model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .values_list(field, flat=True).iterator()
+        )
+    return names
+
+def walk(storage, path=''):
+    """
+    Yields the name of every file under `path` in `storage`.
+    """
+    directories, files = storage.listdir(path)
+    for file in files:
+        yield posixpath.join(path, file)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    django.views.static.serve, marking content-addressed files immutable.
+    Web servers serving MEDIA_ROOT themselves should send the same
+    Cache-Control for MEDIA_URL + 'content/'.
+    """
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if is_content_addressed(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
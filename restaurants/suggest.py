@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from .routers import primary_reads
+from .versioning import get_version
+
+VERSION_NAME = 'suggest'
+
+@dataclass(frozen=True)
+class Suggestion:
+    label: str
+    kind: str
+    object_id: int = None
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+class SuggestionIndex:
+    """
+    Sorted array of normalized keys searched with bisect. Every word start of
+    a label gets its own key, so "pal" finds "Pizza Palace".
+    """
+    def __init__(self, suggestions):
+        entries = []
+        for suggestion in suggestions:
+            words = normalize(suggestion.label).split(' ')
+            for position in range(len(words)):
+                entries.append((' '.join(words[position:]), suggestion))
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _ in entries]
+        self.suggestions = [suggestion for _, suggestion in entries]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(results) < limit:
+            if not self.keys[position].startswith(prefix):
+                break
+            suggestion = self.suggestions[position]
+            if suggestion not in seen:
+                seen.add(suggestion)
+                results.append(suggestion)
+            position += 1
+        return results
+
+def load_suggestions():
+    from .models import Cuisine, Restaurant
+    suggestions = []
+    cities = {}
+    for pk, name, city in Restaurant.objects.order_by().values_list('pk', 'name', 'city').iterator():
+        suggestions.append(Suggestion(name, 'restaurant', pk))
+        cities.setdefault(normalize(city), city.strip())
+    suggestions.extend(Suggestion(city, 'city') for city in cities.values())
+    suggestions.extend(
+        Suggestion(name, 'cuisine', pk)
+        for pk, name in Cuisine.objects.order_by().values_list('pk', 'name')
+    )
+    return suggestions
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+def get_suggestion_index():
+    """
+    Returns this worker's index, rebuilding it from the database the first
+    time it is needed after a restaurant or cuisine change.
+    """
+    global _index, _index_version
+    version = get_version(VERSION_NAME)
+    if _index is None or _index_version != version:
+        with _lock:
+            if _index is None or _index_version != version:
+                with primary_reads():
+                    _index = SuggestionIndex(load_suggestions())
+                _index_version = version
+    return _index
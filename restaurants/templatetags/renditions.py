@@ -0,0 +1,32 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from ..renditions import current_renditions, rendition_widths, srcset, variant_url
+
+register = template.Library()
+
+# Preferred width of the plain <img src> for browsers without srcset.
+FALLBACK_WIDTH = 960
+
+@register.simple_tag
+def responsive_image(photo, sizes='100vw', **attrs):
+    """
+    Renders `photo` as a <picture> offering its WebP and JPEG renditions
+    for the layout width given by `sizes`; the remaining keyword arguments
+    become attributes of the <img>. Photos without renditions, and all
+    photos when RESTAURANTS_RENDITION_WIDTHS is empty, render their original
+    image; missing renditions are scheduled, never made during the render.
+    """
+    renditions = current_renditions(photo) if rendition_widths() else None
+    if not renditions or not renditions['variants']:
+        return format_html('<img src="{}"{}>', photo.image.url, flatatt(attrs))
+    jpegs = [variant for variant in renditions['variants'] if variant['format'] == 'jpeg']
+    fallback = max(
+        (variant for variant in jpegs if variant['width'] <= FALLBACK_WIDTH), key=lambda variant: variant['width'],
+        default=jpegs[0],
+    )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        srcset(renditions, 'webp'), sizes, variant_url(fallback),
+        srcset(renditions, 'jpeg'), sizes, flatatt(attrs),
+    )
@@ -0,0 +1,121 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from restaurants.filters import RestaurantFilter
+from restaurants.models import Cuisine, MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto, Review
+
+User = get_user_model()
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.cuisine = Cuisine.objects.create(name="Punjabi")
+        self.restaurants = []
+        for i in range(12):
+            restaurant = Restaurant.objects.create(
+                name=f"Restaurant{i}", city="Chennai", cost_for_two=100 * (i % 5 + 1),
+                food_type='veg' if i % 2 else 'vegan',
+            )
+            restaurant.cuisines.add(self.cuisine)
+            RestaurantPhoto.objects.create(restaurant=restaurant, image=f"restaurant_photos/{i}.jpg")
+            item = MenuItem.objects.create(restaurant=restaurant, name=f"Dish{i}", description="Tasty", price='120.50')
+            MenuItemPhoto.objects.create(menu_item=item, image=f"menu_items/{i}.jpg")
+            self.restaurants.append(restaurant)
+        self.restaurant = self.restaurants[0]
+        for i in range(5):
+            Review.objects.create(
+                user=User.objects.create(username=f'reviewer{i}'), restaurant=self.restaurant, rating=i + 1,
+                comment=f"Review{i}",
+            )
+        self.list_url = reverse('api-restaurant-list')
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response
+
+    def collect(self, url, **params):
+        ids, response = [], self.get(url, **params).json()
+        while True:
+            ids.extend(row['id'] for row in response['data'])
+            if not response['next']:
+                return ids
+            response = self.client.get(response['next']).json()
+
+    def test_list_follows_the_restaurant_filter(self):
+        params = {'food_type': 'veg', 'sort': 'cost_desc'}
+        expected = list(RestaurantFilter(params, queryset=Restaurant.objects.order_by('id')).qs.values_list('id', flat=True))
+        self.assertEqual(self.collect(self.list_url, page_size=4, **params), expected)
+
+    def test_cursor_pages_cover_every_restaurant_once(self):
+        ids = self.collect(self.list_url, page_size=5, fields='id')
+        self.assertEqual(ids, [restaurant.pk for restaurant in self.restaurants])
+        first = self.get(self.list_url, page_size=5).json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(first['previous'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['data'], first['data'])
+
+    def test_sparse_fieldsets_narrow_the_output_and_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(self.list_url, fields='id,name', include='menu_items', **{'fields[menu_items]': 'price'})
+        row = response.json()['data'][0]
+        self.assertEqual(row, {'id': self.restaurant.pk, 'name': "Restaurant0", 'menu_items': [{'price': '120.50'}]})
+        restaurant_query = next(query['sql'] for query in queries if 'FROM "restaurants_restaurant"' in query['sql'])
+        self.assertNotIn('"address"', restaurant_query)
+
+    def test_includes_are_loaded_in_batches(self):
+        params = {'include': 'cuisines,photos,menu_items.photos,rating_stats'}
+        # Session, user, restaurants, then one query per included relation.
+        with self.assertNumQueries(8):
+            small = self.get(self.list_url, page_size=2, **params)
+        with self.assertNumQueries(8):
+            large = self.get(self.list_url, page_size=12, **params)
+        self.assertEqual(len(small.json()['data']), 2)
+        row = large.json()['data'][0]
+        self.assertEqual(row['cuisines'], [{'id': self.cuisine.pk, 'name': "Punjabi", 'description': None}])
+        self.assertEqual(row['photos'][0]['image'], '/media/restaurant_photos/0.jpg')
+        self.assertEqual(row['menu_items'][0]['photos'][0]['image'], '/media/menu_items/0.jpg')
+        self.assertEqual(row['rating_stats']['stars'], {'1': 1, '2': 1, '3': 1, '4': 1, '5': 1})
+
+    def test_restaurant_menu_photos_and_reviews(self):
+        pk = self.restaurant.pk
+        response = self.get(reverse('api-restaurant-detail', args=[pk]), include='cuisines')
+        self.assertEqual(response.json()['data']['review_count'], 5)
+        menu = self.get(reverse('api-restaurant-menu', args=[pk]), include='photos').json()['data']
+        self.assertEqual([item['name'] for item in menu], ["Dish0"])
+        self.assertEqual(len(menu[0]['photos']), 1)
+        photos = self.get(reverse('api-restaurant-photos', args=[pk])).json()['data']
+        self.assertEqual([photo['image'] for photo in photos], ['/media/restaurant_photos/0.jpg'])
+        with self.assertNumQueries(4):
+            reviews = self.get(reverse('api-restaurant-reviews', args=[pk]), page_size=3).json()
+        self.assertEqual([review['comment'] for review in reviews['data']], ["Review4", "Review3", "Review2"])
+        self.assertEqual(reviews['data'][0]['user']['username'], 'reviewer4')
+        self.assertEqual(self.collect(reverse('api-restaurant-reviews', args=[pk]), page_size=2), list(
+            Review.objects.filter(restaurant=self.restaurant).values_list('id', flat=True)
+        ))
+
+    def test_errors(self):
+        for url, params, status in (
+            (self.list_url, {'fields': 'id,secret'}, 400),
+            (self.list_url, {'include': 'owners'}, 400),
+            (self.list_url, {'include': 'menu_items.reviews'}, 400),
+            (self.list_url, {'food_type': 'meat'}, 400),
+            (self.list_url, {'cursor': 'garbage'}, 400),
+            (self.list_url, {'page_size': 'many'}, 400),
+            (reverse('api-restaurant-detail', args=[9999]), {}, 404),
+            (reverse('api-restaurant-reviews', args=[9999]), {}, 404),
+        ):
+            with self.subTest(url=url, params=params):
+                response = self.get(url, **params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.list_url).status_code, 403)
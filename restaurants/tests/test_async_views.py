@@ -0,0 +1,101 @@
+import re
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from restaurants import async_views
+from restaurants.models import Bookmark, MenuItem, Restaurant, Review
+from restaurants.urls import build_urlpatterns
+
+User = get_user_model()
+
+def without_csrf_tokens(content):
+    return re.sub(rb'name="csrfmiddlewaretoken" value="[^"]*"', b'', content)
+
+urlpatterns = [
+    path('', include(build_urlpatterns(async_views=True))),
+    path('accounts/', include('django.contrib.auth.urls')),
+]
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurants = [
+            Restaurant.objects.create(name=f"Restaurant{i}", city="Chennai", cost_for_two=100 * (i + 1),
+                                      food_type='veg' if i % 2 else 'vegan', spotlight=True)
+            for i in range(12)
+        ]
+        self.restaurant = self.restaurants[0]
+        Bookmark.objects.create(user=self.user, restaurant=self.restaurant)
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=4, comment="Mine")
+        for i in range(11):
+            reviewer = User.objects.create(username=f'reviewer{i}')
+            Review.objects.create(user=reviewer, restaurant=self.restaurant, rating=3, comment=f"Review{i}")
+
+    def sync_response(self, name, *args, **params):
+        with self.settings(ROOT_URLCONF='restaurant_app.urls'):
+            cache.clear()
+            return self.client.get(reverse(name, args=args), params)
+
+    def test_routes_are_served_by_async_views(self):
+        for name, view_class in (
+            ('home', async_views.AsyncHomePageView),
+            ('restaurant-list', async_views.AsyncRestaurantListView),
+            ('restaurant-detail', async_views.AsyncRestaurantDetailView),
+            ('restaurant_reviews', async_views.AsyncReviewListView),
+        ):
+            with self.subTest(name=name):
+                self.assertTrue(view_class.view_is_async)
+
+    def test_pages_match_the_sync_views(self):
+        for name, args, params in (
+            ('home', (), {'page': 2}),
+            ('restaurant-list', (), {'food_type': 'veg', 'sort': 'cost_desc'}),
+            ('restaurant-list', (), {'cursor': ''}),
+            ('restaurant-detail', (self.restaurant.pk,), {}),
+            ('restaurant_reviews', (self.restaurant.pk,), {'page': 2}),
+        ):
+            with self.subTest(name=name, params=params):
+                expected = self.sync_response(name, *args, **params)
+                cache.clear()
+                response = self.client.get(reverse(name, args=args), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(without_csrf_tokens(response.content), without_csrf_tokens(expected.content))
+
+    def test_list_pagination(self):
+        response = self.client.get(reverse('restaurant-list'), {'page': 2})
+        self.assertEqual(response.context['paginator'].count, 12)
+        self.assertEqual(len(response.context['restaurants']), 3)
+
+    def test_detail_context(self):
+        response = self.client.get(reverse('restaurant-detail', args=[self.restaurant.pk]))
+        self.assertEqual(response.context['user_review'].comment, "Mine")
+        self.assertEqual(len(response.context['recent_reviews']), 5)
+        self.assertEqual(response.context['bookmarked_ids'], {self.restaurant.pk})
+
+    def test_missing_restaurant_returns_404(self):
+        self.assertEqual(self.client.get(reverse('restaurant-detail', args=[9999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('restaurant_reviews', args=[9999])).status_code, 404)
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(reverse('restaurant-detail', args=[self.restaurant.pk]))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('restaurant-detail', args=[self.restaurant.pk])}")
+
+    def test_anonymous_home_page(self):
+        self.client.logout()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_unchanged_pages_answer_304(self):
+        for name in ('restaurant-detail', 'restaurant_reviews'):
+            with self.subTest(name=name):
+                url = reverse(name, args=[self.restaurant.pk])
+                response = self.client.get(url)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+                MenuItem.objects.create(restaurant=self.restaurant, name="Naan", description="Soft")
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
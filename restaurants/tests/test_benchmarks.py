@@ -0,0 +1,23 @@
+from django.test import TestCase
+from restaurants.benchmarks import routes
+
+class RouteQueryCountTests(TestCase):
+    def test_every_named_route_is_benchmarked(self):
+        self.assertEqual(routes.missing_routes(), set())
+
+    def test_query_counts_do_not_exceed_baseline(self):
+        baseline = routes.load_baseline()
+        dataset = routes.seed_dataset(**baseline['dataset'])
+        results = routes.measure_routes(dataset, repeat=2, memory=False)
+        self.assertEqual(routes.compare(results, baseline), [])
+
+    def test_compare_reports_extra_queries_and_time(self):
+        baseline = {'routes': {'home': {'queries': 3, 'total_ms': 10.0}}}
+        results = {'home': {'queries': 4, 'total_ms': 30.0}, 'new': {'queries': 1, 'total_ms': 1.0}}
+        self.assertEqual(routes.compare(results, baseline), ["home: 4 queries, baseline 3", "new: not in the baseline"])
+        self.assertIn("home: 30.0 ms, baseline 10.0 ms", routes.compare(results, baseline, time_tolerance=2))
+
+    def test_growth_exponent(self):
+        self.assertAlmostEqual(routes.growth_exponent([1, 4], [10, 10]), 0)
+        self.assertAlmostEqual(routes.growth_exponent([1, 4], [10, 40]), 1)
+        self.assertAlmostEqual(routes.growth_exponent([1, 4], [10, 160]), 2)
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from restaurants.models import Restaurant, RestaurantPhoto, Review, Bookmark
+
+User = get_user_model()
+
+class RestaurantCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="A2B", city="chennai", cost_for_two=100)
+        self.url = reverse('restaurant-list')
+
+    def test_card_is_served_from_cache_until_version_changes(self):
+        self.client.get(self.url)
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(name="Renamed quietly")
+        response = self.client.get(self.url)
+        self.assertContains(response, "A2B")
+        self.assertNotContains(response, "Renamed quietly")
+
+    def test_restaurant_save_refreshes_card(self):
+        self.client.get(self.url)
+        self.restaurant.name = "Adyar Ananda Bhavan"
+        self.restaurant.save()
+        self.assertContains(self.client.get(self.url), "Adyar Ananda Bhavan")
+
+    def test_review_refreshes_card_rating(self):
+        self.client.get(self.url)
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=4)
+        self.assertContains(self.client.get(self.url), "4.0★ | 1 Reviews")
+
+    def test_photo_changes_refresh_card(self):
+        self.client.get(self.url)
+        photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image="restaurant_photos/cover.jpg")
+        self.assertContains(self.client.get(self.url), "restaurant_photos/cover.jpg")
+        photo.delete()
+        self.assertNotContains(self.client.get(self.url), "restaurant_photos/cover.jpg")
+
+    def test_toggle_state_is_rendered_per_user(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Bookmark.objects.create(user=self.user, restaurant=self.restaurant)
+        other = User.objects.create_user(username='other', password='pass12345678')
+        response = self.client.get(self.url)
+        self.assertContains(response, "Remove bookmark")
+        self.client.force_login(other)
+        response = self.client.get(self.url)
+        self.assertContains(response, "Bookmark restaurant")
+
+    def test_save_does_not_overwrite_review_aggregates(self):
+        stale = Restaurant.objects.get(pk=self.restaurant.pk)
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=5)
+        stale.name = "Stale copy"
+        stale.save()
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.total_reviews, 1)
+        self.assertEqual(self.restaurant.average_rating, 5)
@@ -0,0 +1,98 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from restaurants.models import Bookmark, Cuisine, MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto, Review
+
+User = get_user_model()
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="Dhaba", city="Pune", cost_for_two=300)
+        self.cuisine = Cuisine.objects.create(name="Punjabi")
+        self.restaurant.cuisines.add(self.cuisine)
+        self.item = MenuItem.objects.create(restaurant=self.restaurant, name="Dal", description="Tasty")
+        self.review = Review.objects.create(
+            user=User.objects.create(username='reviewer'), restaurant=self.restaurant, rating=4, comment="Good",
+        )
+        self.urls = [
+            reverse(name, args=[self.restaurant.pk])
+            for name in ('restaurant-detail', 'restaurant_reviews', 'restaurant_images')
+        ]
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def assertUnchanged(self, url, response):
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def assertChanged(self, url, response):
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_pages_send_validators_and_answer_304(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn('Last-Modified', response)
+                self.assertEqual(response['Cache-Control'], 'private, no-cache')
+                not_modified = self.revalidate(url, response)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+                self.assertEqual(not_modified.content, b'')
+                since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(since.status_code, 304)
+
+    def test_304_skips_the_page_queries(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        # Session, user, the stamps and the user's bookmark and visit.
+        with self.assertNumQueries(5):
+            self.assertUnchanged(url, response)
+
+    def test_missing_restaurant_is_404(self):
+        response = self.client.get(reverse('restaurant-detail', args=[9999]), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+    def test_restaurant_changes_invalidate_every_page(self):
+        changes = [
+            lambda: Restaurant.objects.get(pk=self.restaurant.pk).save(),
+            lambda: Cuisine.objects.filter(pk=self.cuisine.pk).first().save(),
+            lambda: self.restaurant.cuisines.remove(self.cuisine),
+            lambda: MenuItem.objects.create(restaurant=self.restaurant, name="Naan", description="Soft"),
+            lambda: MenuItemPhoto.objects.create(menu_item=self.item, image="menu_items/dal.jpg"),
+            lambda: RestaurantPhoto.objects.create(restaurant=self.restaurant, image="restaurant_photos/a.jpg"),
+            lambda: Review.objects.create(user=self.user, restaurant=self.restaurant, rating=5, comment="Mine"),
+            lambda: Review.objects.filter(user=self.user).first().delete(),
+        ]
+        for index, change in enumerate(changes):
+            responses = {url: self.client.get(url) for url in self.urls}
+            change()
+            for url, response in responses.items():
+                with self.subTest(change=index, url=url):
+                    self.assertChanged(url, response)
+
+    def test_other_restaurants_do_not_invalidate(self):
+        other = Restaurant.objects.create(name="Other", city="Pune", cost_for_two=300)
+        response = self.client.get(self.urls[0])
+        MenuItem.objects.create(restaurant=other, name="Naan", description="Soft")
+        self.assertUnchanged(self.urls[0], response)
+
+    def test_bookmark_state_is_part_of_the_detail_validator(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Bookmark.objects.create(user=User.objects.create(username='someone'), restaurant=self.restaurant)
+        self.assertUnchanged(url, response)
+        with self.captureOnCommitCallbacks(execute=True):
+            Bookmark.objects.create(user=self.user, restaurant=self.restaurant)
+        self.assertChanged(url, response)
+
+    def test_validators_are_per_user(self):
+        response = self.client.get(self.urls[1])
+        User.objects.create_user(username='other', password='pass12345678')
+        self.client.login(username='other', password='pass12345678')
+        self.assertChanged(self.urls[1], response)
@@ -0,0 +1,149 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from io import StringIO
+from restaurants import facets
+from restaurants.facets import FacetIndex, get_facet_index, get_facets
+from restaurants.models import Cuisine, FacetCount, Restaurant
+
+User = get_user_model()
+
+def stored_counts():
+    return {(row.facet, row.value): row.count for row in FacetCount.objects.all()}
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        self.italian = Cuisine.objects.create(name="Italian")
+        self.indian = Cuisine.objects.create(name="Indian")
+        self.pizza = Restaurant.objects.create(name="Pizza Hut", city="Chennai", cost_for_two=200, food_type='veg')
+        self.pizza.cuisines.add(self.italian, self.indian)
+        self.dhaba = Restaurant.objects.create(
+            name="Dhaba", city=" chennai", cost_for_two=200, food_type='non_veg', open_status=False
+        )
+        self.dhaba.cuisines.add(self.indian)
+
+    def assertMatchesRebuild(self):
+        counts = {key: count for key, count in stored_counts().items() if count}
+        call_command('rebuild_facets', stdout=StringIO())
+        self.assertEqual(counts, {key: count for key, count in stored_counts().items() if count})
+
+    def test_counts_follow_creates(self):
+        counts = stored_counts()
+        self.assertEqual(counts['food_type', 'veg'], 1)
+        self.assertEqual(counts['open_status', 'true'], 1)
+        self.assertEqual(counts['open_status', 'false'], 1)
+        self.assertEqual(counts['city', 'chennai'], 2)
+        self.assertEqual(counts['cuisines', str(self.indian.pk)], 2)
+        self.assertMatchesRebuild()
+
+    def test_changed_values_move_between_counts(self):
+        self.dhaba.food_type = 'veg'
+        self.dhaba.city = "Madurai"
+        self.dhaba.save()
+        counts = stored_counts()
+        self.assertEqual(counts['food_type', 'veg'], 2)
+        self.assertEqual(counts['food_type', 'non_veg'], 0)
+        self.assertEqual(counts['city', 'chennai'], 1)
+        self.assertEqual(FacetCount.objects.get(facet='city', value='madurai').label, "Madurai")
+        self.assertMatchesRebuild()
+
+    def test_cuisine_links_and_deletes(self):
+        self.pizza.cuisines.remove(self.indian, Cuisine.objects.create(name="Unlinked"))
+        self.italian.restaurants.add(self.dhaba)
+        self.assertEqual(stored_counts()['cuisines', str(self.indian.pk)], 1)
+        self.assertEqual(stored_counts()['cuisines', str(self.italian.pk)], 2)
+        self.italian.restaurants.clear()
+        self.assertEqual(stored_counts()['cuisines', str(self.italian.pk)], 0)
+        self.dhaba.delete()
+        self.assertEqual(stored_counts()['cuisines', str(self.indian.pk)], 0)
+        self.assertEqual(stored_counts()['city', 'chennai'], 1)
+        self.indian.delete()
+        self.assertNotIn(('cuisines', str(self.indian.pk)), stored_counts())
+        self.assertMatchesRebuild()
+
+    def test_partially_loaded_restaurant_save_moves_counts(self):
+        restaurant = Restaurant.objects.only('pk', 'name').get(pk=self.pizza.pk)
+        restaurant.food_type = 'vegan'
+        with CaptureQueriesContext(connection) as queries:
+            restaurant.save(update_fields=['food_type'])
+        # Moved in place rather than by rebuilding the whole table.
+        self.assertFalse([query for query in queries if 'DELETE FROM "restaurants_facetcount"' in query['sql']])
+        self.assertEqual(stored_counts()['food_type', 'vegan'], 1)
+        self.assertEqual(stored_counts()['food_type', 'veg'], 0)
+        self.assertMatchesRebuild()
+
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        facets._index = None
+        self.italian = Cuisine.objects.create(name="Italian")
+        self.restaurants = [
+            Restaurant.objects.create(name=f"R{i}", city="Chennai" if i % 2 else "Pune", cost_for_two=100,
+                                      food_type='veg' if i < 6 else 'vegan')
+            for i in range(10)
+        ]
+        self.italian.restaurants.add(*self.restaurants[:3])
+
+    def test_bitmap_counts_within_result_set(self):
+        index = FacetIndex([1, 5, 9], [(('city', 'x'), 5), (('city', 'x'), 9), (('city', 'y'), 1)], {})
+        self.assertEqual(index.counts(index.bitmap([5, 1, 42])), {('city', 'x'): 1, ('city', 'y'): 1})
+
+    def test_filtered_facets_count_only_listed_restaurants(self):
+        groups = {group.facet: group for group in get_facets([r.pk for r in self.restaurants[:4]])}
+        self.assertEqual(
+            [(value.label, value.count) for value in groups['city'].values], [("Chennai", 2), ("Pune", 2)]
+        )
+        self.assertEqual([(value.label, value.count) for value in groups['cuisines'].values], [("Italian", 3)])
+        self.assertNotIn('vegan', [value.value for value in groups['food_type'].values])
+
+    def test_queryset_counts_match_the_index(self):
+        restaurants = Restaurant.objects.filter(pk__in=[r.pk for r in self.restaurants[:4]]).order_by('-name')
+        get_facet_index()
+        # Only the filtered ids are read; the counting is done on bitmaps.
+        with self.assertNumQueries(1):
+            grouped = get_facets(restaurants=restaurants)
+        self.assertEqual(grouped, get_facets([r.pk for r in self.restaurants[:4]]))
+        limited = {group.facet: group for group in get_facets(restaurants=Restaurant.objects.all(), limit=1)}
+        self.assertEqual([(value.label, value.count) for value in limited['food_type'].values], [("Vegetarian", 6)])
+
+    def test_index_is_rebuilt_after_changes(self):
+        index = get_facet_index()
+        self.assertIs(get_facet_index(), index)
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.create(name="New", city="Pune", cost_for_two=100)
+        self.assertEqual(len(get_facet_index().restaurant_ids), 11)
+
+class RestaurantListFacetTests(TestCase):
+    def setUp(self):
+        facets._index = None
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        italian = Cuisine.objects.create(name="Italian")
+        Restaurant.objects.create(name="Pizza Hut", city="Chennai", cost_for_two=200, food_type='veg').cuisines.add(italian)
+        Restaurant.objects.create(name="A2B", city="Chennai", cost_for_two=300, food_type='veg')
+        Restaurant.objects.create(name="Dhaba", city="Pune", cost_for_two=300, food_type='non_veg')
+
+    def test_unfiltered_sidebar_uses_stored_counts(self):
+        response = self.client.get(reverse('restaurant-list'))
+        self.assertContains(response, "Chennai (2)")
+        self.assertContains(response, "Vegetarian (2)")
+        self.assertContains(response, "Italian (1)")
+
+    def test_filtered_sidebar_counts_the_result_set(self):
+        response = self.client.get(reverse('restaurant-list'), {'food_type': 'veg'})
+        self.assertContains(response, "Chennai (2)")
+        self.assertNotContains(response, "Pune (")
+        self.assertContains(response, 'href="?food_type=veg&amp;city=Chennai&amp;city_match=exact"')
+
+    def test_facet_links_keep_the_mode_of_other_filters(self):
+        response = self.client.get(reverse('restaurant-list'), {'city': 'chen'})
+        self.assertContains(response, "Italian (1)")
+        link = next(
+            value['query'] for group in response.context['facets'] for value in group['values']
+            if value['label'] == "Italian"
+        )
+        self.assertEqual(link, 'city=chen&cuisines=Italian&cuisines_match=exact')
+        response = self.client.get(f"{reverse('restaurant-list')}?{link}")
+        self.assertEqual([restaurant.name for restaurant in response.context['restaurants']], ["Pizza Hut"])
@@ -0,0 +1,99 @@
+from itertools import product
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from restaurants import filter_engine, seeding
+from restaurants.filter_engine import get_filter_engine
+from restaurants.filters import RestaurantFilter
+from restaurants.models import Restaurant, Review
+
+User = get_user_model()
+
+class FilterEngineMatchesOrmTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed(120, 400, 20, cuisines=8)
+        # Ties on cost and unrated restaurants exercise the tie-breakers.
+        Restaurant.objects.filter(pk__in=Restaurant.objects.order_by('pk').values('pk')[:30]).update(cost_for_two=500)
+
+    def setUp(self):
+        filter_engine._engine = None
+
+    def orm_ids(self, data):
+        return list(RestaurantFilter(data, queryset=Restaurant.objects.order_by('id')).qs.values_list('pk', flat=True))
+
+    def engine_ids(self, data):
+        engine = get_filter_engine()
+        query = {name: value for name, value in data.items() if name != 'sort'}
+        if 'open_status' in query:
+            query['open_status'] = query['open_status'] == 'true'
+        return engine.ids(engine.select(**query), data.get('sort'))
+
+    def test_filter_and_sort_combinations(self):
+        combinations = product(
+            [{}, {'food_type': 'veg'}, {'open_status': 'false'}],
+            [
+                {}, {'city': 'chennai', 'match': 'exact'}, {'city': 'CH', 'match': 'prefix'}, {'city': 'ai'},
+                {'city': 'chennai', 'city_match': 'exact'},
+            ],
+            [
+                {}, {'cuisines': 'indian'}, {'cuisines': 'south indian', 'match': 'exact'},
+                {'cuisines': 'south indian', 'cuisines_match': 'exact'},
+            ],
+            [{}, {'sort': 'cost_asc'}, {'sort': 'cost_desc'}, {'sort': 'rating_asc'}, {'sort': 'rating_desc'}],
+        )
+        for parts in combinations:
+            data = {key: value for part in parts for key, value in part.items()}
+            with self.subTest(data=data):
+                self.assertEqual(self.engine_ids(data), self.orm_ids(data))
+
+    def test_pages_are_slices_of_the_full_order(self):
+        engine = get_filter_engine()
+        bitset = engine.select(food_type='veg')
+        ids = engine.ids(bitset, 'rating_desc')
+        self.assertEqual(engine.ids(bitset, 'rating_desc', 9, 18), ids[9:18])
+        self.assertEqual(len(ids), bitset.bit_count())
+
+@override_settings(RESTAURANTS_FILTER_ENGINE=True)
+class FilterEngineViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        filter_engine._engine = None
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        for i in range(12):
+            Restaurant.objects.create(name=f"Restaurant{i}", city="Chennai", cost_for_two=100 * (i % 4 + 1),
+                                      food_type='veg' if i % 2 else 'vegan', spotlight=i < 10)
+
+    def test_list_pages_come_from_the_engine(self):
+        response = self.client.get(reverse('restaurant-list'), {'food_type': 'veg', 'sort': 'cost_desc'})
+        self.assertIsNotNone(response.context['view'].engine_result)
+        costs = [restaurant.cost_for_two for restaurant in response.context['restaurants']]
+        self.assertEqual(costs, [400, 400, 400, 200, 200, 200])
+
+    def test_engine_does_not_count_in_sql(self):
+        self.client.get(reverse('restaurant-list'), {'food_type': 'veg'})
+        with self.settings(RESTAURANTS_FILTER_ENGINE=False):
+            # Count, page, photos and the filtered ids for the facet bitmaps.
+            with self.assertNumQueries(6):
+                self.client.get(reverse('restaurant-list'), {'food_type': 'veg'})
+        with self.assertNumQueries(4):
+            self.client.get(reverse('restaurant-list'), {'food_type': 'veg'})
+
+    def test_unsupported_filters_fall_back_to_the_orm(self):
+        response = self.client.get(reverse('restaurant-list'), {'name': 'Restaurant1'})
+        self.assertIsNone(response.context['view'].engine_result)
+        self.assertEqual(len(response.context['restaurants']), 3)
+
+    def test_home_page_spotlight(self):
+        response = self.client.get(reverse('home'), {'page': 2})
+        self.assertEqual([r.name for r in response.context['spotlighted_restaurants']], ["Restaurant9"])
+
+    def test_engine_is_rebuilt_after_review(self):
+        get_filter_engine()
+        restaurant = Restaurant.objects.get(name="Restaurant3")
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, restaurant=restaurant, rating=5)
+        response = self.client.get(reverse('restaurant-list'), {'sort': 'rating_desc'})
+        self.assertEqual(response.context['restaurants'][0], restaurant)
@@ -0,0 +1,99 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from restaurants.filters import RestaurantFilter
+from restaurants.geo import covering_prefixes, encode_geohash, haversine_km
+from restaurants.models import Restaurant
+
+User = get_user_model()
+
+CENTRAL = (13.0827, 80.2707)
+T_NAGAR = (13.0418, 80.2341)
+ADYAR = (13.0012, 80.2565)
+BANGALORE = (12.9716, 77.5946)
+
+class GeoHelperTests(TestCase):
+    def test_encode_geohash_matches_reference(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_haversine_distance(self):
+        self.assertAlmostEqual(haversine_km(*CENTRAL, *BANGALORE), 290, delta=5)
+        self.assertEqual(haversine_km(*CENTRAL, *CENTRAL), 0)
+
+    def test_covering_prefixes_contain_points_within_radius(self):
+        for radius in (0.5, 5, 50):
+            prefixes = covering_prefixes(*CENTRAL, radius)
+            self.assertLessEqual(len(prefixes), 9)
+            for point in (T_NAGAR, ADYAR):
+                if haversine_km(*CENTRAL, *point) <= radius:
+                    geohash = encode_geohash(*point)
+                    self.assertTrue(any(geohash.startswith(prefix) for prefix in prefixes))
+
+    def test_covering_prefixes_wrap_around_antimeridian(self):
+        prefixes = covering_prefixes(0, 179.99, 10)
+        self.assertTrue(any(encode_geohash(0, -179.99).startswith(prefix) for prefix in prefixes))
+
+class NearFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.central = self.create("Central", CENTRAL)
+        self.t_nagar = self.create("T Nagar", T_NAGAR)
+        self.adyar = self.create("Adyar", ADYAR)
+        self.bangalore = self.create("Bangalore", BANGALORE)
+        self.unplaced = Restaurant.objects.create(name="Unplaced", city="Chennai", cost_for_two=100)
+
+    def create(self, name, location):
+        return Restaurant.objects.create(
+            name=name, city="Chennai", cost_for_two=100, latitude=location[0], longitude=location[1]
+        )
+
+    def filtered(self, data):
+        return list(RestaurantFilter(data, queryset=Restaurant.objects.all()).qs)
+
+    def test_geohash_is_kept_in_sync_on_save(self):
+        self.assertEqual(self.central.geohash, encode_geohash(*CENTRAL))
+        self.central.latitude, self.central.longitude = BANGALORE
+        self.central.save(update_fields=['latitude', 'longitude'])
+        self.central.refresh_from_db()
+        self.assertEqual(self.central.geohash, encode_geohash(*BANGALORE))
+        self.assertEqual(self.unplaced.geohash, '')
+
+    def test_near_filter_keeps_restaurants_in_radius_nearest_first(self):
+        radius = haversine_km(*CENTRAL, *T_NAGAR) + 0.5
+        restaurants = self.filtered({'near': '13.0827,80.2707', 'radius': radius})
+        self.assertEqual(restaurants, [self.central, self.t_nagar])
+        self.assertAlmostEqual(restaurants[1].distance_km, haversine_km(*CENTRAL, *T_NAGAR))
+
+    def test_near_filter_uses_default_radius(self):
+        restaurants = self.filtered({'near': '13.0827,80.2707'})
+        self.assertEqual(restaurants, [self.central])
+
+    def test_explicit_sort_overrides_distance_order(self):
+        restaurants = self.filtered({'near': '13.0418,80.2341', 'radius': 20, 'sort': 'rating_desc'})
+        self.assertEqual(set(restaurants), {self.central, self.t_nagar, self.adyar})
+        restaurants = self.filtered({'near': '13.0418,80.2341', 'radius': 20, 'sort': 'distance'})
+        self.assertEqual(restaurants[0], self.t_nagar)
+
+    def test_distances_are_computed_in_one_statement(self):
+        for i in range(40):
+            self.create(f"Nearby{i}", (CENTRAL[0] + i / 1000, CENTRAL[1]))
+        with CaptureQueriesContext(connection) as queries:
+            restaurants = self.filtered({'near': '13.0827,80.2707', 'radius': 100})
+        self.assertEqual(len(queries), 1)
+        # Bounded by the covering cells, not by the number of matches.
+        self.assertNotIn('CASE', queries[0]['sql'])
+        self.assertEqual(len(restaurants), 43)
+        self.assertEqual(restaurants[0], self.central)
+        self.assertEqual([r.distance_km for r in restaurants], sorted(r.distance_km for r in restaurants))
+
+    def test_invalid_near_value_is_rejected(self):
+        restaurant_filter = RestaurantFilter({'near': 'chennai'}, queryset=Restaurant.objects.all())
+        self.assertFalse(restaurant_filter.is_valid())
+
+    def test_list_view_shows_distance(self):
+        response = self.client.get(reverse('restaurant-list'), {'near': '13.0827,80.2707', 'radius': 8})
+        self.assertEqual(list(response.context['restaurants']), [self.central, self.t_nagar])
+        self.assertContains(response, " km")
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from restaurants.loaders import arun_loaders, run_loaders, server_timing
+from restaurants.models import Bookmark, Cuisine, MenuItem, Restaurant, Review
+
+User = get_user_model()
+
+def sleeper(value, seconds=0.2):
+    def load():
+        time.sleep(seconds)
+        return value, threading.current_thread().name
+    return load
+
+class LoaderTests(SimpleTestCase):
+    def test_loaders_run_concurrently_on_the_pool(self):
+        started = time.perf_counter()
+        values, timings = run_loaders({'a': sleeper(1), 'b': sleeper(2), 'c': sleeper(3)})
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual([value for value, _ in values.values()], [1, 2, 3])
+        self.assertTrue(all(thread.startswith('restaurants-loader') for _, thread in values.values()))
+        self.assertEqual(list(timings), ['a', 'b', 'c'])
+        self.assertGreaterEqual(timings['a'], 200)
+
+    def test_async_loaders_are_gathered(self):
+        started = time.perf_counter()
+        values, _ = asyncio.run(arun_loaders({'a': sleeper(1), 'b': sleeper(2)}))
+        self.assertLess(time.perf_counter() - started, 0.35)
+        self.assertEqual([value for value, _ in values.values()], [1, 2])
+
+    def test_loader_errors_are_raised(self):
+        with self.assertRaises(ZeroDivisionError):
+            run_loaders({'a': sleeper(1, 0), 'b': lambda: 1 / 0})
+
+    @override_settings(RESTAURANTS_LOADER_WORKERS=0)
+    def test_no_workers_runs_in_the_calling_thread(self):
+        values, _ = run_loaders({'a': sleeper(1, 0)})
+        self.assertEqual(values['a'], (1, threading.current_thread().name))
+
+    def test_server_timing(self):
+        self.assertEqual(server_timing({'menu_items': 1.234, 'user_review': 0.5}), 'menu_items;dur=1.23, user_review;dur=0.50')
+
+class DetailLoaderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="Dhaba", city="Pune", cost_for_two=300)
+        self.restaurant.cuisines.add(Cuisine.objects.create(name="Punjabi"))
+        for i in range(5):
+            MenuItem.objects.create(restaurant=self.restaurant, name=f"Dish{i}", description="Tasty")
+            Review.objects.create(user=User.objects.create(username=f'reviewer{i}'), restaurant=self.restaurant, rating=4)
+
+    def test_inside_a_transaction_loaders_run_in_the_calling_thread(self):
+        values, _ = run_loaders({'thread': lambda: threading.current_thread().name})
+        self.assertEqual(values['thread'], threading.current_thread().name)
+
+    def test_detail_page_reports_loader_timings(self):
+        response = self.client.get(reverse('restaurant-detail', args=[self.restaurant.pk]))
+        self.assertIn('recent_reviews;dur=', response['Server-Timing'])
+        self.assertContains(response, "Punjabi")
+
+    def test_templates_do_not_query_per_menu_item_or_review(self):
+        url = reverse('restaurant-detail', args=[self.restaurant.pk])
+        self.client.get(url)
+        # Session, user, the ETag stamps, restaurant, cuisines, cover photo,
+        # menu items and their photos, user review, recent reviews,
+        # bookmarks and visits.
+        with self.assertNumQueries(12):
+            self.client.get(url)
+
+class ConcurrentDetailTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="Dhaba", city="Pune", cost_for_two=300)
+        Bookmark.objects.create(user=self.user, restaurant=self.restaurant)
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=5, comment="Mine")
+
+    def test_detail_page_loads_on_the_pool(self):
+        response = self.client.get(reverse('restaurant-detail', args=[self.restaurant.pk]))
+        self.assertEqual(response.context['restaurant'], self.restaurant)
+        self.assertEqual(response.context['user_review'].comment, "Mine")
+        self.assertEqual(response.context['bookmarked_ids'], {self.restaurant.pk})
+
+    def test_pool_threads_keep_their_connections(self):
+        def load():
+            Restaurant.objects.exists()
+            return connections['default']
+        values, _ = run_loaders({str(i): load for i in range(4)})
+        # Not closed after the loader as CONN_MAX_AGE = 0 would have it.
+        for connection in values.values():
+            self.assertIsNotNone(connection.connection)
+            self.assertGreater(connection.close_at, time.monotonic() + 30)
+
+    def test_missing_restaurant_returns_404(self):
+        self.assertEqual(self.client.get(reverse('restaurant-detail', args=[9999])).status_code, 404)
@@ -0,0 +1,149 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from restaurants import membership
+from restaurants.models import Restaurant, Bookmark, Visit
+
+User = get_user_model()
+
+class MembershipCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.restaurants = [
+            Restaurant.objects.create(name=f"Restaurant{i}", city="chennai", cost_for_two=100) for i in range(5)
+        ]
+        Bookmark.objects.create(user=self.user, restaurant=self.restaurants[3])
+        Bookmark.objects.create(user=self.user, restaurant=self.restaurants[1])
+
+    def ids(self, *indexes):
+        return {self.restaurants[i].pk for i in indexes}
+
+    def test_ids_are_cached_as_sorted_array(self):
+        restaurant_ids = membership.get_restaurant_ids(self.user, 'bookmarks')
+        self.assertEqual(list(restaurant_ids), sorted(self.ids(1, 3)))
+        with self.assertNumQueries(0):
+            self.assertEqual(membership.get_membership(self.user, 'bookmarks'), self.ids(1, 3))
+
+    def test_membership_is_limited_to_requested_ids(self):
+        page_ids = [r.pk for r in self.restaurants[:2]]
+        self.assertEqual(membership.get_membership(self.user, 'bookmarks', page_ids), self.ids(1))
+
+    def test_page_scope_queries_only_page_on_miss(self):
+        page_ids = [self.restaurants[3].pk]
+        with self.assertNumQueries(1):
+            self.assertEqual(membership.get_membership(self.user, 'bookmarks', page_ids, scope='page'), self.ids(3))
+        self.assertIsNone(membership.get_cached_ids(self.user.pk, 'bookmarks'))
+
+    def test_commits_patch_cached_set_in_place(self):
+        membership.get_restaurant_ids(self.user, 'bookmarks')
+        with self.captureOnCommitCallbacks(execute=True):
+            Bookmark.objects.create(user=self.user, restaurant=self.restaurants[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            Bookmark.objects.get(user=self.user, restaurant=self.restaurants[3]).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(membership.get_membership(self.user, 'bookmarks'), self.ids(0, 1))
+
+    def test_racing_change_invalidates_instead_of_patching(self):
+        membership.get_restaurant_ids(self.user, 'visits')
+        membership.bump_version(membership.version_name('visits', self.user.pk))
+        membership.record_change(self.user.pk, 'visits', self.restaurants[2].pk, True)
+        self.assertIsNone(membership.get_cached_ids(self.user.pk, 'visits'))
+
+    def test_anonymous_user_has_no_membership(self):
+        self.client.logout()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['bookmarked_ids'], set())
+
+class MembershipViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="A2B", city="chennai", cost_for_two=100)
+        self.other = Restaurant.objects.create(name="B2C", city="chennai", cost_for_two=100)
+
+    def test_toggle_updates_list_page_state(self):
+        self.client.get(reverse('restaurant-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('bookmark_toggle', args=[self.restaurant.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('visited_toggle', args=[self.other.id]))
+        response = self.client.get(reverse('restaurant-list'))
+        self.assertEqual(response.context['bookmarked_ids'], {self.restaurant.pk})
+        self.assertEqual(response.context['visited_ids'], {self.other.pk})
+
+    def test_detail_page_checks_only_its_restaurant(self):
+        Visit.objects.create(user=self.user, restaurant=self.restaurant)
+        Visit.objects.create(user=self.user, restaurant=self.other)
+        response = self.client.get(reverse('restaurant-detail', args=[self.restaurant.pk]))
+        self.assertEqual(response.context['visited_ids'], {self.restaurant.pk})
+
+class MembershipToggleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="A2B", city="chennai", cost_for_two=100)
+        self.url = reverse('bookmark_toggle', args=[self.restaurant.pk])
+
+    def bookmarked(self):
+        return Bookmark.objects.filter(user=self.user, restaurant=self.restaurant).exists()
+
+    def test_toggle_is_one_statement_per_change(self):
+        # Session, user, then the DELETE, and the INSERT when it deleted nothing.
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'restaurant_id': self.restaurant.pk, 'bookmarked': True})
+        self.assertTrue(self.bookmarked())
+        with self.assertNumQueries(3):
+            response = self.client.post(f'{self.url}?format=json')
+        self.assertEqual(response.json(), {'restaurant_id': self.restaurant.pk, 'bookmarked': False})
+        self.assertFalse(self.bookmarked())
+
+    def test_put_and_delete_are_idempotent(self):
+        for _ in range(2):
+            response = self.client.put(self.url)
+            self.assertEqual(response.json()['bookmarked'], True)
+        self.assertEqual(Bookmark.objects.filter(user=self.user).count(), 1)
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.json()['bookmarked'], False)
+        self.assertFalse(self.bookmarked())
+
+    def test_changes_update_the_membership_cache(self):
+        membership.get_restaurant_ids(self.user, 'visits')
+        url = reverse('visited_toggle', args=[self.restaurant.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(url)
+        self.assertEqual(membership.get_membership(self.user, 'visits'), {self.restaurant.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(url)
+        self.assertEqual(membership.get_membership(self.user, 'visits'), set())
+
+    def test_fragment_renders_the_new_toggle(self):
+        response = self.client.post(f'{self.url}?format=fragment', {'next': '/restaurants/'})
+        self.assertTemplateUsed(response, 'restaurants/bookmark_toggle.html')
+        self.assertContains(response, 'title="Remove bookmark"')
+        self.assertContains(response, 'name="next" value="/restaurants/"')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_missing_restaurant_is_404(self):
+        url = reverse('bookmark_toggle', args=[9999])
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertEqual(self.client.put(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertFalse(Bookmark.objects.exists())
+
+    def test_add_skips_an_existing_row(self):
+        Bookmark.objects.create(user=self.user, restaurant=self.restaurant)
+        self.assertFalse(membership.add_restaurant(self.user.pk, 'bookmarks', self.restaurant.pk))
+        self.assertEqual(membership.toggle_restaurant(self.user.pk, 'bookmarks', self.restaurant.pk), False)
+        self.assertEqual(membership.toggle_restaurant(self.user.pk, 'bookmarks', self.restaurant.pk), True)
+        self.assertIsNotNone(Bookmark.objects.get(user=self.user).created_at)
+
+    def test_scripted_requests_are_refused_without_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.put(self.url).status_code, 403)
+        self.assertEqual(self.client.post(self.url).status_code, 302)
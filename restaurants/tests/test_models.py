@@ -1,6 +1,10 @@
 from django.test import TestCase
+from django.conf import settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
 from decimal import Decimal
-from restaurants.models import Cuisine, Restaurant, MenuItem, RestaurantPhoto
+from io import StringIO
+from restaurants.models import Cuisine, Restaurant, MenuItem, RestaurantPhoto, Review, RestaurantRatingStats
 
 class ModelTest(TestCase):
     def setUp(self):
@@ -44,3 +48,139 @@ class ModelTest(TestCase):
         )
         self.restaurant.delete()
         self.assertEqual(MenuItem.objects.count(), 0)
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.other_user = User.objects.create_user(username='other', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(
+            name="A2B",
+            address="ABC Street",
+            city="Chennai",
+            cost_for_two=300,
+        )
+
+    def test_restaurant_without_reviews_has_no_average(self):
+        self.assertIsNone(self.restaurant.rating_avg)
+        self.assertEqual(self.restaurant.average_rating, 0)
+        self.assertEqual(self.restaurant.total_reviews, 0)
+
+    def test_creating_reviews_updates_aggregates(self):
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=5)
+        Review.objects.create(user=self.other_user, restaurant=self.restaurant, rating=2)
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.rating_sum, 7)
+        self.assertEqual(self.restaurant.total_reviews, 2)
+        self.assertEqual(self.restaurant.average_rating, 3.5)
+
+    def test_updating_review_rating_adjusts_aggregates(self):
+        review = Review.objects.create(user=self.user, restaurant=self.restaurant, rating=2)
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 4
+        review.save()
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.rating_sum, 4)
+        self.assertEqual(self.restaurant.total_reviews, 1)
+        self.assertEqual(self.restaurant.average_rating, 4)
+
+    def test_moving_review_to_another_restaurant_adjusts_both(self):
+        other = Restaurant.objects.create(name="B2C", address="X", city="Chennai", cost_for_two=100)
+        review = Review.objects.create(user=self.user, restaurant=self.restaurant, rating=3)
+        review.restaurant = other
+        review.save()
+        self.restaurant.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.restaurant.total_reviews, 0)
+        self.assertIsNone(self.restaurant.rating_avg)
+        self.assertEqual(other.total_reviews, 1)
+        self.assertEqual(other.average_rating, 3)
+
+    def test_deleting_reviews_updates_aggregates(self):
+        review = Review.objects.create(user=self.user, restaurant=self.restaurant, rating=5)
+        Review.objects.create(user=self.other_user, restaurant=self.restaurant, rating=1)
+        review.delete()
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.total_reviews, 1)
+        self.assertEqual(self.restaurant.average_rating, 1)
+        Review.objects.all().delete()
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.rating_sum, 0)
+        self.assertEqual(self.restaurant.total_reviews, 0)
+        self.assertIsNone(self.restaurant.rating_avg)
+
+    def test_rebuild_ratings_command_recomputes_from_reviews(self):
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=4)
+        Review.objects.create(user=self.other_user, restaurant=self.restaurant, rating=3)
+        Restaurant.objects.update(rating_sum=0, rating_count=0, rating_avg=None)
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.rating_sum, 7)
+        self.assertEqual(self.restaurant.total_reviews, 2)
+        self.assertEqual(self.restaurant.average_rating, 3.5)
+
+class RestaurantRatingStatsTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345678') for i in range(3)]
+        self.restaurant = Restaurant.objects.create(
+            name="A2B",
+            address="ABC Street",
+            city="Chennai",
+            cost_for_two=300,
+        )
+
+    def get_stats(self):
+        return RestaurantRatingStats.objects.get(restaurant=self.restaurant)
+
+    def test_stats_row_is_created_with_restaurant(self):
+        stats = self.get_stats()
+        self.assertEqual(stats.total, 0)
+        self.assertIsNone(stats.last_reviewed_at)
+        self.assertEqual(stats.weighted_score, settings.RATING_PRIOR_MEAN)
+
+    def test_review_writes_update_star_counts(self):
+        Review.objects.create(user=self.users[0], restaurant=self.restaurant, rating=5)
+        review = Review.objects.create(user=self.users[1], restaurant=self.restaurant, rating=5)
+        Review.objects.create(user=self.users[2], restaurant=self.restaurant, rating=1)
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 3
+        review.save()
+        stats = self.get_stats()
+        self.assertEqual((stats.one_star, stats.two_star, stats.three_star, stats.four_star, stats.five_star), (1, 0, 1, 0, 1))
+        self.assertEqual(stats.last_reviewed_at, review.updated_at)
+
+    def test_deleting_latest_review_moves_last_reviewed_at_back(self):
+        first = Review.objects.create(user=self.users[0], restaurant=self.restaurant, rating=4)
+        latest = Review.objects.create(user=self.users[1], restaurant=self.restaurant, rating=2)
+        latest.delete()
+        stats = self.get_stats()
+        self.assertEqual(stats.two_star, 0)
+        self.assertEqual(stats.four_star, 1)
+        self.assertEqual(stats.last_reviewed_at, first.updated_at)
+
+    def test_weighted_score_is_pulled_towards_prior(self):
+        Review.objects.create(user=self.users[0], restaurant=self.restaurant, rating=5)
+        prior_mean, prior_weight = settings.RATING_PRIOR_MEAN, settings.RATING_PRIOR_WEIGHT
+        expected = (prior_mean * prior_weight + 5) / (prior_weight + 1)
+        self.assertAlmostEqual(self.get_stats().weighted_score, expected)
+
+    def test_histogram_lists_stars_from_five_down(self):
+        Review.objects.create(user=self.users[0], restaurant=self.restaurant, rating=5)
+        Review.objects.create(user=self.users[1], restaurant=self.restaurant, rating=4)
+        Review.objects.create(user=self.users[2], restaurant=self.restaurant, rating=4)
+        histogram = self.get_stats().histogram()
+        self.assertEqual([row['star'] for row in histogram], [5, 4, 3, 2, 1])
+        self.assertEqual([row['count'] for row in histogram], [1, 2, 0, 0, 0])
+        self.assertEqual(histogram[1]['percent'], 67)
+
+    def test_deleting_restaurant_with_reviews_removes_stats(self):
+        Review.objects.create(user=self.users[0], restaurant=self.restaurant, rating=5)
+        self.restaurant.delete()
+        self.assertFalse(RestaurantRatingStats.objects.exists())
+
+    def test_rebuild_ratings_command_recreates_missing_stats(self):
+        Review.objects.create(user=self.users[0], restaurant=self.restaurant, rating=2)
+        RestaurantRatingStats.objects.all().delete()
+        call_command('rebuild_ratings', stdout=StringIO())
+        stats = self.get_stats()
+        self.assertEqual(stats.two_star, 1)
+        self.assertIsNotNone(stats.last_reviewed_at)
@@ -0,0 +1,122 @@
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from restaurants import page_cache
+from restaurants.models import Restaurant, RestaurantPhoto, Review
+
+User = get_user_model()
+
+class HomePageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.restaurant = Restaurant.objects.create(name="A2B", city="chennai", cost_for_two=100, spotlight=True)
+        self.other = Restaurant.objects.create(name="Saravana", city="chennai", cost_for_two=100)
+        self.url = reverse('home')
+
+    def rename_quietly(self):
+        # Bypasses the signals, so only the card's own version changes.
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(
+            name="Renamed quietly", cache_version=F('cache_version') + 1
+        )
+
+    def test_anonymous_page_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertIn('Cookie', second['Vary'])
+
+    def test_anonymous_page_has_no_csrf_token(self):
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, f"{reverse('login')}?next=/")
+
+    def test_authenticated_page_is_not_cached(self):
+        self.client.login(username='user', password='pass12345678')
+        self.client.get(self.url)
+        self.rename_quietly()
+        self.assertContains(self.client.get(self.url), "Renamed quietly")
+
+    def test_spotlight_change_invalidates_page(self):
+        self.client.get(self.url)
+        self.other.spotlight = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.save()
+        self.assertContains(self.client.get(self.url), "Saravana")
+
+    def test_review_of_spotlighted_restaurant_invalidates_page(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, restaurant=self.restaurant, rating=4)
+        self.assertContains(self.client.get(self.url), "4.0★ | 1 Reviews")
+
+    def test_review_of_other_restaurant_keeps_page(self):
+        self.client.get(self.url)
+        version = page_cache.get_version(page_cache.HOME_PAGE_VERSION)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Review.objects.create(user=self.user, restaurant=self.other, rating=4)
+        self.assertEqual(page_cache.get_version(page_cache.HOME_PAGE_VERSION), version)
+        self.assertEqual(len([c for c in callbacks if c is page_cache.invalidate_home_page]), 0)
+
+    def test_evicted_version_counter_is_not_reused(self):
+        self.client.get(self.url)
+        version = page_cache.bump_version(page_cache.HOME_PAGE_VERSION)
+        cache.delete('restaurants:version:' + page_cache.HOME_PAGE_VERSION)
+        self.assertGreater(page_cache.get_version(page_cache.HOME_PAGE_VERSION), version)
+
+    def test_photo_change_invalidates_page(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantPhoto.objects.create(restaurant=self.restaurant, image="restaurant_photos/cover.jpg")
+        self.assertContains(self.client.get(self.url), "restaurant_photos/cover.jpg")
+
+    def test_unknown_query_parameters_bypass_cache(self):
+        self.client.get(self.url)
+        self.rename_quietly()
+        self.assertContains(self.client.get(self.url, {'utm_source': 'mail'}), "Renamed quietly")
+        self.assertNotContains(self.client.get(self.url, {'page': 1}), "Renamed quietly")
+
+class GetOrBuildTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_builds_once_then_serves_cached_value(self):
+        build = mock.Mock(return_value='page')
+        self.assertEqual(page_cache.get_or_build('key', build, 60), 'page')
+        self.assertEqual(page_cache.get_or_build('key', build, 60), 'page')
+        build.assert_called_once()
+
+    def test_early_refresh_while_locked_serves_stale_value(self):
+        page_cache.get_or_build('key', lambda: 'old', 60)
+        cache.add('key:lock', 1)
+        build = mock.Mock(return_value='new')
+        with mock.patch.object(page_cache, 'should_refresh_early', return_value=True):
+            self.assertEqual(page_cache.get_or_build('key', build, 60), 'old')
+        build.assert_not_called()
+
+    def test_early_refresh_rebuilds_when_lock_is_free(self):
+        page_cache.get_or_build('key', lambda: 'old', 60)
+        with mock.patch.object(page_cache, 'should_refresh_early', return_value=True):
+            self.assertEqual(page_cache.get_or_build('key', lambda: 'new', 60), 'new')
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_cold_miss_waits_for_lock_holder(self):
+        cache.add('key:lock', 1)
+        build = mock.Mock(return_value='mine')
+
+        def finish_build(seconds):
+            cache.set('key', ('theirs', 0.1, 0), 60)
+
+        with mock.patch.object(page_cache.time, 'sleep', side_effect=finish_build):
+            self.assertEqual(page_cache.get_or_build('key', build, 60), 'theirs')
+        build.assert_not_called()
+
+    def test_refresh_probability_rises_near_expiry(self):
+        now = page_cache.time.time()
+        with mock.patch.object(page_cache.random, 'random', return_value=0.5):
+            self.assertFalse(page_cache.should_refresh_early(0.1, now + 60))
+            self.assertTrue(page_cache.should_refresh_early(0.1, now))
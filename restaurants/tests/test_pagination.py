@@ -0,0 +1,96 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from restaurants.filters import RestaurantFilter
+from restaurants.models import Restaurant, Review, Bookmark
+from restaurants.pagination import CursorPaginator
+
+User = get_user_model()
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        reviewers = [User.objects.create_user(username=f'reviewer{i}', password='pass123') for i in range(2)]
+        ratings = [[5], [], [3, 4], [5], [], [2], [3, 4], [1], [], [5], [4]]
+        for i, restaurant_ratings in enumerate(ratings):
+            restaurant = Restaurant.objects.create(name=f"Restaurant{i}", city="chennai", cost_for_two=100 * (i % 4))
+            for reviewer, rating in zip(reviewers, restaurant_ratings):
+                Review.objects.create(user=reviewer, restaurant=restaurant, rating=rating)
+
+    def walk(self, queryset, per_page):
+        paginator = CursorPaginator(queryset, per_page)
+        pages = [paginator.page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        forward = [obj.pk for page in pages for obj in page]
+        backward_pages = [pages[-1]]
+        while backward_pages[-1].previous_cursor:
+            backward_pages.append(paginator.page(backward_pages[-1].previous_cursor))
+        backward = [obj.pk for page in reversed(backward_pages) for obj in page]
+        return forward, backward, pages
+
+    def test_walks_every_sort_order_forwards_and_backwards(self):
+        for sort in ('', 'cost_asc', 'cost_desc', 'rating_asc', 'rating_desc'):
+            with self.subTest(sort=sort):
+                queryset = RestaurantFilter({'sort': sort}, queryset=Restaurant.objects.all()).qs
+                expected = list(queryset.order_by(*(queryset.query.order_by or ['id'])).values_list('pk', flat=True))
+                forward, backward, pages = self.walk(queryset, 3)
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+                self.assertEqual(len(pages), 4)
+                self.assertFalse(pages[0].has_previous())
+                self.assertFalse(pages[-1].has_next())
+
+    def test_walks_review_default_ordering(self):
+        Review.objects.filter(rating=5).update(updated_at=Review.objects.first().updated_at)
+        queryset = Review.objects.all()
+        expected = list(queryset.order_by('-updated_at', '-created_at', '-id').values_list('pk', flat=True))
+        forward, backward, _ = self.walk(queryset, 4)
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_approximate_count_is_capped(self):
+        page = CursorPaginator(Restaurant.objects.all(), 3, count_limit=5).page()
+        self.assertEqual(page.count_display, "5+")
+        page = CursorPaginator(Restaurant.objects.all(), 3, count_limit=50).page()
+        self.assertEqual(page.count_display, "11")
+
+    def test_malformed_cursor_is_rejected(self):
+        paginator = CursorPaginator(Restaurant.objects.order_by('id'), 3)
+        for cursor in ('garbage', 'eyJkIjoibiJ9', 'W10'):
+            with self.assertRaises(ValueError):
+                paginator.page(cursor)
+
+class CursorPaginationViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        for i in range(12):
+            restaurant = Restaurant.objects.create(name=f"Restaurant{i}", city="chennai", cost_for_two=100 * i)
+            Bookmark.objects.create(user=self.user, restaurant=restaurant)
+
+    def test_restaurant_list_uses_cursor_when_requested(self):
+        url = reverse('restaurant-list')
+        response = self.client.get(url, {'cursor': '', 'sort': 'cost_desc'})
+        page = response.context['page_obj']
+        self.assertTrue(page.is_cursor)
+        self.assertEqual([r.cost_for_two for r in response.context['restaurants']], [1100 - 100 * i for i in range(9)])
+        self.assertContains(response, f'?cursor={page.next_cursor}&sort=cost_desc')
+        response = self.client.get(url, {'cursor': page.next_cursor, 'sort': 'cost_desc'})
+        self.assertEqual([r.cost_for_two for r in response.context['restaurants']], [200, 100, 0])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_restaurant_list_keeps_page_numbers_by_default(self):
+        response = self.client.get(reverse('restaurant-list'))
+        self.assertFalse(hasattr(response.context['page_obj'], 'is_cursor'))
+
+    def test_bookmarks_list_pages_by_cursor(self):
+        response = self.client.get(reverse('bookmarks_list'), {'cursor': ''})
+        first_page = list(response.context['bookmarked_restaurants'])
+        self.assertEqual(len(first_page), 9)
+        response = self.client.get(reverse('bookmarks_list'), {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(len(response.context['bookmarked_restaurants']), 3)
+        self.assertFalse(set(first_page) & set(response.context['bookmarked_restaurants']))
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('restaurant-list'), {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 404)
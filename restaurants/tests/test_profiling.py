@@ -0,0 +1,89 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection
+from restaurants import profiling
+from restaurants.models import Restaurant
+
+User = get_user_model()
+
+class FingerprintTests(TestCase):
+    def test_in_lists_and_literals_are_collapsed(self):
+        self.assertEqual(
+            profiling.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 5'),
+            'SELECT ... FROM t WHERE id IN (...) AND x = ?',
+        )
+        self.assertEqual(profiling.fingerprint("SELECT 'a'"), profiling.fingerprint("SELECT 'b'"))
+
+class HistogramTests(TestCase):
+    def test_percentiles_and_merge(self):
+        histogram = profiling.Histogram((1, 10, 100))
+        for value in (0.5, 5, 5, 50):
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(0.5), 10)
+        self.assertEqual(histogram.percentile(1.0), 100)
+        other = profiling.Histogram((1, 10, 100))
+        other.add(500)
+        histogram.merge(other)
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.percentile(1.0), 500)
+
+class QueryRecorderTests(TestCase):
+    def test_repeated_statements_are_reported(self):
+        restaurants = [Restaurant.objects.create(name=f"R{i}", city="chennai", cost_for_two=100) for i in range(3)]
+        recorder = profiling.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for restaurant in restaurants:
+                Restaurant.objects.get(pk=restaurant.pk)
+            Restaurant.objects.count()
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(len(recorder.duplicates()), 1)
+        self.assertIn('WHERE "restaurants_restaurant"."id" = ? LIMIT ?', recorder.duplicates()[0])
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        Restaurant.objects.create(name="A2B", city="chennai", cost_for_two=100)
+
+    @override_settings(RESTAURANTS_PROFILING_SAMPLE_RATE=0)
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+    @override_settings(RESTAURANTS_PROFILING_SAMPLE_RATE=1.0, RESTAURANTS_PROFILING_FLUSH_INTERVAL=3600)
+    def test_sampled_request_is_recorded_per_url_name(self):
+        with mock.patch.object(profiling.Profiler, 'record') as record:
+            self.client.get(reverse('restaurant-list'))
+        route, measurements, duplicates = record.call_args.args
+        self.assertEqual(route, 'restaurant-list')
+        self.assertGreater(measurements['queries'], 0)
+        self.assertGreater(measurements['render_ms'], 0)
+        self.assertGreaterEqual(measurements['total_ms'], measurements['render_ms'])
+
+class ProfileOutputTests(TestCase):
+    def test_flushed_profiles_are_merged_into_report(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        profiler = profiling.Profiler(path, flush_interval=3600)
+        for total in (5, 15):
+            profiler.record('restaurant-detail', {'total_ms': total, 'db_ms': 1, 'render_ms': 2, 'queries': 20}, ['SELECT ?'])
+            profiler.flush()
+
+        with open(path) as profile_file:
+            routes = profiling.load_profiles(profile_file)
+        profile = routes['restaurant-detail']
+        self.assertEqual(profile.histograms['total_ms'].count, 2)
+        self.assertEqual(profile.duplicates['SELECT ?'], 2)
+
+        output = StringIO()
+        call_command('profile_report', path, stdout=output)
+        self.assertIn('restaurant-detail', output.getvalue())
+        self.assertIn('repeated in 2 requests: SELECT ?', output.getvalue())
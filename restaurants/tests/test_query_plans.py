@@ -0,0 +1,67 @@
+import re
+from unittest import skipUnless
+from django.test import TestCase
+from django.db import connection
+from restaurants import seeding
+from restaurants.filters import RestaurantFilter
+from restaurants.models import Restaurant, Review, Bookmark, Visit
+
+@skipUnless(connection.vendor == 'sqlite', "Plans are checked against SQLite's EXPLAIN QUERY PLAN output")
+class ListQueryPlanTests(TestCase):
+    """
+    Every list page query is answered from an index, without a full table
+    scan or a temporary sort.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        result = seeding.seed(100, 500, 30)
+        cls.restaurant_id = result.restaurant_ids[0]
+        cls.user_id = result.user_ids[0]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset[:10].explain()
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {index_name}\b')
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertIsNone(re.search(r'SCAN \w+$', plan, re.M), plan)
+
+    def filtered(self, **data):
+        return RestaurantFilter(data, queryset=Restaurant.objects.order_by('id')).qs
+
+    def test_home_spotlight(self):
+        self.assertUsesIndex(Restaurant.objects.filter(spotlight=True).order_by('id'), 'restaurant_spotlight_idx')
+
+    def test_food_type_and_open_status_filters(self):
+        self.assertUsesIndex(self.filtered(food_type='veg'), 'restaurant_type_open_idx')
+        self.assertUsesIndex(self.filtered(food_type='vegan', open_status='true'), 'restaurant_type_open_idx')
+
+    def test_filtered_count_is_covered(self):
+        queryset = self.filtered(food_type='veg', open_status='false')
+        with connection.cursor() as cursor:
+            sql, params = queryset.order_by().values('pk').query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM ({sql})', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING COVERING INDEX restaurant_type_open_idx', plan)
+
+    def test_cost_and_rating_sorts(self):
+        self.assertUsesIndex(self.filtered(sort='cost_asc'), 'restaurant_cost_idx')
+        self.assertUsesIndex(self.filtered(sort='cost_desc'), 'restaurant_cost_idx')
+        self.assertUsesIndex(self.filtered(sort='rating_asc'), 'restaurant_rating_idx')
+        self.assertUsesIndex(self.filtered(sort='rating_desc'), 'restaurant_rating_idx')
+
+    def test_recent_reviews_of_restaurant(self):
+        reviews = Review.objects.filter(restaurant_id=self.restaurant_id)
+        self.assertUsesIndex(reviews, 'review_restaurant_recent_idx')
+        self.assertUsesIndex(reviews.order_by('-updated_at', '-created_at', '-id'), 'review_restaurant_recent_idx')
+
+    def test_recent_bookmarks_and_visits_of_user(self):
+        self.assertUsesIndex(Bookmark.objects.filter(user_id=self.user_id), 'bookmark_user_recent_idx')
+        self.assertUsesIndex(Visit.objects.filter(user_id=self.user_id), 'visit_user_recent_idx')
+
+    def test_exact_city_and_cuisine_matches(self):
+        self.assertUsesIndex(self.filtered(city=' Chennai ', match='exact'), r'\w+_city_key_\w+')
+        plan = self.filtered(cuisines='south indian', match='exact').explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX \w+_name_key_\w+')
+
+    def test_prefix_city_match_is_an_index_range(self):
+        plan = self.filtered(city='CHEN', match='prefix').explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX \w+_city_key_\w+ \(city_key>\? AND city_key<\?\)')
@@ -0,0 +1,173 @@
+import shutil
+import tempfile
+from unittest import mock
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from restaurants.models import MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto
+from restaurants import renditions
+from restaurants.renditions import get_renditions
+from restaurants.storage import is_content_addressed
+
+User = get_user_model()
+
+def make_image(width, height, name='photo.jpg'):
+    buffer = BytesIO()
+    Image.effect_noise((width, height), 64).convert('RGB').save(buffer, 'JPEG', quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+def render(photo):
+    return Template('{% load renditions %}{% responsive_image photo sizes="96px" alt="Dish" class="thumb" %}').render(
+        Context({'photo': photo})
+    )
+
+class RenditionTestMixin:
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.restaurant = Restaurant.objects.create(name="Dhaba", city="Pune", cost_for_two=300)
+
+    def variants(self, photo):
+        photo.refresh_from_db()
+        return [(variant['width'], variant['format']) for variant in photo.renditions['variants']]
+
+class RenditionTests(RenditionTestMixin, TestCase):
+    def test_upload_makes_renditions_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(1000, 600))
+        self.assertEqual(
+            self.variants(photo),
+            [(width, format) for width in (240, 480, 960, 1000) for format in ('webp', 'jpeg')],
+        )
+        original = photo.image.size
+        for variant in photo.renditions['variants']:
+            self.assertTrue(default_storage.exists(variant['name']))
+            self.assertTrue(is_content_addressed(variant['name']))
+            self.assertLess(variant['size'], original)
+        with Image.open(default_storage.open(photo.renditions['variants'][0]['name'])) as image:
+            self.assertEqual(image.size, (240, 144))
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(300, 200))
+        self.assertEqual([width for width, _ in self.variants(photo)], [240, 240, 300, 300])
+
+    def test_render_offers_the_renditions(self):
+        item = MenuItem.objects.create(restaurant=self.restaurant, name="Dish", description="Tasty")
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = MenuItemPhoto.objects.create(menu_item=item, image=make_image(500, 500))
+        photo.refresh_from_db()
+        html = render(photo)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('480w', html)
+        self.assertIn('sizes="96px"', html)
+        self.assertIn('class="thumb"', html)
+
+    def test_missing_image_falls_back_to_the_original(self):
+        photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image="restaurant_photos/missing.jpg")
+        with self.assertLogs('restaurants.renditions', 'WARNING'):
+            get_renditions(photo)
+        with self.assertNumQueries(0):
+            get_renditions(photo)
+        html = render(photo)
+        self.assertEqual(html, '<img src="/media/restaurant_photos/missing.jpg" alt="Dish" class="thumb">')
+
+    def test_replacing_and_deleting_the_image_removes_old_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(600, 400, 'first.jpg'))
+        photo.refresh_from_db()
+        first = [variant['name'] for variant in photo.renditions['variants']]
+        photo.image = make_image(600, 400, 'second.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        self.assertFalse(any(default_storage.exists(name) for name in first))
+        photo.refresh_from_db()
+        second = [variant['name'] for variant in photo.renditions['variants']]
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in second))
+
+    @override_settings(RESTAURANTS_RENDITIONS_EAGER=False)
+    def test_command_backfills_renditions(self):
+        photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(300, 300))
+        call_command('generate_renditions', stdout=StringIO())
+        self.assertEqual(len(self.variants(photo)), 4)
+
+@override_settings(RESTAURANTS_RENDITIONS_EAGER=False)
+class RenditionScheduleTests(RenditionTestMixin, TransactionTestCase):
+    def wait_for_pool(self):
+        renditions.get_executor().submit(lambda: None).result()
+
+    def test_render_shows_the_original_and_schedules_renditions(self):
+        photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(500, 500))
+        with mock.patch('restaurants.renditions.generate_renditions', wraps=renditions.generate_renditions) as generate:
+            with mock.patch('restaurants.renditions.render_variants', wraps=renditions.render_variants) as encode:
+                first, second = render(photo), render(photo)
+                self.assertEqual(encode.call_count, 0)
+                self.wait_for_pool()
+        self.assertEqual(first, f'<img src="{photo.image.url}" alt="Dish" class="thumb">')
+        self.assertEqual(first, second)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(len(self.variants(photo)), 6)
+        self.assertIn('<source type="image/webp"', render(photo))
+
+    @override_settings(RESTAURANTS_RENDITION_WORKERS=0)
+    def test_no_workers_leaves_renditions_to_the_command(self):
+        photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(300, 300))
+        with mock.patch('restaurants.renditions.get_executor') as get_executor:
+            render(photo)
+        self.assertEqual(get_executor.call_count, 0)
+        photo.refresh_from_db()
+        self.assertEqual(photo.renditions, {})
+
+class RenditionPageTests(RenditionTestMixin, TestCase):
+    def test_pages_offer_renditions(self):
+        user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(800, 600))
+        for url in (
+            reverse('restaurant-list'),
+            reverse('restaurant-detail', args=[self.restaurant.pk]),
+            reverse('restaurant_images', args=[self.restaurant.pk]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'srcset=')
+                self.assertNotContains(response, 'src="/media/restaurant_photos/')
+
+    @override_settings(RESTAURANTS_RENDITIONS_EAGER=False, RESTAURANTS_RENDITION_WORKERS=0)
+    def test_cached_card_and_validators_follow_new_renditions(self):
+        user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.force_login(user)
+        photo = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=make_image(800, 600))
+        list_url = reverse('restaurant-list')
+        detail_url = reverse('restaurant-detail', args=[self.restaurant.pk])
+        self.assertNotContains(self.client.get(list_url), 'srcset=')
+        etag = self.client.get(detail_url)['ETag']
+        get_renditions(photo)
+        self.assertContains(self.client.get(list_url), 'srcset=')
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'srcset=')
+
+    @override_settings(RESTAURANTS_RENDITIONS_EAGER=False, RESTAURANTS_RENDITION_WORKERS=0)
+    def test_menu_photo_renditions_move_the_restaurant_on(self):
+        item = MenuItem.objects.create(restaurant=self.restaurant, name="Dish", description="Tasty")
+        photo = MenuItemPhoto.objects.create(menu_item=item, image=make_image(500, 500))
+        self.restaurant.refresh_from_db()
+        version = self.restaurant.cache_version
+        get_renditions(photo)
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.cache_version, version + 1)
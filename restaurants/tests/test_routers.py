@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from restaurants.facets import get_facet_index
+from restaurants.filter_engine import get_filter_engine
+from restaurants.loaders import run_loaders
+from restaurants.membership import get_membership
+from restaurants.models import Bookmark, Cuisine, Restaurant
+from restaurants.routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaPinningMiddleware, RequestState, _state
+from restaurants.suggest import get_suggestion_index
+
+User = get_user_model()
+
+def reading_view(request):
+    return HttpResponse(router.db_for_read(Restaurant))
+
+def writing_view(request):
+    router.db_for_write(Restaurant)
+    return HttpResponse(router.db_for_read(Restaurant))
+
+def loading_view(request):
+    values, _ = run_loaders({'db': lambda: router.db_for_read(Restaurant)})
+    return HttpResponse(values['db'])
+
+@override_settings(RESTAURANTS_READ_REPLICAS=['replica1', 'replica2'], RESTAURANTS_REPLICA_PIN_SECONDS=30)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_go_to_a_replica_and_writes_to_the_primary(self):
+        self.assertIn(self.router.db_for_read(Restaurant), {'replica1', 'replica2'})
+        self.assertEqual(self.router.db_for_write(Restaurant), 'default')
+
+    def test_pinned_requests_read_the_primary(self):
+        token = _state.set(RequestState(pinned=True))
+        try:
+            self.assertEqual(self.router.db_for_read(Restaurant), 'default')
+        finally:
+            _state.reset(token)
+
+    def test_a_write_pins_the_rest_of_the_request(self):
+        state = RequestState(pinned=False)
+        token = _state.set(state)
+        try:
+            self.router.db_for_write(Restaurant)
+            self.assertEqual(self.router.db_for_read(Restaurant), 'default')
+        finally:
+            _state.reset(token)
+        self.assertTrue(state.wrote)
+
+    def test_sessions_are_read_from_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+    @override_settings(RESTAURANTS_READ_REPLICAS=[])
+    def test_without_replicas_everything_uses_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Restaurant), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica1', 'restaurants'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'restaurants'))
+
+@override_settings(RESTAURANTS_READ_REPLICAS=['replica1'], RESTAURANTS_REPLICA_PIN_SECONDS=30)
+class ReplicaPinningMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, view, request):
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_reads_use_the_replica(self):
+        response = self.respond(reading_view, self.factory.get('/'))
+        self.assertEqual(response.content, b'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_unsafe_methods_read_the_primary(self):
+        self.assertEqual(self.respond(reading_view, self.factory.post('/')).content, b'default')
+
+    def test_writes_set_the_pin_cookie(self):
+        response = self.respond(writing_view, self.factory.post('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 30)
+
+    def test_pin_cookie_reads_the_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.respond(reading_view, request).content, b'default')
+
+    def test_loaders_follow_the_request_routing(self):
+        self.assertEqual(self.respond(loading_view, self.factory.get('/')).content, b'replica1')
+        self.assertEqual(self.respond(loading_view, self.factory.post('/')).content, b'default')
+
+class LaggingReplicaTests(TransactionTestCase):
+    """
+    A replica alias with the schema but none of the rows written to the
+    primary, as a replica that has not caught up would look.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings['lagging'] = {
+            **connections.settings['default'], 'NAME': os.path.join(cls.replica_dir, 'lagging.sqlite3'),
+        }
+        call_command('migrate', database='lagging', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['lagging'].close()
+        del connections['lagging']
+        del connections.settings['lagging']
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        replicas = override_settings(RESTAURANTS_READ_REPLICAS=['lagging'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        self.restaurant = Restaurant.objects.create(
+            name="Kumbakonam Coffee", city="Chennai", cost_for_two=100, food_type='veg', spotlight=True,
+        )
+        self.restaurant.cuisines.add(Cuisine.objects.create(name="Chettinad"))
+
+    def test_unpinned_reads_lag(self):
+        self.assertFalse(Restaurant.objects.exists())
+
+    def test_indexes_are_rebuilt_from_the_primary(self):
+        self.assertEqual(get_suggestion_index().suggest("kumb")[0].label, "Kumbakonam Coffee")
+        self.assertIn(self.restaurant.pk, get_facet_index().restaurant_ids)
+        engine = get_filter_engine()
+        self.assertEqual(engine.ids(engine.select(cuisines="Chettinad")), [self.restaurant.pk])
+
+    def test_anonymous_page_cache_is_built_from_the_primary(self):
+        response = Client().get(reverse('home'))
+        self.assertContains(response, "Kumbakonam Coffee")
+
+    def test_membership_is_loaded_from_the_primary(self):
+        user = User.objects.create(username='user')
+        Bookmark.objects.create(user=user, restaurant=self.restaurant)
+        self.assertEqual(get_membership(user, 'bookmarks'), {self.restaurant.pk})
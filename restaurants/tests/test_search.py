@@ -0,0 +1,143 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from io import StringIO
+from restaurants.models import Restaurant, Cuisine, MenuItem
+from restaurants.pagination import CursorPaginator
+from restaurants.search import get_search_backend, SimpleSearchBackend, SQLiteSearchBackend
+
+User = get_user_model()
+
+class SearchBackendTests(TestCase):
+    def setUp(self):
+        self.backend = get_search_backend()
+        self.italian = Cuisine.objects.create(name="Italian")
+        self.pizza_place = Restaurant.objects.create(name="Pizza Palace", address="1 Main Road", city="Chennai", cost_for_two=400)
+        self.pizza_place.cuisines.add(self.italian)
+        self.dosa_corner = Restaurant.objects.create(name="Dosa Corner", address="2 Beach Road", city="Madurai", cost_for_two=200)
+        MenuItem.objects.create(restaurant=self.dosa_corner, name="Cheese Pizza Dosa", description="Fusion favourite")
+
+    def search(self, query):
+        return self.backend.search(query, 100)
+
+    def test_sqlite_uses_fts5_backend(self):
+        self.assertIsInstance(self.backend, SQLiteSearchBackend)
+
+    def test_matches_name_city_cuisine_and_menu(self):
+        self.assertEqual(self.search("palace"), [self.pizza_place.pk])
+        self.assertEqual(self.search("madurai"), [self.dosa_corner.pk])
+        self.assertEqual(self.search("italian"), [self.pizza_place.pk])
+        self.assertEqual(self.search("fusion"), [self.dosa_corner.pk])
+
+    def test_prefix_matching_requires_every_word(self):
+        self.assertEqual(self.search("piz pal"), [self.pizza_place.pk])
+        self.assertEqual(self.search("piz mad"), [self.dosa_corner.pk])
+        self.assertEqual(self.search("piz xyz"), [])
+
+    def test_name_matches_rank_above_menu_matches(self):
+        self.assertEqual(self.search("pizza"), [self.pizza_place.pk, self.dosa_corner.pk])
+
+    def test_filter_queryset_matches_and_ranks_once(self):
+        for index in range(300):
+            Restaurant.objects.create(name=f"Pizza Stop {index}", city="Chennai", cost_for_two=300)
+        restaurants = self.backend.filter_queryset(Restaurant.objects.all(), "pizza")
+        with CaptureQueriesContext(connection) as queries:
+            found = list(restaurants)
+        self.assertEqual(len(queries), 1)
+        # One pass over the index, not one more match per matching row.
+        self.assertEqual(queries[0]['sql'].count('MATCH'), 1)
+        self.assertNotIn('CORRELATED', restaurants.explain())
+        self.assertEqual(len(found), 302)
+        self.assertEqual(found[-1], self.dosa_corner)
+
+    def test_filter_queryset_pages_with_a_cursor(self):
+        for index in range(30):
+            Restaurant.objects.create(name=f"Pizza Stop {index}", city="Chennai", cost_for_two=300)
+        restaurants = self.backend.filter_queryset(Restaurant.objects.all(), "pizza")
+        paginator = CursorPaginator(restaurants, 7)
+        pages = [paginator.page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([r.pk for page in pages for r in page], [r.pk for r in restaurants])
+
+    def test_index_follows_restaurant_changes(self):
+        self.pizza_place.name = "Pasta House"
+        self.pizza_place.save()
+        self.assertEqual(self.search("palace"), [])
+        self.assertEqual(self.search("pasta"), [self.pizza_place.pk])
+        self.pizza_place.delete()
+        self.assertEqual(self.search("pasta"), [])
+
+    def test_index_follows_cuisine_changes(self):
+        self.italian.name = "Neapolitan"
+        self.italian.save()
+        self.assertEqual(self.search("neapolitan"), [self.pizza_place.pk])
+        self.pizza_place.cuisines.remove(self.italian)
+        self.assertEqual(self.search("neapolitan"), [])
+        self.italian.restaurants.add(self.dosa_corner)
+        self.assertEqual(self.search("neapolitan"), [self.dosa_corner.pk])
+        self.italian.delete()
+        self.assertEqual(self.search("neapolitan"), [])
+
+    def test_index_follows_menu_changes(self):
+        MenuItem.objects.filter(restaurant=self.dosa_corner).get().delete()
+        self.assertEqual(self.search("fusion"), [])
+        MenuItem.objects.create(restaurant=self.pizza_place, name="Tiramisu", description="Dessert")
+        self.assertEqual(self.search("tiramisu"), [self.pizza_place.pk])
+
+    def test_rebuild_command_restores_index(self):
+        self.backend.drop_index()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search("palace"), [self.pizza_place.pk])
+
+class SimpleSearchBackendTests(TestCase):
+    def setUp(self):
+        self.backend = SimpleSearchBackend('default')
+        self.pizza_place = Restaurant.objects.create(name="Pizza Palace", city="Chennai", cost_for_two=400)
+        self.dosa_corner = Restaurant.objects.create(name="Dosa Corner", city="Madurai", cost_for_two=200)
+        MenuItem.objects.create(restaurant=self.dosa_corner, name="Cheese Pizza Dosa", description="Fusion favourite")
+
+    def test_matches_names_and_menus_on_its_database(self):
+        with mock.patch.object(MenuItem.objects, 'using', wraps=MenuItem.objects.using) as using:
+            self.assertEqual(self.backend.search("pizza", 100), [self.pizza_place.pk, self.dosa_corner.pk])
+        using.assert_called_with('default')
+        self.assertEqual(self.backend.search("fusion dosa", 100), [self.dosa_corner.pk])
+        self.assertEqual(self.backend.search("sushi", 100), [])
+
+class RestaurantListSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        self.indian = Cuisine.objects.create(name="Indian")
+        self.biryani = Restaurant.objects.create(name="Biryani Blues", address="Anna Nagar", city="Chennai", cost_for_two=600)
+        self.biryani.cuisines.add(self.indian)
+        self.burger = Restaurant.objects.create(name="Burger Barn", address="T Nagar", city="Chennai", cost_for_two=300)
+
+    def test_q_parameter_filters_restaurants(self):
+        response = self.client.get(reverse('restaurant-list'), {'q': 'biry'})
+        self.assertEqual(list(response.context['restaurants']), [self.biryani])
+
+    def test_q_facets_do_not_repeat_the_match_per_facet(self):
+        self.client.get(reverse('restaurant-list'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('restaurant-list'), {'q': 'nagar'})
+        counts = {value['label']: value['count'] for group in response.context['facets'] for value in group['values']}
+        self.assertEqual(counts['Chennai'], '2')
+        # The count, the page and the ids counted against the facet bitmaps.
+        self.assertEqual(sum('MATCH' in query['sql'] for query in queries), 3)
+
+    def test_q_parameter_matches_address(self):
+        response = self.client.get(reverse('restaurant-list'), {'q': 'nagar'})
+        self.assertEqual(len(response.context['restaurants']), 2)
+
+    def test_q_parameter_combines_with_sort(self):
+        response = self.client.get(reverse('restaurant-list'), {'q': 'chennai', 'sort': 'cost_asc'})
+        self.assertEqual(list(response.context['restaurants']), [self.burger, self.biryani])
+
+    def test_q_without_matches_renders_empty_state(self):
+        response = self.client.get(reverse('restaurant-list'), {'q': 'sushi'})
+        self.assertContains(response, "No restaurants found.")
@@ -0,0 +1,59 @@
+import random
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from restaurants import seeding
+from restaurants.models import Restaurant, RestaurantPhoto, Review
+
+class SeedingTests(TestCase):
+    def reviews_by_rank(self, result):
+        user_rank = {pk: rank for rank, pk in enumerate(result.user_ids)}
+        restaurant_rank = {pk: rank for rank, pk in enumerate(result.restaurant_ids)}
+        return sorted(
+            (user_rank[user_id], restaurant_rank[restaurant_id], rating)
+            for user_id, restaurant_id, rating in Review.objects.filter(user_id__in=result.user_ids).values_list(
+                'user_id', 'restaurant_id', 'rating'
+            )
+        )
+
+    def test_seeds_requested_counts_and_aggregates(self):
+        result = seeding.seed(50, 400, 40)
+        self.assertEqual(result.counts['restaurants'], 50)
+        self.assertEqual(result.counts['reviews'], 400)
+        self.assertEqual(Restaurant.objects.aggregate(total=Sum('rating_count'))['total'], 400)
+        self.assertEqual(Restaurant.objects.filter(spotlight=True).count(), 12)
+
+    def test_seeded_photos_queue_no_renditions(self):
+        result = seeding.seed(5, 10, 5, photos=2)
+        self.assertEqual(RestaurantPhoto.objects.filter(image='').count(), 10)
+        self.client.force_login(User.objects.get(pk=result.user_ids[0]))
+        with mock.patch('restaurants.renditions.schedule_renditions') as schedule:
+            self.client.get(reverse('restaurant-detail', args=[result.restaurant_ids[0]]))
+            self.client.get(reverse('restaurant-list'))
+        self.assertEqual(schedule.call_count, 0)
+
+    def test_popularity_is_skewed_towards_top_ranks(self):
+        result = seeding.seed(100, 1000, 100)
+        counts = dict(Restaurant.objects.values_list('pk', 'rating_count'))
+        ranked = [counts[pk] for pk in result.restaurant_ids]
+        self.assertGreater(sum(ranked[:10]), sum(ranked[50:]))
+
+    def test_same_seed_gives_same_data(self):
+        first = seeding.seed(30, 200, 20, seed=7, username_prefix='first_')
+        second = seeding.seed(30, 200, 20, seed=7, username_prefix='second_')
+        self.assertEqual(self.reviews_by_rank(first), self.reviews_by_rank(second))
+
+    def test_zipf_sampler_favours_low_indexes(self):
+        sampler = seeding.ZipfSampler(1000, 1.2, random.Random(0))
+        draws = sampler.sample(10_000)
+        self.assertGreater(draws.count(0), draws.count(999) * 50)
+
+    def test_command_refuses_to_reuse_usernames(self):
+        call_command('seed_data', restaurants=5, reviews=10, users=5, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_data', restaurants=5, reviews=10, users=5, stdout=StringIO())
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from restaurants.models import MenuItem, MenuItemPhoto, Restaurant, RestaurantPhoto
+from restaurants.storage import is_content_addressed, serve_media
+
+def image_bytes(seed=0):
+    buffer = BytesIO()
+    Image.new('RGB', (320, 200), (seed * 90, 80, 160)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+class ContentAddressedStorageTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.restaurant = Restaurant.objects.create(name="Dhaba", city="Pune", cost_for_two=300)
+        self.item = MenuItem.objects.create(restaurant=self.restaurant, name="Dish", description="Tasty")
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, file), self.media_root)
+            for root, _, files in os.walk(self.media_root) for file in files
+        )
+
+class ContentAddressedStorageTests(ContentAddressedStorageTestCase):
+    def test_identical_uploads_share_one_file(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=ContentFile(image_bytes(), 'a.JPG'))
+            second = MenuItemPhoto.objects.create(menu_item=self.item, image=ContentFile(image_bytes(), 'b.jpg'))
+            other = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=ContentFile(image_bytes(1), 'a.jpg'))
+        self.assertTrue(is_content_addressed(first.image.name))
+        self.assertTrue(first.image.name.endswith('.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        photos = [first, second, other]
+        for photo in photos:
+            photo.refresh_from_db()
+        self.assertEqual(first.renditions['variants'], second.renditions['variants'])
+        self.assertEqual(set(self.stored_files()), {
+            name for photo in photos
+            for name in [photo.image.name, *(variant['name'] for variant in photo.renditions['variants'])]
+        })
+
+    def test_shared_renditions_outlive_one_of_their_photos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = RestaurantPhoto.objects.create(restaurant=self.restaurant, image=ContentFile(image_bytes(), 'a.jpg'))
+            second = MenuItemPhoto.objects.create(menu_item=self.item, image=ContentFile(image_bytes(), 'b.jpg'))
+        second.refresh_from_db()
+        names = [variant['name'] for variant in second.renditions['variants']]
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_content_addressed_media_is_served_immutable(self):
+        name = default_storage.save('restaurant_photos/a.jpg', ContentFile(image_bytes()))
+        FileSystemStorage(location=self.media_root).save('legacy.jpg', ContentFile(image_bytes()))
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, name, document_root=self.media_root)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response = serve_media(request, 'legacy.jpg', document_root=self.media_root)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+class DedupeMediaCommandTests(ContentAddressedStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        legacy = FileSystemStorage(location=self.media_root)
+        self.photos = [
+            RestaurantPhoto.objects.create(
+                restaurant=self.restaurant, image=legacy.save(f'restaurant_photos/{index}.jpg', ContentFile(image_bytes())),
+            )
+            for index in range(2)
+        ]
+        self.orphan = legacy.save('menu_items/orphan.jpg', ContentFile(image_bytes(2)))
+
+    def test_moves_files_to_content_names(self):
+        call_command('dedupe_media', stdout=StringIO())
+        names = set()
+        for photo in self.photos:
+            photo.refresh_from_db()
+            names.add(photo.image.name)
+            self.assertEqual(photo.renditions['source'], photo.image.name)
+            self.assertTrue(all(is_content_addressed(variant['name']) for variant in photo.renditions['variants']))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(is_content_addressed(names.pop()))
+        self.assertFalse(any(name.startswith('restaurant_photos/') for name in self.stored_files()))
+        self.assertIn(self.orphan, self.stored_files())
+
+    def test_gc_deletes_unreferenced_files(self):
+        call_command('dedupe_media', '--gc', '--grace', '0', stdout=StringIO())
+        self.photos[0].refresh_from_db()
+        kept = {self.photos[0].image.name, *(variant['name'] for variant in self.photos[0].renditions['variants'])}
+        self.assertEqual(set(self.stored_files()), kept)
+
+    def test_gc_spares_recent_files_and_dry_runs(self):
+        call_command('dedupe_media', '--gc', stdout=StringIO())
+        self.assertIn(self.orphan, self.stored_files())
+        before = self.stored_files()
+        call_command('dedupe_media', '--gc', '--grace', '0', '--dry-run', stdout=StringIO())
+        self.assertEqual(self.stored_files(), before)
@@ -0,0 +1,74 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from io import StringIO
+from restaurants.models import Restaurant, Cuisine
+from restaurants.suggest import Suggestion, SuggestionIndex, get_suggestion_index
+
+User = get_user_model()
+
+class SuggestionIndexTests(TestCase):
+    def setUp(self):
+        self.palace = Suggestion("Pizza Palace", 'restaurant', 1)
+        self.pasta = Suggestion("Pasta Point", 'restaurant', 2)
+        self.city = Suggestion("Pallavaram", 'city')
+        self.index = SuggestionIndex([self.palace, self.pasta, self.city])
+
+    def test_matches_any_word_start_case_insensitively(self):
+        self.assertEqual(self.index.suggest("PAL"), [self.palace, self.city])
+        self.assertEqual(self.index.suggest("pizza p"), [self.palace])
+        self.assertEqual(self.index.suggest("point"), [self.pasta])
+
+    def test_limit_and_misses(self):
+        self.assertEqual(len(self.index.suggest("p", limit=2)), 2)
+        self.assertEqual(self.index.suggest("zz"), [])
+        self.assertEqual(self.index.suggest("   "), [])
+
+    def test_each_suggestion_is_returned_once(self):
+        index = SuggestionIndex([Suggestion("Pasta Pasta", 'restaurant', 3)])
+        self.assertEqual(len(index.suggest("pasta")), 1)
+
+class RestaurantSuggestViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.cuisine = Cuisine.objects.create(name="Chettinad")
+        self.restaurant = Restaurant.objects.create(name="Chennai Spice", address="Adyar", city="Chennai", cost_for_two=400)
+        self.url = reverse('restaurant-suggest')
+
+    def test_requires_login(self):
+        response = self.client.get(self.url, {'q': 'che'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_returns_restaurants_cities_and_cuisines(self):
+        self.client.login(username='user', password='pass12345678')
+        response = self.client.get(self.url, {'q': 'che'})
+        self.assertEqual(response.status_code, 200)
+        suggestions = response.json()['suggestions']
+        self.assertEqual([s['kind'] for s in suggestions], ['city', 'restaurant', 'cuisine'])
+        self.assertEqual(suggestions[1]['url'], reverse('restaurant-detail', kwargs={'pk': self.restaurant.pk}))
+        self.assertEqual(suggestions[0]['url'], reverse('restaurant-list') + '?city=Chennai&match=exact')
+
+    def test_index_is_rebuilt_after_changes(self):
+        get_suggestion_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.create(name="Kumbakonam Degree Coffee", address="Mylapore", city="Chennai", cost_for_two=100)
+            # Not before the commit, or a rebuild could cache the old rows.
+            self.assertEqual(get_suggestion_index().suggest("kumb"), [])
+        self.assertEqual(get_suggestion_index().suggest("kumb")[0].label, "Kumbakonam Degree Coffee")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cuisine.delete()
+        self.assertEqual(get_suggestion_index().suggest("chettinad"), [])
+
+    def test_invalid_limit_falls_back_to_default(self):
+        self.client.login(username='user', password='pass12345678')
+        response = self.client.get(self.url, {'q': 'che', 'limit': 'abc'})
+        self.assertEqual(response.status_code, 200)
+
+class SuggestBenchmarkTests(TestCase):
+    def test_benchmark_runs_and_meets_target(self):
+        out = StringIO()
+        call_command('benchmark', 'suggest', '--size', '2000', '--queries', '500', stdout=out)
+        self.assertIn('p99', out.getvalue())
@@ -4,12 +4,16 @@ from restaurants.models import Restaurant, Cuisine, MenuItem, Bookmark, Visit, R
 from django.core.paginator import Page
 from django.contrib.auth import get_user_model
 from django.core import mail
+from django.core.cache import cache
+from django.db.models import Avg, F
+from restaurants.filters import RestaurantFilter
 
 
 User = get_user_model()
 
 class RestaurantListViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='user', password='pass12345678')
         self.client.login(username='user', password='pass12345678')
         cuisine = Cuisine.objects.create(name="Indian")
@@ -50,6 +54,7 @@ class RestaurantListViewTests(TestCase):
 
 class RestaurantListFilterAndSortTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='user', password='pass12345678')
         self.client.login(username='user', password='pass12345678')
         self.indian = Cuisine.objects.create(name='Indian')
@@ -118,6 +123,43 @@ class RestaurantListFilterAndSortTests(TestCase):
         ratings = [getattr(r, "average_rating", 0) or 0 for r in response.context["restaurants"]]
         self.assertEqual(ratings, sorted(ratings, reverse=True))
 
+class NormalizedKeyFilterTests(TestCase):
+    def setUp(self):
+        self.south = Cuisine.objects.create(name="  South  Indian ")
+        self.north = Cuisine.objects.create(name="North Indian")
+        self.both = Restaurant.objects.create(name="Both", city=" Chennai ", cost_for_two=200)
+        self.both.cuisines.add(self.south, self.north)
+        self.other = Restaurant.objects.create(name="Other", city="Chengalpattu", cost_for_two=200)
+        self.other.cuisines.add(self.north)
+
+    def filtered(self, **data):
+        return list(RestaurantFilter(data, queryset=Restaurant.objects.order_by('id')).qs)
+
+    def test_keys_are_kept_in_sync_on_save(self):
+        self.assertEqual(self.both.city_key, 'chennai')
+        self.assertEqual(self.south.name_key, 'south indian')
+        self.both.city = 'MADRAS'
+        self.both.save(update_fields=['city'])
+        self.both.refresh_from_db()
+        self.assertEqual(self.both.city_key, 'madras')
+
+    def test_exact_match_ignores_case_and_spacing(self):
+        self.assertEqual(self.filtered(city='CHENNAI', match='exact'), [self.both])
+        self.assertEqual(self.filtered(city='chen', match='exact'), [])
+        self.assertEqual(self.filtered(cuisines='south indian', match='exact'), [self.both])
+
+    def test_prefix_match(self):
+        self.assertEqual(self.filtered(city='Chen', match='prefix'), [self.both, self.other])
+        self.assertEqual(self.filtered(city='chenn', match='prefix'), [self.both])
+        self.assertEqual(self.filtered(cuisines='south', match='prefix'), [self.both])
+
+    def test_contains_is_the_default(self):
+        self.assertEqual(self.filtered(city='pattu'), [self.other])
+        self.assertEqual(self.filtered(cuisines='indian'), [self.both, self.other])
+
+    def test_several_matching_cuisines_do_not_duplicate_restaurants(self):
+        self.assertEqual(RestaurantFilter({'cuisines': 'indian'}, queryset=Restaurant.objects.all()).qs.count(), 2)
+
 class RestaurantDetailViewTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='user', password='pass12345678')
@@ -166,6 +208,13 @@ class RestaurantDetailViewTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
 
+    def test_detail_view_shows_rating_histogram(self):
+        Review.objects.create(user=self.user, restaurant=self.restaurant, rating=4)
+        url = reverse('restaurant-detail', args=[self.restaurant.id])
+        response = self.client.get(url)
+        self.assertEqual(response.context['rating_stats'].four_star, 1)
+        self.assertContains(response, 'style="width: 100%"')
+
 class RestaurantImageListViewTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='user', password='pass12345678')
@@ -277,6 +326,11 @@ class ReviewListViewTests(TestCase):
         self.assertEqual(response.context['restaurant'], self.restaurant)
         self.assertIn('reviews', response.context)
 
+    def test_review_page_context_contains_rating_stats(self):
+        self.client.login(username='user', password='pass12345678')
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['rating_stats'].four_star, 15)
+
     def test_pagination_is_ten(self):
         self.client.login(username='user', password='pass12345678')
         response = self.client.get(self.url)
@@ -364,7 +418,9 @@ class LogoutViewTests(TestCase):
     def test_logout_functionality(self):
         self.client.get(self.logout_url, follow=True)
         response = self.client.get(self.home_url)
-        self.assertFalse(response.context["user"].is_authenticated)
+        # Anonymous home pages come from the page cache, without a context.
+        self.assertNotIn("_auth_user_id", self.client.session)
+        self.assertContains(response, reverse("login"))
 
 class PasswordChangeViewTests(TestCase):
     def setUp(self):
@@ -507,6 +563,7 @@ class ProfileEditViewTests(TestCase):
 
 class BookmarkViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             username='user',
             password='pass12345678',
@@ -586,6 +643,7 @@ class BookmarkToggleViewTests(TestCase):
 
 class VisitViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='user', password='pass12345678')
         self.restaurant = Restaurant.objects.create(
             name="A2B",
@@ -716,3 +774,40 @@ class ReviewDeleteView(ReviewTestsBase):
         response = self.client.post(url, follow=True)
         self.assertEqual(response.status_code, 200)
         self.assertFalse(Review.objects.filter(pk=review.pk).exists())
+
+class RatingSortMatchesAggregateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', password='pass12345678')
+        self.client.login(username='user', password='pass12345678')
+        reviewers = [User.objects.create_user(username=f'reviewer{i}', password='pass123') for i in range(3)]
+        ratings = [[5, 4], [], [3], [4, 5], [1, 2, 3], [], [2]]
+        for i, restaurant_ratings in enumerate(ratings):
+            restaurant = Restaurant.objects.create(name=f"Restaurant{i}", city="chennai", cost_for_two=100 * (i % 3))
+            for reviewer, rating in zip(reviewers, restaurant_ratings):
+                Review.objects.create(user=reviewer, restaurant=restaurant, rating=rating)
+
+    def annotated_ids(self, *ordering):
+        queryset = Restaurant.objects.annotate(avg_rating=Avg('reviewed_by_user__rating')).order_by(*ordering)
+        return list(queryset.values_list('id', flat=True))
+
+    def filtered_ids(self, sort):
+        queryset = RestaurantFilter({'sort': sort}, queryset=Restaurant.objects.all()).qs
+        return list(queryset.values_list('id', flat=True))
+
+    def test_rating_asc_matches_annotated_average(self):
+        expected = self.annotated_ids(F('avg_rating').asc(nulls_first=True), 'id')
+        self.assertEqual(self.filtered_ids('rating_asc'), expected)
+
+    def test_rating_desc_matches_annotated_average(self):
+        expected = self.annotated_ids(F('avg_rating').desc(nulls_last=True), '-id')
+        self.assertEqual(self.filtered_ids('rating_desc'), expected)
+
+    def test_rating_sort_does_not_join_reviews(self):
+        queryset = RestaurantFilter({'sort': 'rating_desc'}, queryset=Restaurant.objects.all()).qs
+        self.assertNotIn('restaurants_review', str(queryset.query))
+
+    def test_rating_sort_paginates_without_duplicates(self):
+        response = self.client.get(reverse('restaurant-list'), {'sort': 'rating_desc'})
+        first_page = [r.id for r in response.context['restaurants']]
+        self.assertEqual(first_page, self.filtered_ids('rating_desc')[:9])
@@ -1,23 +1,42 @@
+from django.conf import settings
 from django.urls import path
 from .views import HomePageView, RestaurantListView, RestaurantDetailView, RegisterView, UserProfileView, \
     UserProfileEditView, UserBookmarksListView, UserBookmarkToggleView, UserVisitedRestaurantsListView, \
     UserVisitedRestaurantsToggleView, ReviewCreateView, ReviewDeleteView, ReviewUpdateView, RestaurantImageView, \
-    ReviewListView
+    ReviewListView, RestaurantSuggestView
+from . import api, async_views as views_async
 
-urlpatterns = [
-    path('', HomePageView.as_view(), name='home'),
-    path('register/', RegisterView.as_view(), name="register"),
-    path('restaurants/', RestaurantListView.as_view(), name='restaurant-list'),
-    path('restaurants/<int:pk>/', RestaurantDetailView.as_view(), name='restaurant-detail'),
-    path('restaurants/<int:pk>/review/', ReviewCreateView.as_view(), name='add_review'),
-    path('restaurants/<int:pk>/reviews/', ReviewListView.as_view(), name='restaurant_reviews'),
-    path('restaurants/<int:pk>/images/', RestaurantImageView.as_view(), name='restaurant_images'),
-    path('review/<int:pk>/edit', ReviewUpdateView.as_view(), name='edit_review'),
-    path('review/<int:pk>/delete', ReviewDeleteView.as_view(), name='delete_review' ),
-    path('profile/', UserProfileView.as_view(), name='profile'),
-    path('profile/edit/', UserProfileEditView.as_view(), name='profile_edit'),
-    path('bookmarks/', UserBookmarksListView.as_view(), name='bookmarks_list'),
-    path('bookmarks/toggle/<int:restaurant_id>/', UserBookmarkToggleView.as_view(), name='bookmark_toggle'),
-    path('visits/', UserVisitedRestaurantsListView.as_view(), name='visited_restaurants_list'),
-    path('visits/toggle/<int:restaurant_id>/', UserVisitedRestaurantsToggleView.as_view(), name='visited_toggle'),
-]
+def build_urlpatterns(async_views=False):
+    """
+    With `async_views`, the home, list, detail and review list pages are
+    served by their async variants from restaurants.async_views.
+    """
+    home, restaurant_list, restaurant_detail, review_list = HomePageView, RestaurantListView, RestaurantDetailView, ReviewListView
+    if async_views:
+        home, restaurant_list = views_async.AsyncHomePageView, views_async.AsyncRestaurantListView
+        restaurant_detail, review_list = views_async.AsyncRestaurantDetailView, views_async.AsyncReviewListView
+    return [
+        path('', home.as_view(), name='home'),
+        path('register/', RegisterView.as_view(), name="register"),
+        path('restaurants/', restaurant_list.as_view(), name='restaurant-list'),
+        path('restaurants/suggest/', RestaurantSuggestView.as_view(), name='restaurant-suggest'),
+        path('restaurants/<int:pk>/', restaurant_detail.as_view(), name='restaurant-detail'),
+        path('restaurants/<int:pk>/review/', ReviewCreateView.as_view(), name='add_review'),
+        path('restaurants/<int:pk>/reviews/', review_list.as_view(), name='restaurant_reviews'),
+        path('restaurants/<int:pk>/images/', RestaurantImageView.as_view(), name='restaurant_images'),
+        path('review/<int:pk>/edit', ReviewUpdateView.as_view(), name='edit_review'),
+        path('review/<int:pk>/delete', ReviewDeleteView.as_view(), name='delete_review' ),
+        path('profile/', UserProfileView.as_view(), name='profile'),
+        path('profile/edit/', UserProfileEditView.as_view(), name='profile_edit'),
+        path('bookmarks/', UserBookmarksListView.as_view(), name='bookmarks_list'),
+        path('bookmarks/toggle/<int:restaurant_id>/', UserBookmarkToggleView.as_view(), name='bookmark_toggle'),
+        path('visits/', UserVisitedRestaurantsListView.as_view(), name='visited_restaurants_list'),
+        path('visits/toggle/<int:restaurant_id>/', UserVisitedRestaurantsToggleView.as_view(), name='visited_toggle'),
+        path('api/v1/restaurants/', api.RestaurantListApiView.as_view(), name='api-restaurant-list'),
+        path('api/v1/restaurants/<int:pk>/', api.RestaurantApiView.as_view(), name='api-restaurant-detail'),
+        path('api/v1/restaurants/<int:pk>/menu/', api.MenuApiView.as_view(), name='api-restaurant-menu'),
+        path('api/v1/restaurants/<int:pk>/photos/', api.PhotoListApiView.as_view(), name='api-restaurant-photos'),
+        path('api/v1/restaurants/<int:pk>/reviews/', api.ReviewListApiView.as_view(), name='api-restaurant-reviews'),
+    ]
+
+urlpatterns = build_urlpatterns(getattr(settings, 'RESTAURANTS_ASYNC_VIEWS', False))
@@ -0,0 +1,33 @@
+import time
+from django.core.cache import cache
+
+KEY_PREFIX = 'restaurants:version:'
+
+def get_version(name):
+    """
+    Returns the current value of the named change counter. Counters live in
+    the Django cache so every worker sharing it sees the same value.
+
+    A missing counter, never set or evicted, starts from the current time in
+    nanoseconds rather than 1, so it never returns to a value whose entries
+    may still be cached.
+    """
+    key = KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        version = cache.get(key, seed)
+    return version
+
+def bump_version(name):
+    """
+    Advances the named change counter, invalidating anything derived from it.
+    """
+    key = KEY_PREFIX + name
+    try:
+        return cache.incr(key)
+    except ValueError:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        return cache.get(key, seed)
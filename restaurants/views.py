@@ -1,93 +1,252 @@
+from functools import partial
 from django.views.generic import ListView, DetailView, CreateView, TemplateView, UpdateView, DeleteView, View
-from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404, JsonResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Restaurant, Bookmark, Visit, Review, RestaurantPhoto
+from .models import Restaurant, Bookmark, Visit, Review, RestaurantPhoto, RestaurantRatingStats, Cuisine, MenuItem
 from .forms import CustomUserCreationForm, UserProfileForm, ReviewForm
 from django.db.models import Avg, Count
 from django_filters.views import FilterView
+from .facets import get_facets
+from .filter_engine import FILTERS as ENGINE_FILTERS, EngineResult, FilterEngineMixin, get_filter_engine
 from .filters import RestaurantFilter
+from .suggest import get_suggestion_index
+from .pagination import CursorPaginationMixin
+from .loaders import run_loaders, server_timing
+from .conditional import ConditionalRestaurantPageMixin
+from .membership import (
+    KINDS as MEMBERSHIP_KINDS, add_restaurant, get_changed_at, get_membership, remove_restaurant, toggle_restaurant,
+)
+from .page_cache import HOME_PAGE_VERSION, AnonymousPageCacheMixin
+
+def get_rating_stats(restaurant):
+    try:
+        return restaurant.rating_stats
+    except RestaurantRatingStats.DoesNotExist:
+        return None
+
+class RestaurantMembershipMixin:
+    """
+    Adds the ids of the displayed restaurants the user has bookmarked or
+    visited to the context, read from the per-user cache in
+    restaurants.membership. With membership_scope = 'page' a cache miss only
+    queries the restaurants on the current page.
+    """
+    membership_scope = 'all'
+
+    def get_page_restaurant_ids(self, context):
+        if 'object' in context and isinstance(context['object'], Restaurant):
+            return [context['object'].pk]
+        object_list = context.get('object_list')
+        if object_list is None:
+            return None
+        return [getattr(obj, 'restaurant_id', obj.pk) for obj in object_list]
+
+    def get_membership(self, kind, context):
+        return get_membership(
+            self.request.user, kind, self.get_page_restaurant_ids(context), self.membership_scope
+        )
 
-class BookmarkedIdsMixin:
+class BookmarkedIdsMixin(RestaurantMembershipMixin):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            context['bookmarked_ids'] = set(self.request.user.bookmarks.values_list('restaurant_id', flat=True))
-        else:
-            context['bookmarked_ids'] = set()
+        context['bookmarked_ids'] = self.get_membership('bookmarks', context)
         return context
     
-class VisitedIdsMixin:
+class VisitedIdsMixin(RestaurantMembershipMixin):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            context['visited_ids'] = set(self.request.user.visits.values_list('restaurant_id', flat=True))
-        else:
-            context['visited_ids'] = set()
+        context['visited_ids'] = self.get_membership('visits', context)
         return context
 
-class HomePageView(BookmarkedIdsMixin, VisitedIdsMixin, ListView):
+class HomePageView(AnonymousPageCacheMixin, BookmarkedIdsMixin, VisitedIdsMixin, FilterEngineMixin, ListView):
     model = Restaurant
+    page_cache_version = HOME_PAGE_VERSION
     template_name = 'restaurants/home.html'
     context_object_name = 'spotlighted_restaurants'
     paginate_by = 9
 
     def get_queryset(self):
-        return Restaurant.objects.filter(spotlight=True).prefetch_related('restaurant_photos')
+        return Restaurant.objects.filter(spotlight=True).order_by('id').prefetch_related('restaurant_photos')
+
+    def get_engine_result(self, queryset):
+        engine = get_filter_engine()
+        return EngineResult(engine, engine.select(spotlight=True), None, queryset)
 
-class RestaurantListView(LoginRequiredMixin, BookmarkedIdsMixin, VisitedIdsMixin, FilterView):
+class RestaurantListView(
+    LoginRequiredMixin, FilterEngineMixin, CursorPaginationMixin, BookmarkedIdsMixin, VisitedIdsMixin, FilterView
+):
     model = Restaurant
     template_name = 'restaurants/restaurant_list.html'
     context_object_name = 'restaurants'
     filterset_class = RestaurantFilter
     paginate_by = 9
 
+    # Filters that only order or tune the result set without narrowing it.
+    non_narrowing_filters = {'sort', 'match', 'city_match', 'cuisines_match', 'radius'}
+
     def get_queryset(self):
-        queryset = Restaurant.objects.prefetch_related('restaurant_photos')
+        queryset = Restaurant.objects.order_by('id').prefetch_related('restaurant_photos')
         return queryset
-    
+
+    def get_active_filters(self):
+        """
+        Returns the cleaned values of the filters set on this request, or
+        None when the filter form is invalid.
+        """
+        filterset = self.filterset
+        if not filterset.is_bound:
+            return {}
+        if not filterset.is_valid():
+            return None
+        return {name: value for name, value in filterset.form.cleaned_data.items() if value not in (None, '')}
+
+    def get_engine_result(self, queryset):
+        filters = self.get_active_filters()
+        if filters is None or set(filters) - ENGINE_FILTERS or self.use_cursor_pagination():
+            return None
+        engine = get_filter_engine()
+        bitset = engine.select(**{
+            name: value for name, value in filters.items() if name not in ('sort', 'radius')
+        })
+        return EngineResult(engine, bitset, filters.get('sort'), self.filterset.queryset)
+
+    def get_facets(self, query_params):
+        """
+        Returns the sidebar facets with the number of listed restaurants per
+        value and the query string applying each value on top of the
+        current filters.
+        """
+        filters = self.get_active_filters()
+        if filters is None:
+            return []
+        if not set(filters) - self.non_narrowing_filters:
+            groups = get_facets()
+        elif self.engine_result is not None:
+            groups = get_facets(self.engine_result.restaurant_ids())
+        else:
+            groups = get_facets(restaurants=self.filterset.qs)
+        facets = []
+        for group in groups:
+            values = []
+            for value in group.values:
+                params = query_params.copy()
+                for name, param in value.params.items():
+                    params[name] = param
+                values.append({'label': value.label, 'count': f'{value.count:,}', 'query': params.urlencode()})
+            facets.append({'label': group.label, 'values': values})
+        return facets
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['selected_filters'] = self.request.GET
         query_params = self.request.GET.copy()
-        if 'page' in query_params:
-            del query_params['page']
+        for param in ('page', self.cursor_param):
+            query_params.pop(param, None)
         context['query_params'] = query_params.urlencode()
+        context['facets'] = self.get_facets(query_params)
         return context
             
-class RestaurantDetailView(LoginRequiredMixin, BookmarkedIdsMixin, VisitedIdsMixin, DetailView):
+class RestaurantSuggestView(LoginRequiredMixin, View):
+    raise_exception = True
+    max_limit = 20
+
+    def suggestion_url(self, suggestion):
+        if suggestion.kind == 'restaurant':
+            return reverse('restaurant-detail', kwargs={'pk': suggestion.object_id})
+        filter_name = 'cuisines' if suggestion.kind == 'cuisine' else 'city'
+        return f"{reverse('restaurant-list')}?{urlencode({filter_name: suggestion.label, 'match': 'exact'})}"
+
+    def get(self, request):
+        query = request.GET.get('q', '')
+        try:
+            limit = min(int(request.GET.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        suggestions = get_suggestion_index().suggest(query, limit) if limit > 0 else []
+        return JsonResponse({
+            'query': query,
+            'suggestions': [
+                {'label': suggestion.label, 'kind': suggestion.kind, 'url': self.suggestion_url(suggestion)}
+                for suggestion in suggestions
+            ],
+        })
+
+class RestaurantDetailView(LoginRequiredMixin, ConditionalRestaurantPageMixin, DetailView):
+    """
+    Assembles the page from independent loaders keyed by the restaurant id
+    in the URL, run concurrently by restaurants.loaders. Their durations
+    are sent in the Server-Timing header. Unchanged pages are answered
+    with 304 Not Modified before any loader runs.
+    """
     model = Restaurant
     template_name = 'restaurants/restaurant_detail.html'
     context_object_name = 'restaurant'
 
     def get_queryset(self):
-        queryset = Restaurant.objects.prefetch_related('restaurant_photos', 'cuisines')
-        return queryset
+        return Restaurant.objects.select_related('rating_stats')
+
+    def get_loaders(self):
+        pk = self.kwargs['pk']
+        user = self.request.user
+        return {
+            'restaurant': partial(get_object_or_404, self.get_queryset(), pk=pk),
+            'cuisines': lambda: list(Cuisine.objects.filter(restaurants=pk)),
+            'cover_photo': lambda: RestaurantPhoto.objects.filter(restaurant_id=pk).order_by('pk').first(),
+            'menu_items': lambda: list(MenuItem.objects.filter(restaurant_id=pk).prefetch_related('menu_item_photos')),
+            'user_review': lambda: Review.objects.filter(restaurant_id=pk, user=user).first(),
+            'recent_reviews': lambda: list(
+                Review.objects.filter(restaurant_id=pk).exclude(user=user).select_related('user')[:4]
+            ),
+            'bookmarked_ids': self.get_membership_loader('bookmarks'),
+            'visited_ids': self.get_membership_loader('visits'),
+        }
+
+    def get_membership_loader(self, kind):
+        # Already read for the ETag when the request was checked for a 304.
+        membership = getattr(self, 'membership', {})
+        if kind in membership:
+            return partial(set, membership[kind])
+        return partial(get_membership, self.request.user, kind, [self.kwargs['pk']], 'page')
+
+    def get_user_parts(self):
+        user, pk = self.request.user, self.kwargs['pk']
+        self.membership = {kind: get_membership(user, kind, [pk], 'page') for kind in MEMBERSHIP_KINDS}
+        return (
+            [bool(self.membership[kind]) for kind in MEMBERSHIP_KINDS],
+            max(get_changed_at(user.pk, kind) for kind in MEMBERSHIP_KINDS),
+        )
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['menu_items'] = self.object.menu_items.prefetch_related('menu_item_photos').all()
-        restaurant = self.object
-        user_review = None
-        if self.request.user.is_authenticated:
-            user_review = Review.objects.filter(
-                restaurant=restaurant,
-                user=self.request.user
-            ).first()
-        context['user_review'] = user_review
-        recent_reviews = restaurant.reviewed_by_user.all().exclude(user=self.request.user)[:4]
+    def get_review_context(self, user_review, recent_reviews):
         reviews = []
         if user_review:
             reviews.append(user_review)
         reviews.extend(recent_reviews)
+        return {'user_review': user_review, 'recent_reviews': reviews}
+
+    def render_loaded(self, values, timings):
+        self.object = values.pop('restaurant')
+        context = self.get_context_data(
+            object=self.object,
+            rating_stats=get_rating_stats(self.object),
+            **self.get_review_context(values.pop('user_review'), values.pop('recent_reviews')),
+            **values,
+        )
+        response = self.render_to_response(context)
+        response['Server-Timing'] = server_timing(timings)
+        return response
 
-        context['recent_reviews'] = reviews
-        return context
+    def get(self, request, *args, **kwargs):
+        response = self.get_not_modified()
+        if response is None:
+            response = self.render_loaded(*run_loaders(self.get_loaders()))
+        return self.add_validators(response)
     
-class RestaurantImageView(LoginRequiredMixin, ListView):
+class RestaurantImageView(LoginRequiredMixin, ConditionalRestaurantPageMixin, ListView):
     model = RestaurantPhoto
     template_name = 'restaurants/restaurant_images.html'
     context_object_name = 'images'
@@ -101,19 +260,23 @@ class RestaurantImageView(LoginRequiredMixin, ListView):
         context['restaurant'] = get_object_or_404(Restaurant, pk=self.kwargs['pk'])
         return context
 
-class ReviewListView(LoginRequiredMixin, ListView):
+class ReviewListView(LoginRequiredMixin, ConditionalRestaurantPageMixin, CursorPaginationMixin, ListView):
     model = Review
     template_name = 'restaurants/restaurant_reviews.html'
     context_object_name = 'reviews'
     paginate_by = 10
     
+    def get_restaurant_queryset(self):
+        return Restaurant.objects.select_related('rating_stats')
+
     def get_queryset(self):
-        self.restaurant = get_object_or_404(Restaurant, pk=self.kwargs['pk'])
+        self.restaurant = get_object_or_404(self.get_restaurant_queryset(), pk=self.kwargs['pk'])
         return Review.objects.filter(restaurant=self.restaurant)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['restaurant'] = self.restaurant
+        context['rating_stats'] = get_rating_stats(self.restaurant)
         return context
 
 class RegisterView(CreateView):
@@ -141,7 +304,7 @@ class UserProfileEditView(LoginRequiredMixin, UpdateView):
         messages.success(self.request, "Your profile has been updated successfully")
         return super().form_valid(form)
 
-class UserBookmarksListView(LoginRequiredMixin, BookmarkedIdsMixin, VisitedIdsMixin, ListView):
+class UserBookmarksListView(LoginRequiredMixin, CursorPaginationMixin, BookmarkedIdsMixin, VisitedIdsMixin, ListView):
     model = Bookmark
     template_name = 'users/bookmarks_list.html'
     context_object_name = 'bookmarked_restaurants'
@@ -150,22 +313,77 @@ class UserBookmarksListView(LoginRequiredMixin, BookmarkedIdsMixin, VisitedIdsMi
     def get_queryset(self):
         return Bookmark.objects.filter(user=self.request.user).select_related('restaurant').prefetch_related('restaurant__restaurant_photos')
 
-class UserBookmarkToggleView(LoginRequiredMixin, View):
-    def post(self, request, restaurant_id):
-        restaurant = get_object_or_404(Restaurant, id=restaurant_id)
-        bookmark, created = Bookmark.objects.get_or_create(
-            user=request.user, restaurant=restaurant
-        )
-        if not created:
-            bookmark.delete()
+class MembershipToggleView(LoginRequiredMixin, View):
+    """
+    Adds or removes a restaurant from the user's bookmarks or visits, each
+    with a single statement that cannot conflict with a concurrent request:
+    POST toggles, PUT adds and DELETE removes, both idempotent.
+
+    Forms posted without JavaScript are redirected to `next`. With
+    ?format=json or Accept: application/json, the default for PUT and
+    DELETE, the response is {"restaurant_id": ..., <state_name>: bool}; with
+    ?format=fragment it is the re-rendered toggle for the restaurant card.
+    """
+    kind = None
+    state_name = None
+    ids_name = None
+    fragment_template = None
+    success_url = None
 
-        next_url = request.POST.get('next') or reverse('bookmarks_list')
-        if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
-            next_url = reverse('bookmarks_list')
-        
-        return redirect(next_url)
-    
-class UserVisitedRestaurantsListView(LoginRequiredMixin, BookmarkedIdsMixin,  VisitedIdsMixin, ListView):
+    def post(self, request, restaurant_id):
+        active = toggle_restaurant(request.user.pk, self.kind, restaurant_id)
+        if active is None:
+            raise Http404("No restaurant matches the given query.")
+        return self.respond(restaurant_id, active)
+
+    def put(self, request, restaurant_id):
+        if not add_restaurant(request.user.pk, self.kind, restaurant_id):
+            get_object_or_404(Restaurant.objects.only('pk'), pk=restaurant_id)
+        return self.respond(restaurant_id, True)
+
+    def delete(self, request, restaurant_id):
+        remove_restaurant(request.user.pk, self.kind, restaurant_id)
+        return self.respond(restaurant_id, False)
+
+    def handle_no_permission(self):
+        # Scripted requests get a 403 rather than the login page.
+        self.raise_exception = self.get_response_format() is not None
+        return super().handle_no_permission()
+
+    def get_next_url(self):
+        next_url = self.request.POST.get('next') or self.success_url
+        if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={self.request.get_host()}):
+            next_url = self.success_url
+        return next_url
+
+    def get_response_format(self):
+        response_format = self.request.GET.get('format')
+        if response_format in ('json', 'fragment'):
+            return response_format
+        if self.request.method != 'POST' or self.request.headers.get('Accept', '').startswith('application/json'):
+            return 'json'
+        return None
+
+    def respond(self, restaurant_id, active):
+        response_format = self.get_response_format()
+        if response_format == 'json':
+            return JsonResponse({'restaurant_id': restaurant_id, self.state_name: active})
+        if response_format == 'fragment':
+            return render(self.request, self.fragment_template, {
+                'restaurant': {'id': restaurant_id},
+                self.ids_name: {restaurant_id} if active else set(),
+                'next_url': self.get_next_url(),
+            })
+        return redirect(self.get_next_url())
+
+class UserBookmarkToggleView(MembershipToggleView):
+    kind = 'bookmarks'
+    state_name = 'bookmarked'
+    ids_name = 'bookmarked_ids'
+    fragment_template = 'restaurants/bookmark_toggle.html'
+    success_url = reverse_lazy('bookmarks_list')
+
+class UserVisitedRestaurantsListView(LoginRequiredMixin, CursorPaginationMixin, BookmarkedIdsMixin, VisitedIdsMixin, ListView):
     model = Visit
     template_name = 'users/visited_restaurants_list.html'
     context_object_name = 'visited_restaurants'
@@ -174,21 +392,12 @@ class UserVisitedRestaurantsListView(LoginRequiredMixin, BookmarkedIdsMixin,  Vi
     def get_queryset(self):
         return Visit.objects.filter(user = self.request.user).select_related('restaurant').prefetch_related('restaurant__restaurant_photos')
     
-class UserVisitedRestaurantsToggleView(LoginRequiredMixin, View):
-    def post(self, request, restaurant_id):
-        restaurant = get_object_or_404(Restaurant, id=restaurant_id)
-        visit, created = Visit.objects.get_or_create(
-            user=request.user, restaurant=restaurant
-        )
-
-        if not created:
-            visit.delete()
-
-        next_url = request.POST.get('next') or reverse_lazy('visited_restaurants_list')
-        if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
-            next_url = reverse_lazy('visited_restaurants_list')
-
-        return redirect(next_url)
+class UserVisitedRestaurantsToggleView(MembershipToggleView):
+    kind = 'visits'
+    state_name = 'visited'
+    ids_name = 'visited_ids'
+    fragment_template = 'restaurants/visited_toggle.html'
+    success_url = reverse_lazy('visited_restaurants_list')
 
 class ReviewCreateView(LoginRequiredMixin, CreateView):
     model = Review